@@ -1,7 +1,13 @@
 import pygame
 import random
 import math
-from perlin_noise import PerlinNoise
+import numpy as np
+from index.noise_field import NoiseField
+from index.planet_shader import shade_planet
+from index.starfield import star_field, noise_density, scatter
+from index.placement import place_planets, place_moons, bodies_grid
+from index.rings import ring_pixels
+from index.noise_cache import noise_fields
 
 WIDTH, HEIGHT = 1200, 900
 BLOCK_SIZE = 10
@@ -16,50 +22,28 @@ def upscale_px(surf):
     return pygame.transform.scale(surf, (WIDTH, HEIGHT))
 
 def random_safe_planet_positions(n, low_w, low_h, min_r, max_r):
-    poses = []
-    for _ in range(n):
-        valid = False
-        attempts = 0
-        while not valid and attempts<40:
-            r = random.randint(min_r, max_r)
-            cx = random.randint(r+4, low_w-r-4)
-            cy = random.randint(r+4, low_h-r-4)
-            valid = all(math.hypot(cx-x, cy-y)>r2+r+12 for (x, y, r2) in poses)
-            attempts += 1
-        poses.append((cx, cy, r))
-    return poses
+    return place_planets(n, low_w, low_h, min_r, max_r, gap=12, margin=4, strict=False)
+
+noises = {}
+
+def octave_noise(octaves):
+    # one field per octave count per wallpaper, every planet and moon crops its box out of it
+    if octaves not in noises: noises[octaves] = NoiseField(octaves=octaves)
+    return noises[octaves]
 
 def draw_px_planet(surf, cx, cy, r, palette, noise, bands):
-    for y in range(-r, r):
-        for x in range(-r, r):
-            if x*x + y*y <= r*r:
-                rx, ry = cx+x, cy+y
-                if 0<=rx<LOW_W and 0<=ry<LOW_H:
-                    norm = math.sqrt(x*x+y*y)/r
-                    nval = noise([rx/LOW_W, ry/LOW_H])
-                    idx = int(((0.45*norm+0.55*((nval+1)/2)))*bands)
-                    idx = min(bands-1, max(0, idx))
-                    surf.set_at((rx, ry), palette[idx])
-                    if abs(norm-1)<0.07:
-                        surf.set_at((rx, ry), (255,255,255))
-                    if nval< -0.2 and norm<0.85:
-                        surf.set_at((rx, ry), (52,52,52))
-                    if nval>0.7 and norm<0.7:
-                        surf.set_at((rx, ry), (230,230,255))
-                    if random.random()<0.003 and abs(norm-0.55)<0.24:
-                        surf.set_at((rx,ry), (180,90,10))
-
-def draw_px_moons(surf, planet_x, planet_y, planet_r, count, min_r, max_r, palette, noise):
-    moon_positions = set()
-    for _ in range(count):
-        r = random.randint(min_r, max_r)
-        angle = random.uniform(0,2*math.pi)
-        dist = planet_r + r + random.randint(8,18)
-        mx = int(planet_x + math.cos(angle)*dist)
-        my = int(planet_y + math.sin(angle)*dist)
-        moon_positions.add((mx,my,r))
+    field = noise_fields.crop(noise, LOW_W, LOW_H, cx-r, cy-r, cx+r, cy+r).T
+    shade_planet(pygame.surfarray.pixels3d(surf).swapaxes(0,1), cx, cy, r, palette, bands,
+                 noise=field, mix=(0.45, 0.55), span=bands,
+                 rim=(0.07, (255,255,255), 1.0), craters=(-0.2, 0.85, (52,52,52)),
+                 spots=(0.7, 0.7, (230,230,255)), specks=(0.003, 0.55, 0.24, (180,90,10)))
+
+def draw_px_moons(surf, planet_x, planet_y, planet_r, count, min_r, max_r, palette, grid=None):
+    # grid holds the planets/moons already placed, moons that don't fit anywhere are skipped
+    grid = grid or bodies_grid([(planet_x, planet_y, planet_r)])
+    for mx, my, r in place_moons(grid, planet_x, planet_y, planet_r, count, min_r, max_r, (8, 18)):
         moon_col = [tuple(min(255,max(0,c+random.randint(-40,40))) for c in palette[random.randint(0,len(palette)-1)]) for _ in range(random.randint(2,4))]
-        moon_noise = PerlinNoise(octaves=random.randint(2,3))
+        moon_noise = octave_noise(random.randint(2,3))
         draw_px_planet(surf, mx, my, r, moon_col, moon_noise, len(moon_col))
 
 def draw_px_gradient_bg(surf, top, bottom):
@@ -69,45 +53,32 @@ def draw_px_gradient_bg(surf, top, bottom):
         for x in range(LOW_W):
             surf.set_at((x,y), tc)
 
-def draw_px_stars(surf, density, palette):
+def draw_px_stars(surf, density, palette, density_map=None):
     ct = int(density * LOW_W * LOW_H)
-    for _ in range(ct):
-        x,y = random.randint(0,LOW_W-1), random.randint(0,LOW_H-1)
-        surf.set_at((x,y), random.choice(palette))
-        if random.random()<0.09:
-            for dx,dy in [(1,0),(0,1),(-1,0),(0,-1)]:
-                if 0<=x+dx<LOW_W and 0<=y+dy<LOW_H:
-                    surf.set_at((x+dx,y+dy), random.choice(palette))
-        if random.random()<0.01:
-            r = random.randint(1,3)
-            for xx in range(-r,r+1):
-                for yy in range(-r,r+1):
-                    if 0<=x+xx<LOW_W and 0<=y+yy<LOW_H:
-                        surf.set_at((x+xx,y+yy), (255,255,255))
-
-def draw_px_nebula(surf, palette, octaves=4, alpha=0.52):
-    noise = PerlinNoise(octaves=octaves)
-    for y in range(LOW_H):
-        for x in range(LOW_W):
-            val = (noise([x/LOW_W, y/LOW_H])+1)/2
-            if val>0.62:
-                idx = int(val*(len(palette)-1))
-                neb = tuple(int((1-alpha)*surf.get_at((x,y))[i]+alpha*palette[idx][i]) for i in range(3))
-                surf.set_at((x,y), neb)
-            if random.random()<0.001 and val>0.66 and x%3==0 and y%3==0:
-                surf.set_at((x,y), (220,130,255))
+    rng = np.random.default_rng(random.getrandbits(32))
+    stars = star_field(rng, LOW_W, LOW_H, ct, palette, plus=0.09, boxed=0.01, box_radii=(1,3), density=density_map)
+    scatter(pygame.surfarray.pixels3d(surf).swapaxes(0,1), *stars)
+
+def draw_px_nebula(surf, palette, octaves=4, alpha=0.52, noise=None):
+    noise = noise or NoiseField(octaves=octaves)
+    val = (noise_fields.field(noise, LOW_W, LOW_H).T+1)/2
+    rng = np.random.default_rng(random.getrandbits(32))
+    arr = pygame.surfarray.pixels3d(surf)
+    mask = val>0.62
+    idx = (val[mask]*(len(palette)-1)).astype(int)
+    arr[mask] = ((1-alpha)*arr[mask] + alpha*np.array(palette)[idx]).astype(np.uint8)
+    grid3 = (np.arange(LOW_W)%3==0)[:,None] & (np.arange(LOW_H)%3==0)[None,:]
+    arr[(rng.random(val.shape)<0.001) & (val>0.66) & grid3] = (220,130,255)
+    del arr
 
 def draw_px_rings(surf, cx, cy, r, palette, rings=3, fade=22):
+    rng = np.random.default_rng(random.getrandbits(32))
+    arr = pygame.surfarray.pixels3d(surf).swapaxes(0,1)
     for ring in range(rings):
         cr = r + ring*random.randint(7,11)
         col = tuple(min(255,max(0,palette[-1][i]-(fade*ring))) for i in range(3))
-        for theta in range(0,360,1):
-            x = int(cx + cr*math.cos(math.radians(theta)))
-            y = int(cy + cr*math.sin(math.radians(theta)))
-            if 0<=x<LOW_W and 0<=y<LOW_H:
-                surf.set_at((x,y), col)
-                if random.random()<0.11 and 0<=x+1<LOW_W and 0<=y+1<LOW_H:
-                    surf.set_at((x+1,y+1), col)
+        scatter(arr, *ring_pixels(cx, cy, cr, col, sparkle=0.11, rng=rng))
+    del arr
 
 def draw_px_craters(surf, cx, cy, r, min_r, max_r, count):
     for _ in range(count):
@@ -160,25 +131,31 @@ def draw_px_highlight(surf, cx, cy, r, highlight_col=(254,254,200)):
 pygame.init()
 low = pygame.Surface((LOW_W, LOW_H))
 
-def make_wallpaper():
+def make_wallpaper(seed=None):
+    # everything below draws from random (noise seeds and numpy rngs included), so one seed pins the whole image
+    random.seed(seed)
+    noises.clear()
     top_col = random_palette(1,0.6)[0]
     bot_col = random_palette(1,0.58)[0]
     draw_px_gradient_bg(low, top_col, bot_col)
-    draw_px_stars(low, density=0.002, palette=[(255,255,255),(220,230,250),(120,170,255)])
-    draw_px_nebula(low, random_palette(6,0.85), octaves=random.randint(2,4), alpha=random.uniform(0.55,0.66))
+    # stars bunch up where the nebula is
+    neb_noise = NoiseField(octaves=random.randint(2,4))
+    neb_density = noise_density(noise_fields.field(neb_noise, LOW_W, LOW_H), 0.5)
+    draw_px_stars(low, density=0.002, palette=[(255,255,255),(220,230,250),(120,170,255)], density_map=neb_density)
+    draw_px_nebula(low, random_palette(6,0.85), alpha=random.uniform(0.55,0.66), noise=neb_noise)
     draw_cluster_nebula(low, clusters=random.randint(6,10), palette=random_palette(3,0.65), max_size=random.randint(19,49))
     planet_pals = [random_palette(random.randint(4,8),0.88) for _ in range(random.randint(2,4))]
     positions = random_safe_planet_positions(len(planet_pals), LOW_W, LOW_H, 15, 30)
-    noises = [PerlinNoise(octaves=random.randint(3,5)) for _ in planet_pals]
+    planet_noises = [octave_noise(random.randint(3,5)) for _ in planet_pals]
+    bodies = bodies_grid(positions)
     for idx, (cx,cy,r) in enumerate(positions):
-        draw_px_planet(low, cx, cy, r, planet_pals[idx], noises[idx], len(planet_pals[idx]))
+        draw_px_planet(low, cx, cy, r, planet_pals[idx], planet_noises[idx], len(planet_pals[idx]))
         draw_px_shadow(low,cx,cy,r,shade=(0,0,0),alpha=random.uniform(0.18,0.42))
         draw_px_rings(low,cx,cy, r, planet_pals[idx], rings=random.randint(1,3), fade=random.randint(8,24))
         draw_px_craters(low,cx,cy,r,2,7,random.randint(7,17))
         draw_px_highlight(low,cx,cy,r,highlight_col=random.choice(planet_pals[idx]))
         moons_pal = random_palette(random.randint(2,5),0.81)
-        moons_noise = PerlinNoise(octaves=random.randint(2,4))
-        draw_px_moons(low, cx, cy, r, random.randint(1,3), 4,12, moons_pal, moons_noise)
+        draw_px_moons(low, cx, cy, r, random.randint(1,3), 4,12, moons_pal, bodies)
 
 make_wallpaper()
 ups = upscale_px(low)
@@ -3,6 +3,11 @@ import random
 import math
 import sys
 import time
+import numpy as np
+from index.hsv import hsv_grid, rgb_to_hsv, to_rgb
+from index.noise_field import NoiseField
+from index.blur import box_mean_floor
+from index.presenter import GridPresenter
 
 pygame.init()
 WIDTH, HEIGHT = 600, 480
@@ -11,6 +16,10 @@ GRID_WIDTH = WIDTH // PIXEL_SIZE
 GRID_HEIGHT = HEIGHT // PIXEL_SIZE
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Layered Pixel Art Noise v1")
+rng = np.random.default_rng(random.getrandbits(32))
+grid_view = GridPresenter(GRID_WIDTH, GRID_HEIGHT, PIXEL_SIZE)
+
+# colour grids (colored_grid and friends) are (w, h, 3) int16 h, s, v arrays, see index/hsv.py
 
 def rand_gray(low, high):
     return random.randint(low, high)
@@ -38,24 +47,14 @@ def random_hue():
     return random.randint(0, 360)
 
 noise_grid = gen_noise(GRID_WIDTH, GRID_HEIGHT)
-colored_grid = [[None] * GRID_HEIGHT for _ in range(GRID_WIDTH)]
+colored_grid = hsv_grid(0, 100, np.zeros((GRID_WIDTH, GRID_HEIGHT), dtype=int))
 
 def apply_color_layer(grid):
-    for x in range(len(grid)):
-        for y in range(len(grid[x])):
-            brightness = grid[x][y]
-            hue = random_hue()
-            col = hsv_color(hue, 100, brightness * 100 // 255)
-            colored_grid[x][y] = col
+    brightness = np.asarray(grid)
+    colored_grid[:] = hsv_grid(rng.integers(0, 361, brightness.shape), 100, brightness * 100 // 255)
 
 def update_colored_grid(grid, colored_grid):
-    for i in range(len(grid)):
-        for j in range(len(grid[0])):
-            b = grid[i][j]
-            h = (colored_grid[i][j].hsva[0] + 5) % 360
-            s = colored_grid[i][j].hsva[1]
-            v = colored_grid[i][j].hsva[2]
-            colored_grid[i][j].hsva = (h, s, v, 100)
+    colored_grid[..., 0] = (colored_grid[..., 0] + 5) % 360
 
 apply_color_layer(noise_grid)
 clock = pygame.time.Clock()
@@ -79,20 +78,13 @@ def fade_out_surface(surface, target, speed):
         clock.tick(60)
 
 def noise_cell_pattern(grid, color_grid, scale):
-    for cx in range(0, len(grid), scale):
-        for cy in range(0, len(grid[0]), scale):
-            avg = 0
-            count = 0
-            for ix in range(cx, min(cx + scale, len(grid))):
-                for iy in range(cy, min(cy + scale, len(grid[0]))):
-                    avg += grid[ix][iy]
-                    count += 1
-            avg = avg // count
-            hue = random_hue()
-            col = hsv_color(hue, 100, avg * 100 // 255)
-            for ix in range(cx, min(cx + scale, len(grid))):
-                for iy in range(cy, min(cy + scale, len(grid[0]))):
-                    color_grid[ix][iy] = col
+    # one random hue per scale x scale cell, value from the cell's average brightness
+    grid = np.asarray(grid)
+    for cx in range(0, grid.shape[0], scale):
+        for cy in range(0, grid.shape[1], scale):
+            cell = grid[cx:cx + scale, cy:cy + scale]
+            avg = int(cell.sum()) // cell.size
+            color_grid[cx:cx + scale, cy:cy + scale] = (random_hue(), 100, avg * 100 // 255)
 
 def edge_detect(grid):
     edges = [[0] * len(grid[0]) for _ in range(len(grid))]
@@ -104,29 +96,17 @@ def edge_detect(grid):
     return edges
 
 def color_edges(edges, threshold):
-    edge_colors = [[None] * len(edges[0]) for _ in range(len(edges))]
-    for i in range(len(edges)):
-        for j in range(len(edges[0])):
-            if edges[i][j] > threshold:
-                hue = 0
-                val = edges[i][j] * 100 // 255
-                edge_colors[i][j] = hsv_color(hue, 100, val)
-            else:
-                edge_colors[i][j] = None
-    return edge_colors
+    # -> (colours, mask): red edges where they pass threshold, mask marks the cells that do
+    edges = np.asarray(edges)
+    mask = edges > threshold
+    return hsv_grid(0, 100, np.where(mask, edges * 100 // 255, 0)), mask
 
 def merge_layers(base, overlay):
-    for i in range(len(base)):
-        for j in range(len(base[0])):
-            if overlay[i][j]:
-                base[i][j] = overlay[i][j]
+    colors, mask = overlay
+    base[mask] = colors[mask]
 
 def draw_grid(surface, color_grid):
-    for x in range(len(color_grid)):
-        for y in range(len(color_grid[0])):
-            col = color_grid[x][y]
-            if col:
-                draw_pixel(surface, x, y, col)
+    return grid_view.present(surface, to_rgb(color_grid))
 
 def random_walk_noise(grid, steps):
     x, y = random.randint(0, len(grid)-1), random.randint(0, len(grid[0])-1)
@@ -138,70 +118,34 @@ def random_walk_noise(grid, steps):
         y = max(0, min(y, len(grid[0])-1))
 
 def smooth_noise(grid):
-    temp = [[0]*len(grid[0]) for _ in range(len(grid))]
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            neighbors = []
-            for nx in range(max(0, x-1), min(len(grid), x+2)):
-                for ny in range(max(0, y-1), min(len(grid[0]), y+2)):
-                    neighbors.append(grid[nx][ny])
-            temp[x][y] = sum(neighbors)//len(neighbors)
-    return temp
+    return box_mean_floor(np.array(grid), 1).tolist()
 
 def invert_colors(color_grid):
-    for x in range(len(color_grid)):
-        for y in range(len(color_grid[0])):
-            c = color_grid[x][y]
-            if c:
-                h, s, v, a = c.hsva
-                color_grid[x][y].hsva = ((h+180) % 360, s, 100 - v, a)
+    color_grid[..., 0] = (color_grid[..., 0] + 180) % 360
+    color_grid[..., 2] = 100 - color_grid[..., 2]
 
 def shift_hue(color_grid, shift):
-    for x in range(len(color_grid)):
-        for y in range(len(color_grid[0])):
-            c = color_grid[x][y]
-            if c:
-                h, s, v, a = c.hsva
-                color_grid[x][y].hsva = ((h + shift) % 360, s, v, a)
+    color_grid[..., 0] = (color_grid[..., 0] + shift) % 360
 
 def scale_brightness(color_grid, scale):
-    for x in range(len(color_grid)):
-        for y in range(len(color_grid[0])):
-            c = color_grid[x][y]
-            if c:
-                h, s, v, a = c.hsva
-                nv = min(100, max(0, int(v * scale)))
-                color_grid[x][y].hsva = (h, s, nv, a)
+    color_grid[..., 2] = np.clip(np.trunc(color_grid[..., 2] * scale), 0, 100)
 
 def random_color_grid(width, height):
-    grid = []
-    for x in range(width):
-        col = []
-        for y in range(height):
-            c = pygame.Color(random.randint(0,255), random.randint(0,255), random.randint(0,255))
-            col.append(c)
-        grid.append(col)
-    return grid
+    return np.round(rgb_to_hsv(rng.integers(0, 256, (width, height, 3)))).astype(np.int16)
 
 def pattern_blocks(grid, block_size):
     for x in range(0, len(grid), block_size):
         for y in range(0, len(grid[0]), block_size):
             color_val = random.randint(60, 200)
-            hue = random_hue()
-            col = hsv_color(hue, 100, color_val * 100 // 255)
-            for bx in range(x, min(x+block_size, len(grid))):
-                for by in range(y, min(y+block_size, len(grid[0]))):
-                    grid[bx][by] = col
+            grid[x:x+block_size, y:y+block_size] = (random_hue() % 360, 100, color_val * 100 // 255)
 
 def random_walk_apply(grid, colored_grid, steps):
     x, y = random.randint(0, len(grid)-1), random.randint(0, len(grid[0])-1)
     for _ in range(steps):
         val = grid[x][y] + random.randint(-15, 15)
         val = max(80, min(val, 180))
-        h = (colored_grid[x][y].hsva[0] + random.randint(-10,10)) % 360
-        s = colored_grid[x][y].hsva[1]
-        v = val * 100 // 255
-        colored_grid[x][y].hsva = (h, s, v, 100)
+        colored_grid[x, y, 0] = (colored_grid[x, y, 0] + random.randint(-10,10)) % 360
+        colored_grid[x, y, 2] = val * 100 // 255
         x += random.choice([-1,0,1])
         y += random.choice([-1,0,1])
         x = max(0, min(x, len(grid)-1))
@@ -224,24 +168,11 @@ def blend_colors(c1, c2, alpha):
     return pygame.Color(r, g, b)
 
 def animate_color_shift(color_grid, shift_val):
-    for x in range(len(color_grid)):
-        for y in range(len(color_grid[0])):
-            col = color_grid[x][y]
-            if col:
-                h, s, v, a = col.hsva
-                color_grid[x][y].hsva = ((h + shift_val) % 360, s, v, a)
+    shift_hue(color_grid, shift_val)
 
 def noise_to_color_map(grid):
-    color_map = []
-    for x in range(len(grid)):
-        col = []
-        for y in range(len(grid[0])):
-            gray = grid[x][y]
-            hue = (gray*360//255) % 360
-            c = hsv_color(hue, 100, gray * 100 // 255)
-            col.append(c)
-        color_map.append(col)
-    return color_map
+    gray = np.asarray(grid)
+    return hsv_grid(gray*360//255, 100, gray * 100 // 255)
 
 def overlay_pattern(base_grid, overlay_grid):
     for x in range(len(base_grid)):
@@ -360,11 +291,9 @@ def create_surface_from_grid(grid):
     return surf
 
 def apply_random_color_to_grid(grid):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            hue = random.randint(0, 360)
-            c = hsv_color(hue, 100, grid[x][y] * 100 // 255)
-            grid[x][y] = c
+    # brightness grid -> new colour grid (an int grid can't hold the colours in place)
+    gray = np.asarray(grid)
+    return hsv_grid(rng.integers(0, 361, gray.shape), 100, gray * 100 // 255)
 
 def flood_fill(grid, start_x, start_y, old_color, new_color):
     if start_x < 0 or start_x >= len(grid) or start_y < 0 or start_y >= len(grid[0]):
@@ -385,13 +314,10 @@ def random_pixel_mutation(grid, steps):
         grid[x][y] = val
 
 def oscillate_color(color_grid, amplitude, speed, frame):
-    for x in range(len(color_grid)):
-        for y in range(len(color_grid[0])):
-            c = color_grid[x][y]
-            if c:
-                h, s, v, a = c.hsva
-                nv = max(0, min(100, int(v + amplitude * math.sin(speed * frame + x + y))))
-                color_grid[x][y].hsva = (h, s, nv, a)
+    x = np.arange(color_grid.shape[0])[:, None]
+    y = np.arange(color_grid.shape[1])[None, :]
+    nv = np.trunc(color_grid[..., 2] + amplitude * np.sin(speed * frame + x + y))
+    color_grid[..., 2] = np.clip(nv, 0, 100)
 
 
 def ripple_effect(grid, center_x, center_y, radius, intensity):
@@ -438,17 +364,7 @@ def random_shapes(surface, count, max_size):
             pygame.draw.rect(surface, color, rect)
 
 def blur_grid(grid, kernel_size):
-    from copy import deepcopy
-    new_grid = deepcopy(grid)
-    k = kernel_size // 2
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            vals = []
-            for nx in range(max(0, x - k), min(len(grid), x + k + 1)):
-                for ny in range(max(0, y - k), min(len(grid[0]), y + k + 1)):
-                    vals.append(grid[nx][ny])
-            new_grid[x][y] = sum(vals)//len(vals)
-    return new_grid
+    return box_mean_floor(np.array(grid), kernel_size // 2).tolist()
 
 def draw_gradient(surface, left_color, right_color):
     for x in range(WIDTH):
@@ -502,13 +418,7 @@ def create_noise_circle(grid, center_x, center_y, radius, val):
                 grid[x][y] = val
 
 def oscillate_hue(grid, speed, frame):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            c = grid[x][y]
-            if c:
-                h, s, v, a = c.hsva
-                new_h = int((h + speed * frame) % 360)
-                grid[x][y].hsva = (new_h, s, v, a)
+    grid[..., 0] = (grid[..., 0] + speed * frame) % 360
 
 def multiply_grids(grid1, grid2):
     new_grid = []
@@ -579,14 +489,14 @@ def add_noise(grid, amount):
             val = grid[x][y] + random.randint(-amount, amount)
             grid[x][y] = max(0, min(255, val))
 
+mosaic_lut = None
+
 def draw_mosaic(surface, grid):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            val = grid[x][y]
-            hue = val * 360 // 255
-            color = hsv_color(hue, 100, val * 100 // 255)
-            rect = pygame.Rect(x * PIXEL_SIZE, y * PIXEL_SIZE, PIXEL_SIZE, PIXEL_SIZE)
-            pygame.draw.rect(surface, color, rect)
+    # colour only depends on the 0..255 value, so it is one table lookup per cell
+    global mosaic_lut
+    if mosaic_lut is None:
+        mosaic_lut = np.array([tuple(hsv_color(v * 360 // 255, 100, v * 100 // 255))[:3] for v in range(256)], dtype=np.uint8)
+    return grid_view.present(surface, mosaic_lut[np.clip(np.asarray(grid), 0, 255)])
 
 def apply_checkerboard_color_overlay(grid, threshold):
     for x in range(len(grid)):
@@ -755,20 +665,11 @@ def steady_flicker(surface, color, speed):
 def cycle_colors(color_list, index):
     return color_list[index % len(color_list)]
 
-from perlin_noise import PerlinNoise
-
 def generate_perlin_noise(width, height, scale=10, octaves=4):
-    noise = PerlinNoise(octaves=octaves)
-    noise_grid = []
-    for x in range(width):
-        col = []
-        for y in range(height):
-            val = noise([x / scale, y / scale])
-            # val is in range [-1, 1], convert to [0, 255]
-            gray = int((val + 1) / 2 * 255)
-            col.append(gray)
-        noise_grid.append(col)
-    return noise_grid
+    noise = NoiseField(octaves=octaves)
+    vals = noise.grid(np.arange(width)/scale, np.arange(height)/scale).T
+    # val is in range [-1, 1], convert to [0, 255]
+    return ((vals + 1) / 2 * 255).astype(int).tolist()
 
 
 def apply_wave_distortion(grid, amplitude, frequency, frame):
@@ -788,17 +689,10 @@ def render_text(surface, text, pos, font_size, color):
     surface.blit(text_surface, pos)
 
 def draw_colored_grid(surface, grid):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            c = grid[x][y]
-            if isinstance(c, pygame.Color):
-                rect = pygame.Rect(x * PIXEL_SIZE, y * PIXEL_SIZE, PIXEL_SIZE, PIXEL_SIZE)
-                pygame.draw.rect(surface, c, rect)
-            else:
-                shade = c if isinstance(c, int) else 0
-                col = (shade, shade, shade)
-                rect = pygame.Rect(x * PIXEL_SIZE, y * PIXEL_SIZE, PIXEL_SIZE, PIXEL_SIZE)
-                pygame.draw.rect(surface, col, rect)
+    # colour grids through the lookup table, plain brightness grids as grey
+    grid = np.asarray(grid)
+    rgb = to_rgb(grid) if grid.ndim == 3 else np.repeat(grid[..., None], 3, -1)
+    return grid_view.present(surface, rgb)
 
 def clamped_add(val, add_val):
     return max(0, min(255, val + add_val))
@@ -848,18 +742,9 @@ def generate_layered_noise(base_grid, layers=3, persistence=0.5, scale=10):
     return accumulated
 
 def apply_color_gradient(grid, start_hue, end_hue):
-    width = len(grid)
-    height = len(grid[0])
-    colored_grid = [[None]*height for _ in range(width)]
-    for x in range(width):
-        for y in range(height):
-            norm_val = grid[x][y] / 255
-            hue = int(start_hue + (end_hue - start_hue) * norm_val) % 360
-            val = int(norm_val * 100)
-            colored_grid[x][y] = pygame.Color(0)
-            colored_grid[x][y].hsva = (hue, 100, val, 100)
-
-    return colored_grid
+    norm_val = np.asarray(grid) / 255
+    hue = np.trunc(start_hue + (end_hue - start_hue) * norm_val).astype(int) % 360
+    return hsv_grid(hue, 100, (norm_val * 100).astype(int))
 
 def interactive_noise_control(noise_grid, colored_grid):
     keys = pygame.key.get_pressed()
@@ -896,9 +781,9 @@ def main():
             noise_grid = generate_layered_noise(noise_grid, layers=4, persistence=0.5, scale=12)
             colored_grid = apply_color_gradient(noise_grid, 0 , 360)
 
-        screen.fill((0,0,0))
-        draw_grid(screen, colored_grid)
-        pygame.display.flip()
+        # the grid covers the whole window, nothing to redraw while it stays the same
+        if draw_grid(screen, colored_grid):
+            pygame.display.flip()
         clock.tick(30)
         frame += 1
 
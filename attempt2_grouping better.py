@@ -1,7 +1,9 @@
 import pygame
 import random
-from perlin_noise import PerlinNoise
 import math
+import numpy as np
+from index.noise_field import NoiseField
+from index.presenter import GridPresenter
 
 pygame.init()
 WIDTH, HEIGHT = 800, 600
@@ -11,28 +13,25 @@ GRID_H = HEIGHT // PIXEL_SIZE
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Cosmic Space Art")
 
-noise = PerlinNoise(octaves=5)
+noise = NoiseField(octaves=5)
+rng = np.random.default_rng(random.getrandbits(32))
 colors = [(25,25,112), (72,61,139), (123,104,238), (255,255,255), (255,215,0), (199,21,133), (0,255,255), (34,139,34)]
 contrast_colors = [(255,0,100), (0,255,200), (255,255,0), (255,255,255)]
 
-space_grid = []
-for x in range(GRID_W):
-    col = []
-    for y in range(GRID_H):
-        val = noise([x/GRID_W, y/GRID_H])
-        idx = int((val+1)/2 * (len(colors) - 1))
-        base = colors[idx]
-        if random.random() < 0.08:
-            base = random.choice(contrast_colors)
-        col.append(base)
-    space_grid.append(col)
+# grids are (GRID_W, GRID_H, 3) int16 arrays, x first like the surfarray layout; every effect
+# below works on the whole array and keeps the values in 0..255
+XS = np.arange(GRID_W)[:, None]
+YS = np.arange(GRID_H)[None, :]
+
+val = noise.grid(np.arange(GRID_W)/GRID_W, np.arange(GRID_H)/GRID_H).T
+space_grid = np.array(colors, dtype=np.int16)[((val+1)/2 * (len(colors) - 1)).astype(int)]
+contrast = rng.random((GRID_W, GRID_H)) < 0.08
+space_grid[contrast] = np.array(contrast_colors, dtype=np.int16)[rng.integers(len(contrast_colors), size=contrast.sum())]
+
+grid_view = GridPresenter(GRID_W, GRID_H, PIXEL_SIZE)
 
 def draw_space_grid(surface, grid):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            c = grid[x][y]
-            rect = pygame.Rect(x*PIXEL_SIZE, y*PIXEL_SIZE, PIXEL_SIZE, PIXEL_SIZE)
-            pygame.draw.rect(surface, c, rect)
+    return grid_view.present(surface, grid)
 
 clock = pygame.time.Clock()
 
@@ -45,77 +44,36 @@ def random_star(surface, count, star_colors):
         pygame.draw.circle(surface, color, (x, y), r)
 
 def animate_nebula(grid, frame):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            fx = math.sin(frame*0.03 + x*0.1)*0.5 + 0.5
-            fy = math.cos(frame*0.03 + y*0.1)*0.5 + 0.5
-            shift = int(40*fx*fy)
-            col = grid[x][y]
-            grid[x][y] = (max(0, col[0]-shift), max(0, col[1]-shift), min(255, col[2]+shift))
+    fx = np.sin(frame*0.03 + XS*0.1)*0.5 + 0.5
+    fy = np.cos(frame*0.03 + YS*0.1)*0.5 + 0.5
+    shift = (40*fx*fy).astype(np.int16)
+    grid[..., :2] = np.maximum(0, grid[..., :2] - shift[..., None])
+    grid[..., 2] = np.minimum(255, grid[..., 2] + shift)
 
 def pulse_grid(grid, phase):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            amp = int(16*math.sin(phase + x*0.2 + y*0.23))
-            c = grid[x][y]
-            grid[x][y] = (min(255, max(0, c[0]+amp)), min(255, max(0, c[1]-amp)), min(255, max(0, c[2]+amp)))
+    amp = (16*np.sin(phase + XS*0.2 + YS*0.23)).astype(np.int16)[..., None]
+    grid[:] = np.clip(grid + amp*np.array([1, -1, 1], dtype=np.int16), 0, 255)
 
 def randomize_contrast(grid, intensity):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            if random.random() < intensity:
-                idx = random.randint(0, len(contrast_colors)-1)
-                grid[x][y] = contrast_colors[idx]
+    hit = rng.random(grid.shape[:2]) < intensity
+    grid[hit] = np.array(contrast_colors, dtype=np.int16)[rng.integers(len(contrast_colors), size=hit.sum())]
 
 def overlay_nebula(grid, freq, amplitude):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            cell = grid[x][y]
-            nebval = int(amplitude * math.sin(freq*x + freq*y))
-            grid[x][y] = (min(255, cell[0]+nebval), min(255, cell[1]+nebval), min(255, cell[2]+nebval))
+    nebval = (amplitude * np.sin(freq*XS + freq*YS)).astype(np.int16)
+    grid[:] = np.clip(grid + nebval[..., None], 0, 255)
 
 def circular_gradient(center, radius, color_a, color_b):
-    grad = []
-    for x in range(GRID_W):
-        col = []
-        for y in range(GRID_H):
-            dx = x - center[0]
-            dy = y - center[1]
-            dist = math.sqrt(dx*dx + dy*dy)
-            inter = min(1, dist/radius)
-            r = int(color_a[0]*(1-inter) + color_b[0]*inter)
-            g = int(color_a[1]*(1-inter) + color_b[1]*inter)
-            b = int(color_a[2]*(1-inter) + color_b[2]*inter)
-            col.append((r,g,b))
-        grad.append(col)
-    return grad
+    inter = np.minimum(1, np.hypot(XS-center[0], YS-center[1])/radius)[..., None]
+    return (np.array(color_a)*(1-inter) + np.array(color_b)*inter).astype(np.int16)
 
 def blend_grids(grid1, grid2, alpha):
-    out = []
-    for x in range(len(grid1)):
-        row = []
-        for y in range(len(grid1[0])):
-            c1 = grid1[x][y]
-            c2 = grid2[x][y]
-            r = int(c1[0]*(1-alpha) + c2[0]*alpha)
-            g = int(c1[1]*(1-alpha) + c2[1]*alpha)
-            b = int(c1[2]*(1-alpha) + c2[2]*alpha)
-            row.append((r,g,b))
-        out.append(row)
-    return out
+    return (grid1*(1-alpha) + grid2*alpha).astype(np.int16)
 
 def draw_grid(surface, grid):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            c = grid[x][y]
-            rect = pygame.Rect(x*PIXEL_SIZE, y*PIXEL_SIZE, PIXEL_SIZE, PIXEL_SIZE)
-            pygame.draw.rect(surface, c, rect)
+    return grid_view.present(surface, grid)
 
 def fade_grid(grid, amt):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            r,g,b = grid[x][y]
-            grid[x][y] = (max(0,r-amt), max(0,g-amt), max(0,b-amt))
+    np.maximum(grid-amt, 0, out=grid)
 
 def comet_path(surface, frame, color):
     tail_len = 60
@@ -126,12 +84,9 @@ def comet_path(surface, frame, color):
         pygame.draw.circle(surface, color, (x,y), max(1, int(10-i*0.15)))
 
 def twinkle(grid, frame):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            if random.random() < 0.01:
-                amp = int(50*math.sin(frame*0.05 + x + y))
-                r,g,b = grid[x][y]
-                grid[x][y] = (min(255,r+amp), min(255,g+amp), min(255,b+amp))
+    xs, ys = np.nonzero(rng.random(grid.shape[:2]) < 0.01)
+    amp = (50*np.sin(frame*0.05 + xs + ys)).astype(np.int16)
+    grid[xs, ys] = np.clip(grid[xs, ys] + amp[:, None], 0, 255)
 
 def apply_starburst(surface, cx, cy, rays, radius, color):
     for i in range(rays):
@@ -141,10 +96,7 @@ def apply_starburst(surface, cx, cy, rays, radius, color):
         pygame.draw.line(surface, color, (cx, cy), (x, y), 2)
 
 def invert_colors(grid):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            r,g,b = grid[x][y]
-            grid[x][y] = (255-r, 255-g, 255-b)
+    np.subtract(255, grid, out=grid)
 
 def add_ring(surface, center, max_radius, color, thickness):
     for r in range(max_radius-thickness, max_radius+1):
@@ -158,34 +110,16 @@ def sprinkle_comet_tails(surface, frame):
         add_ring(surface, (cx,cy), random.randint(30,100), color, random.randint(2,7))
 
 def overlay_gradient(grid, grad_grid, alpha):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            base = grid[x][y]
-            grad = grad_grid[x][y]
-            r = int(base[0]*(1-alpha) + grad[0]*alpha)
-            g = int(base[1]*(1-alpha) + grad[1]*alpha)
-            b = int(base[2]*(1-alpha) + grad[2]*alpha)
-            grid[x][y] = (r,g,b)
+    grid[:] = grid*(1-alpha) + grad_grid*alpha
 
 def wave_warp(grid, freq, amplitude, frame):
-    warped = []
-    for x in range(len(grid)):
-        col = []
-        for y in range(len(grid[0])):
-            offset = int(amplitude * math.sin(2 * math.pi * y / GRID_H + freq * frame))
-            src_x = (x + offset) % len(grid)
-            col.append(grid[src_x][y])
-        warped.append(col)
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            grid[x][y] = warped[x][y]
+    # every column y slides sideways by its own offset: one gather
+    offset = (amplitude * np.sin(2 * np.pi * YS / GRID_H + freq * frame)).astype(int)
+    grid[:] = grid[(XS + offset) % len(grid), YS]
 
 def noise_variance(grid, intensity):
-    for x in range(len(grid)):
-        for y in range(len(grid[0])):
-            r,g,b = grid[x][y]
-            n = random.randint(-intensity, intensity)
-            grid[x][y] = (max(0,min(255,r+n)), max(0,min(255,g+n)), max(0,min(255,b+n)))
+    n = rng.integers(-intensity, intensity+1, size=grid.shape[:2], dtype=np.int16)
+    grid[:] = np.clip(grid + n[..., None], 0, 255)
 
 def save_image(surface, filename):
     pygame.image.save(surface, filename)
@@ -0,0 +1,179 @@
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import multiprocessing
+import signal
+import time
+import traceback
+
+# Headless batch renderer: python index/batch.py --count 1000 --seed 0 --out wallpapers/
+# Every worker owns one windowless WallpaperCreator; seed N always renders to the same wallpaper_N.png.
+# With --cache the workers share one RenderCache directory and a seed that was rendered before
+# (same size and renderer version) is just copied out of it.
+# --profile writes a chrome://tracing file of the stage timings next to every wallpaper.
+# With --buffers DIR every worker draws its low-res scene straight into a shared memmapped
+# buffers.BufferStore instead of a private canvas. Rerunning the same command after a crash skips
+# the seeds whose buffers are done and only encodes the PNGs that are missing, from the buffers.
+# --parent-encode (with --buffers) leaves the PNGs to the parent: workers only draw into their slot
+# and the parent encodes it off the mapping as the results come in. It pays off when there are more
+# cores than workers; with a worker per core the single encoding parent becomes the bottleneck.
+# Only the low buffer is mapped: nebula, atmospheres and flares are layers of the scene drawn into
+# the canvas (main.scene_layers), so the canvas is the whole image and there is nothing else to share.
+
+creator = None
+write_specs = False
+store = None
+parent_encode = False
+
+def init_worker(width, height, block_size, specs=False, cache_dir=None, cache_mb=256, png_level=6, profile=None,
+                noise_dir=None, buffer_dir=None, encode_in_parent=False):
+    global creator, write_specs, store, parent_encode
+    from main import WallpaperCreator
+    from render_cache import RenderCache
+    from profiler import StageProfiler
+    from noise_cache import noise_fields
+    from buffers import BufferStore
+    if noise_dir:
+        noise_fields.root = noise_dir
+        os.makedirs(noise_dir, exist_ok=True)
+    cache = RenderCache(cache_dir, cache_mb*1024*1024) if cache_dir else None
+    profiler = StageProfiler(memory=profile == "memory") if profile else None
+    creator = WallpaperCreator(width, height, block_size, headless=True, cache=cache, png_level=png_level, profiler=profiler)
+    # if anything in the worker initialised SDL it took SIGTERM, take it back so the pool can stop the workers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    write_specs = specs
+    store = BufferStore.open(buffer_dir) if buffer_dir else None
+    parent_encode = encode_in_parent and store is not None
+
+def write_png(write, path):
+    # temp name + rename, so a wallpaper that exists is complete even after a crash
+    tmp = os.path.splitext(path)[0] + ".part.png"
+    write(tmp)
+    os.replace(tmp, path)
+
+def render_one(job):
+    try:
+        return render_job(job)
+    except Exception:
+        # a plain error carrying the worker's traceback: an exception that can't be pickled back
+        # kills the pool's result thread and leaves the parent waiting forever
+        raise RuntimeError(f"seed {job[0]} failed in worker:\n{traceback.format_exc()}") from None
+
+def render_job(job):
+    from main import plan_scene, save_scene_spec
+    from canvas import PixelCanvas
+    seed, path = job
+    if store is not None:
+        slot = seed - store.meta["seed"]
+        creator.canvas = PixelCanvas(creator.low_w, creator.low_h, pixels=store.slot(slot))
+    t0 = time.perf_counter()
+    spec = plan_scene(seed, creator.low_w, creator.low_h)
+    creator.spec = spec
+    hit = creator.cache is not None and creator.cache.get_png(creator.cache_key(png=True), path)
+    if not hit:
+        creator.load_scene(spec)
+        if store is not None: store.mark_done(slot)
+    t1 = time.perf_counter()
+    if not hit and not parent_encode:
+        write_png(creator.write_wallpaper, path)
+        if creator.cache: creator.cache.put_png(creator.cache_key(png=True), path)
+    if write_specs:
+        save_scene_spec(spec, os.path.splitext(path)[0] + ".json")
+    if creator.profiler.enabled:
+        creator.profiler.to_chrome_trace(os.path.splitext(path)[0] + ".trace.json")
+        creator.profiler.clear()
+    t2 = time.perf_counter()
+    # the parent needs the key to cache a PNG it encodes
+    key = creator.cache_key(png=True) if parent_encode and creator.cache and not hit else None
+    return seed, path, t1-t0, t2-t1, hit, key
+
+def run_batch(count, width=1600, height=1100, block_size=8, seed=0, out_dir="wallpapers", workers=None, specs=False,
+              cache_dir=None, cache_mb=256, png_level=6, profile=None, noise_dir=None, buffer_dir=None,
+              encode_in_parent=False):
+    from render_cache import RenderCache
+    from png_stream import save_png_blocks
+    if encode_in_parent and not buffer_dir:
+        raise ValueError("encoding in the parent needs buffer_dir, it reads the workers' buffers")
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(s, os.path.join(out_dir, f"wallpaper_{s}.png")) for s in range(seed, seed+count)]
+    timings = []
+    hits = 0
+    start = time.perf_counter()
+    buffers = None
+    if buffer_dir:
+        jobs, buffers = resume_from_buffers(jobs, buffer_dir, width, height, block_size, count, seed, png_level)
+    cache = RenderCache(cache_dir, cache_mb*1024*1024) if cache_dir and encode_in_parent else None
+    if not jobs:
+        print(f"nothing to render, all {count} wallpapers done in {time.perf_counter()-start:.2f}s")
+        return timings
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, init_worker, (width, height, block_size, specs, cache_dir, cache_mb, png_level, profile, noise_dir,
+                                         buffer_dir, encode_in_parent)) as pool:
+        for s, path, gen_t, save_t, hit, key in pool.imap_unordered(render_one, jobs):
+            if encode_in_parent and not hit:
+                t = time.perf_counter()
+                write_png(lambda f: save_png_blocks(buffers.slot(s-seed), width, height, f, png_level), path)
+                if cache and key: cache.put_png(key, path)
+                save_t += time.perf_counter()-t
+            timings.append((s, gen_t, save_t))
+            hits += hit
+            print(f"seed {s}: {'cached' if hit else 'rendered'}, generate {gen_t*1000:.1f}ms, save {save_t*1000:.1f}ms -> {path}")
+        # a failed job raises out of the loop and the with block terminates the rest
+        pool.close()
+        pool.join()
+    total = time.perf_counter()-start
+    # resumed seeds aren't in the rate, only what this run rendered
+    done = len(timings)
+    busy = sum(g+s for _, g, s in timings)
+    print(f"{done} wallpapers ({width}x{height}) in {total:.2f}s: {done/total:.2f} img/s, "
+          f"{done*width*height/total/1e6:.1f} Mpx/s, {busy/done*1000:.1f}ms per image per worker"
+          + (f", {hits}/{done} from cache" if cache_dir else ""))
+    return timings
+
+def resume_from_buffers(jobs, buffer_dir, width, height, block_size, count, seed, png_level=6):
+    # -> (jobs still to render, the store); done seeds with no PNG yet are encoded here, straight off the memmap
+    from main import RENDER_VERSION
+    from buffers import BufferStore
+    from png_stream import save_png_blocks
+    buffers = BufferStore(buffer_dir, {"w": width//block_size, "h": height//block_size, "count": count, "seed": seed,
+                                       "width": width, "height": height, "version": RENDER_VERSION})
+    encoded = 0
+    for s, path in jobs:
+        if buffers.is_done(s-seed) and not os.path.exists(path):
+            write_png(lambda f: save_png_blocks(buffers.slot(s-seed), width, height, f, png_level), path)
+            encoded += 1
+    todo = [job for job in jobs if not buffers.is_done(job[0]-seed)]
+    if len(todo) < len(jobs):
+        print(f"resuming from {buffer_dir}: {len(jobs)-len(todo)} done ({encoded} encoded from buffers), {len(todo)} to render")
+    return todo, buffers
+
+def main():
+    parser = argparse.ArgumentParser(description="Render wallpapers without a display.")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1100)
+    parser.add_argument("--block-size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0, help="first seed, renders seed .. seed+count-1")
+    parser.add_argument("--out", default="wallpapers")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument("--specs", action="store_true", help="also write each scene spec as wallpaper_N.json")
+    parser.add_argument("--cache", default=None, help="render cache directory, off by default")
+    parser.add_argument("--cache-mb", type=int, default=256, help="evict least recently used renders past this size")
+    parser.add_argument("--png-level", type=int, default=6, choices=range(10), metavar="0-9",
+                        help="zlib level, 1 is fastest, 9 smallest")
+    parser.add_argument("--profile", nargs="?", const="time", choices=["time", "memory"],
+                        help="write a Chrome trace of every stage as wallpaper_N.trace.json, 'memory' adds tracemalloc peaks")
+    parser.add_argument("--noise-cache", default=None, help="directory to keep evaluated noise fields in, shared by the workers")
+    parser.add_argument("--buffers", default=None,
+                        help="render into memmapped low-res buffers here (/dev/shm for shared memory), reruns resume")
+    parser.add_argument("--parent-encode", action="store_true",
+                        help="with --buffers, encode the PNGs in the parent instead of the workers")
+    args = parser.parse_args()
+    if args.parent_encode and not args.buffers:
+        parser.error("--parent-encode needs --buffers")
+    run_batch(args.count, args.width, args.height, args.block_size, args.seed, args.out, args.workers, args.specs,
+              args.cache, args.cache_mb, args.png_level, args.profile, args.noise_cache, args.buffers, args.parent_encode)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pygame
+import main
+from canvas import PixelCanvas
+from noise_field import NoiseField
+from png_stream import save_png_blocks
+import dither
+import hsv
+import quantize
+from noise_cache import noise_fields
+from sprites import cache as sprite_cache
+
+# Stage and end-to-end timings at fixed seeds:
+#   python index/bench.py --sizes 1600x1100 3200x2200 --seeds 1 2 --out bench.json
+#   python index/bench.py --out new.json --compare bench.json
+# Each stage runs on its own, on a canvas that already holds everything drawn before it (set up
+# outside the timer), and random is reseeded before every run so all runs do the same work.
+# --compare matches rows on (stage, size, seed) and flags medians that got slower by more than
+# --threshold (and by more than --min-ms, so sub-millisecond jitter isn't a regression); the exit
+# status is 1 when anything regressed.
+# Every module-level cache (noise fields, sprites, palette and HSV lookup tables, dither blue
+# noise) is emptied before every run, so each repeat times a cold render. meta["cold_caches"]
+# names the caches that were emptied; --compare warns when the baseline's list differs.
+
+COLD_CACHES = ("noise_fields", "sprites", "quantize_luts", "hsv_luts", "dither_blue_noise")
+
+def cold():
+    noise_fields.clear()
+    sprite_cache.clear()
+    quantize._luts.clear()
+    hsv._luts.clear()
+    dither._blue.clear()
+
+def timed(fn, setup=None, repeat=5):
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        cold()
+        t = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter()-t)
+    return min(times), statistics.median(times)
+
+def stage_table(spec, width, height, tmp):
+    # (name, setup, fn): setup returns the fresh object a run works on
+    low_w, low_h = spec["size"]
+    seed = spec["seed"]
+    stars = spec["stars"]
+    planet = spec["planets"][0] if spec["planets"] else None
+    positions = [(p["cx"], p["cy"], p["r"]) for p in spec["planets"]]
+    base = PixelCanvas(low_w, low_h)
+    main.draw_px_gradient_bg(base, spec["background"])
+    with_bg = base.pixels.copy()
+    main.render_scene(base, spec)
+    full = base.pixels.copy()
+    palette = main.random_palette(16, rng=random.Random(seed))
+
+    def canvas(pixels):
+        def setup():
+            random.seed(seed)
+            c = PixelCanvas(low_w, low_h)
+            c.pixels[:] = pixels
+            return c
+        return setup
+
+    def surface():
+        return pygame.image.frombuffer(full.copy(), (low_w, low_h), "RGB").copy()
+
+    def draw_stars(c):
+        clump = stars.get("clump")
+        dmap = None if clump is None else main.nebula_density(c.w, c.h, clump["octaves"], clump["seed"], clump["bias"])
+        main.draw_px_stars(c, stars["density"], stars["palette"], stars["seed"], dmap)
+
+    def draw_planet(c):
+        noise = NoiseField(octaves=planet["octaves"], seed=planet["noise_seed"])
+        main.draw_px_planet(c, planet["cx"], planet["cy"], planet["r"], planet["palette"], noise, len(planet["palette"]))
+
+    table = [
+        ("gradient_bg", canvas(full), lambda c: main.draw_px_gradient_bg(c, spec["background"])),
+        ("stars", canvas(with_bg), draw_stars),
+        ("nebula", canvas(with_bg), lambda c: main.draw_px_nebula(c, spec["background"], octaves=4)),
+        ("planet", canvas(with_bg), draw_planet),
+        ("planet_shadow", canvas(full), lambda c: main.draw_planet_shadow(c, planet["cx"], planet["cy"], planet["r"], alpha=planet["shadow"])),
+        ("rings", canvas(full), lambda c: main.draw_px_rings(c, planet["cx"], planet["cy"], planet["r"], planet["palette"],
+                                                            planet["rings"], planet["ring_fade"], planet["ring_gaps"], planet["ring_seed"])),
+        ("moons", canvas(full), lambda c: main.generate_moons(c, positions)),
+        ("atmosphere", canvas(full), lambda c: main.draw_atmosphere_layer(c, planet)),
+        ("flares", canvas(full), lambda c: main.draw_flares_layer(c, planet)),
+        ("quantize_colors", surface, lambda s: main.quantize_colors(s, palette)),
+        ("soften_edges", surface, lambda s: main.soften_artifact_edges(s)),
+        ("upscale_px", surface, lambda s: main.upscale_px(s, (width, height))),
+        ("png_save", None, lambda _: save_png_blocks(full, width, height, tmp)),
+    ]
+    if planet is None:
+        # scene too small for any planet, nothing to time for those stages
+        table = [row for row in table if row[0] not in ("planet", "planet_shadow", "rings", "atmosphere", "flares")]
+    return table
+
+def end_to_end(width, height, block_size, seed, tmp, repeat):
+    wc = main.WallpaperCreator(width, height, block_size, headless=True)
+    def run(_):
+        wc.generate_scene(seed)
+        wc.save_wallpaper(tmp)
+    return timed(run, repeat=repeat)
+
+def run(sizes, seeds, block_size=8, repeat=5, stages=None):
+    pygame.init()
+    rows = []
+    with tempfile.TemporaryDirectory() as d:
+        tmp = os.path.join(d, "bench.png")
+        for width, height in sizes:
+            for seed in seeds:
+                spec = main.plan_scene(seed, width//block_size, height//block_size)
+                table = stage_table(spec, width, height, tmp)
+                for name, setup, fn in table:
+                    if stages and name not in stages: continue
+                    best, med = timed(fn, setup, repeat)
+                    rows.append({"stage": name, "size": f"{width}x{height}", "seed": seed,
+                                 "best_ms": best*1000, "median_ms": med*1000})
+                if not stages or "end_to_end" in stages:
+                    best, med = end_to_end(width, height, block_size, seed, tmp, repeat)
+                    rows.append({"stage": "end_to_end", "size": f"{width}x{height}", "seed": seed,
+                                 "best_ms": best*1000, "median_ms": med*1000})
+    return {"meta": {"python": platform.python_version(), "numpy": np.__version__,
+                     "pygame": pygame.version.ver, "machine": platform.machine(), "system": platform.system(),
+                     "block_size": block_size, "repeat": repeat, "render_version": main.RENDER_VERSION, "cold_caches": list(COLD_CACHES),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            "results": rows}
+
+def compare(report, baseline, threshold=0.15, min_ms=0.5):
+    # -> rows of (stage, size, seed, base median, new median, ratio, regressed)
+    old = {(r["stage"], r["size"], r["seed"]): r for r in baseline["results"]}
+    out = []
+    for r in report["results"]:
+        b = old.get((r["stage"], r["size"], r["seed"]))
+        if b is None: continue
+        ratio = r["median_ms"]/max(b["median_ms"], 1e-9)
+        regressed = ratio > 1+threshold and r["median_ms"]-b["median_ms"] > min_ms
+        out.append((r["stage"], r["size"], r["seed"], b["median_ms"], r["median_ms"], ratio, regressed))
+    return out
+
+def print_report(report):
+    print(f"{'stage':16} {'size':>10} {'seed':>6} {'best ms':>10} {'median ms':>10}")
+    for r in report["results"]:
+        print(f"{r['stage']:16} {r['size']:>10} {r['seed']:>6} {r['best_ms']:10.2f} {r['median_ms']:10.2f}")
+
+def print_comparison(rows):
+    print(f"{'stage':16} {'size':>10} {'seed':>6} {'base ms':>10} {'new ms':>10} {'ratio':>7}")
+    for stage, size, seed, base, new, ratio, regressed in rows:
+        print(f"{stage:16} {size:>10} {seed:>6} {base:10.2f} {new:10.2f} {ratio:7.2f}{'  REGRESSION' if regressed else ''}")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Time every draw stage and a full generate + save at fixed seeds.")
+    parser.add_argument("--sizes", nargs="+", default=["1600x1100", "3200x2200"])
+    parser.add_argument("--seeds", nargs="+", type=int, default=[1, 2, 3])
+    parser.add_argument("--block-size", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stages", nargs="+", help="only these stages (names as in the report)")
+    parser.add_argument("--out", help="write the report as JSON")
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+    report = run([tuple(int(v) for v in s.split("x")) for s in args.sizes], args.seeds,
+                 args.block_size, args.repeat, args.stages)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+    if not args.compare:
+        print_report(report)
+        return 0
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    for k in ("render_version", "cold_caches", "block_size"):
+        if baseline["meta"].get(k) != report["meta"].get(k):
+            print(f"warning: baseline {k} is {baseline['meta'].get(k)}, this run {report['meta'].get(k)}; timings may not be comparable")
+    rows = compare(report, baseline, args.threshold, args.min_ms)
+    print_comparison(rows)
+    regressions = sum(r[-1] for r in rows)
+    print(f"{regressions} regression(s) in {len(rows)} matched rows")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,74 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import time
+import numpy as np
+import dither
+
+# Dither throughput in Mpx/s: python index/bench_dither.py --sizes 200x137 1600x1100
+# "legacy" is the per-pixel Floyd-Steinberg quantize_colors used to run, it is only timed on a
+# small crop because it takes minutes at wallpaper size.
+
+def legacy_floyd_steinberg(arr, palette):
+    # arr is surfarray layout (W, H, 3), dithered in place exactly like the old quantize_colors
+    for x in range(arr.shape[0]):
+        for y in range(arr.shape[1]):
+            orig = tuple(arr[x, y])
+            idx = min(range(len(palette)), key=lambda i: sum((orig[j]-palette[i][j])**2 for j in range(3)))
+            c = palette[idx]
+            error = [orig[j]-c[j] for j in range(3)]
+            arr[x,y] = c
+            if x+1<arr.shape[0]: arr[x+1,y] = [min(255,max(0,arr[x+1,y][j]+error[j]*7/16)) for j in range(3)]
+            if x-1>=0 and y+1<arr.shape[1]: arr[x-1,y+1] = [min(255,max(0,arr[x-1,y+1][j]+error[j]*3/16)) for j in range(3)]
+            if y+1<arr.shape[1]: arr[x,y+1] = [min(255,max(0,arr[x,y+1][j]+error[j]*5/16)) for j in range(3)]
+            if x+1<arr.shape[0] and y+1<arr.shape[1]: arr[x+1,y+1] = [min(255,max(0,arr[x+1,y+1][j]+error[j]*1/16)) for j in range(3)]
+
+def test_image(w, h, seed=0):
+    # smooth gradients plus noise, the worst case for banding
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:h, 0:w]
+    img = np.stack([x/w*255, y/h*255, (x+y)/(w+h)*255], -1) + rng.normal(0, 12, (h, w, 3))
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+def mpx_per_s(fn, pixels, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter()-t)
+    return pixels/best/1e6, best
+
+def run(sizes, palette_size=16, repeat=3, legacy_size=(48, 32)):
+    from main import random_palette
+    import random
+    random.seed(0)
+    palette = random_palette(palette_size)
+    dither.dither(test_image(8, 8), palette)  # builds the palette cube outside the timings
+    rows = []
+    lw, lh = legacy_size
+    arr = test_image(lw, lh).swapaxes(0, 1).copy()
+    rate, best = mpx_per_s(lambda: legacy_floyd_steinberg(arr.copy(), palette), lw*lh, 1)
+    rows.append(("legacy", f"{lw}x{lh}", rate, best))
+    for w, h in sizes:
+        img = test_image(w, h)
+        for mode in dither.MODES:
+            rate, best = mpx_per_s(lambda: dither.dither(img, palette, mode), w*h, repeat)
+            rows.append((mode, f"{w}x{h}", rate, best))
+    legacy_rate = rows[0][2]
+    print(f"{'mode':16} {'size':>10} {'Mpx/s':>10} {'ms':>10} {'x legacy':>10}")
+    for mode, size, rate, best in rows:
+        print(f"{mode:16} {size:>10} {rate:10.3f} {best*1000:10.1f} {rate/legacy_rate:10.0f}")
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dither modes against the old per-pixel loop.")
+    parser.add_argument("--sizes", nargs="+", default=["200x137", "1600x1100"])
+    parser.add_argument("--palette-size", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run([tuple(int(v) for v in s.split("x")) for s in args.sizes], args.palette_size, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Blurs on whole arrays. Box sums come from prefix sums (an integral image done one axis at a
+# time), so every output value costs the same few adds whatever the radius. Windows are clipped
+# at the edges and averaged over the cells that are actually inside, like the old loops did.
+# The Gaussian is separable: one 1D kernel along each axis, renormalised near the edges.
+
+def window_sum(a, radius, axis):
+    # sum over [i-radius, i+radius] along axis, clipped to the array
+    n = a.shape[axis]
+    c = np.cumsum(a, axis=axis)
+    c = np.concatenate([np.zeros_like(np.take(c, [0], axis=axis)), c], axis=axis)
+    i = np.arange(n)
+    hi = np.minimum(n, i+radius+1)
+    lo = np.maximum(0, i-radius)
+    return np.take(c, hi, axis=axis) - np.take(c, lo, axis=axis)
+
+def window_count(n, radius):
+    i = np.arange(n)
+    return np.minimum(n, i+radius+1) - np.maximum(0, i-radius)
+
+def box_sum(a, radius):
+    # 2D box sum over the first two axes, any trailing (channel) axes ride along
+    a = np.asarray(a)
+    acc = np.int64 if np.issubdtype(a.dtype, np.integer) or a.dtype == bool else np.float64
+    return window_sum(window_sum(a.astype(acc), radius, 0), radius, 1)
+
+def box_counts(shape, radius):
+    return np.outer(window_count(shape[0], radius), window_count(shape[1], radius))
+
+def box_blur(a, radius):
+    a = np.asarray(a)
+    counts = box_counts(a.shape, radius).reshape(a.shape[:2] + (1,)*(a.ndim-2))
+    return box_sum(a, radius)/counts
+
+def box_mean_floor(a, radius):
+    # sum(window)//len(window) for every cell, the integer mean the grid helpers used
+    a = np.asarray(a)
+    counts = box_counts(a.shape, radius).reshape(a.shape[:2] + (1,)*(a.ndim-2))
+    return box_sum(a, radius)//counts
+
+def gaussian_kernel(sigma, radius=None):
+    radius = int(3*sigma + 0.5) if radius is None else radius
+    x = np.arange(-radius, radius+1)
+    k = np.exp(-x*x/(2*sigma*sigma))
+    return k/k.sum()
+
+def blur_axis(a, kernel, axis):
+    r = len(kernel)//2
+    n = a.shape[axis]
+    a = np.moveaxis(a, axis, 0)
+    out = np.zeros(a.shape, dtype=np.float64)
+    norm = np.zeros(n)
+    for off, w in zip(range(-r, r+1), kernel):
+        lo, hi = max(0, -off), min(n, n-off)
+        if lo >= hi: continue
+        out[lo:hi] += w*a[lo+off:hi+off]
+        norm[lo:hi] += w
+    out /= norm.reshape((n,) + (1,)*(a.ndim-1))
+    return np.moveaxis(out, 0, axis)
+
+def gaussian_blur(a, sigma, radius=None):
+    # separable Gaussian over the first two axes, for soft glows (atmospheres, haze)
+    if sigma <= 0: return np.asarray(a, dtype=np.float64)
+    k = gaussian_kernel(sigma, radius)
+    return blur_axis(blur_axis(np.asarray(a, dtype=np.float64), k, 0), k, 1)
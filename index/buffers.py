@@ -0,0 +1,64 @@
+import json
+import os
+import numpy as np
+
+# Disk-backed low-res buffers for batch runs. A store is a directory holding one .npy per layer,
+# shaped (count, h, w, 3) and opened with open_memmap, plus done.npy with a flag per slot and
+# meta.json describing the run. Workers open the same files and draw straight into their slot
+# (PixelCanvas(pixels=store.slot(i))), so nothing is pickled back; the parent reads, upscales or
+# encodes a slot through the same mapping without copying it. Slots are only flagged done after
+# their pixels are flushed, so after a crash the done slots are complete and a rerun only renders
+# the rest. Put root on /dev/shm to keep it in shared memory instead of on disk.
+
+class BufferStore:
+    def __init__(self, root, meta, layers=("low",)):
+        # meta must hold w, h and count; opening an existing store checks it was made for the same run
+        self.root = root
+        self.layers = tuple(layers)
+        meta = dict(meta, layers=list(self.layers))
+        meta_path = os.path.join(root, "meta.json")
+        shape = (meta["count"], meta["h"], meta["w"], 3)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                old = json.load(f)
+            if old != json.loads(json.dumps(meta)):
+                raise ValueError(f"{root} holds buffers for a different run: {old}")
+            mode = "r+"
+        else:
+            os.makedirs(root, exist_ok=True)
+            mode = "w+"
+        self.maps = {name: np.lib.format.open_memmap(self.path(name), mode=mode, dtype=np.uint8, shape=shape)
+                     for name in self.layers}
+        self.done = np.lib.format.open_memmap(self.path("done"), mode=mode, dtype=np.uint8, shape=(meta["count"],))
+        if mode == "w+":
+            self.done.flush()
+            # written last, a store without it is redone from scratch
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump(meta, f, indent=1)
+            os.replace(meta_path + ".tmp", meta_path)
+        self.meta = meta
+
+    @classmethod
+    def open(cls, root):
+        # for workers, the parent already created it
+        with open(os.path.join(root, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(root, meta, meta["layers"])
+
+    def path(self, name):
+        return os.path.join(self.root, name + ".npy")
+
+    def slot(self, i, layer="low"):
+        return self.maps[layer][i]
+
+    def is_done(self, i):
+        return bool(self.done[i])
+
+    def mark_done(self, i):
+        for m in self.maps.values():
+            m.flush()
+        self.done[i] = 1
+        self.done.flush()
+
+    def pending(self):
+        return [int(i) for i in np.flatnonzero(self.done == 0)]
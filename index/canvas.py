@@ -0,0 +1,68 @@
+import numpy as np
+import pygame
+
+# Low-res frame buffer. pixels is a contiguous (H, W, 3) uint8 array, so rows are y and
+# columns are x (the transpose of what pygame.surfarray hands out).
+#
+# w, h are always the size of the whole scene. Passing window=(x0, y0, x1, y1) only allocates
+# that part of it (a tile); ox, oy is where pixels[0, 0] sits in scene coordinates and every
+# draw call keeps using scene coordinates, anything outside the window is clipped away.
+# pixels=... draws into an existing array instead, e.g. a slot of a buffers.BufferStore.
+
+class PixelCanvas:
+    def __init__(self, w, h, fill=(0, 0, 0), window=None, pixels=None):
+        self.w = w
+        self.h = h
+        x0, y0, x1, y1 = window if window is not None else (0, 0, w, h)
+        self.ox, self.oy = x0, y0
+        if pixels is not None:
+            # draw straight into someone else's buffer (a memmap slot, shared memory), left as it is
+            if pixels.shape != (y1-y0, x1-x0, 3) or pixels.dtype != np.uint8:
+                raise ValueError(f"pixels must be a ({y1-y0}, {x1-x0}, 3) uint8 array, got {pixels.shape} {pixels.dtype}")
+            self.pixels = pixels
+            return
+        self.pixels = np.empty((y1-y0, x1-x0, 3), dtype=np.uint8)
+        self.fill(fill)
+
+    def fill(self, col):
+        self.pixels[:] = col
+
+    def fill_rows(self, cols):
+        # one colour per scene row
+        self.pixels[:] = np.asarray(cols, dtype=np.uint8)[self.oy:self.oy+self.pixels.shape[0], None, :]
+
+    def inside(self, xs, ys):
+        # scene bounds, the same answer for every tile
+        return (xs >= 0) & (xs < self.w) & (ys >= 0) & (ys < self.h)
+
+    def in_window(self, xs, ys):
+        return ((xs >= self.ox) & (xs < self.ox+self.pixels.shape[1]) &
+                (ys >= self.oy) & (ys < self.oy+self.pixels.shape[0]))
+
+    def put(self, xs, ys, cols):
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        ok = self.in_window(xs, ys)
+        cols = np.asarray(cols)
+        if cols.ndim > 1:
+            cols = cols[ok]
+        self.pixels[ys[ok]-self.oy, xs[ok]-self.ox] = cols
+
+    def get(self, xs, ys):
+        return self.pixels[np.asarray(ys)-self.oy, np.asarray(xs)-self.ox]
+
+    def box(self, x0, y0, x1, y1):
+        # clipped view of [x0, x1) x [y0, y1) plus the absolute coords of its columns/rows
+        cx0, cy0 = max(self.ox, x0), max(self.oy, y0)
+        cx1, cy1 = min(self.ox+self.pixels.shape[1], x1), min(self.oy+self.pixels.shape[0], y1)
+        if cx0 >= cx1 or cy0 >= cy1:
+            return None, None, None
+        view = self.pixels[cy0-self.oy:cy1-self.oy, cx0-self.ox:cx1-self.ox]
+        return view, np.arange(cx0, cx1)[None, :], np.arange(cy0, cy1)[:, None]
+
+    def blend(self, view, mask, col, alpha):
+        view[mask] = (view[mask]*(1-alpha) + np.asarray(col)*alpha).astype(np.uint8)
+
+    def to_surface(self):
+        # shares memory with pixels, so this is the only place the frame gets handed to pygame
+        return pygame.image.frombuffer(self.pixels, (self.pixels.shape[1], self.pixels.shape[0]), "RGB")
@@ -0,0 +1,95 @@
+import os
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    # windows: no lock, two stores at once can miscount until the next scan sets it straight
+    fcntl = None
+
+# Byte budget for a cache directory shared by several processes (batch workers on one --cache or
+# --noise-cache). The running total of the cache files is kept in <root>/.usage and every store
+# adds to it under a file lock, so each process counts the others' files as well as its own. The
+# directory is only listed when that total passes max_bytes: then the least recently used files
+# (oldest mtime, hits touch their file) go until it is under low_water of max_bytes, and the total
+# is set from what is really on disk. Only files ending in one of suffixes are counted or removed.
+
+class DiskBudget:
+    def __init__(self, root, max_bytes, suffixes, low_water=0.9):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffixes = tuple(suffixes)
+        self.low_water = low_water
+        self.usage = os.path.join(root, ".usage")
+        self.scans = 0
+
+    @contextmanager
+    def locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        with os.fdopen(os.open(self.usage, os.O_RDWR | os.O_CREAT), "r+") as f:
+            if fcntl: fcntl.flock(f, fcntl.LOCK_EX)
+            yield f
+
+    def files(self):
+        # -> [(mtime, name, size)] oldest first
+        self.scans += 1
+        files = []
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(self.suffixes): continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, entry.name, st.st_size))
+        return sorted(files)
+
+    def read(self, f):
+        f.seek(0)
+        text = f.read().strip()
+        return int(text) if text else None
+
+    def write(self, f, total):
+        f.seek(0)
+        f.truncate()
+        f.write(str(total))
+        f.flush()
+
+    def total(self):
+        with self.locked() as f:
+            total = self.read(f)
+            if total is None:
+                total = sum(size for _, _, size in self.files())
+                self.write(f, total)
+            return total
+
+    def add(self, delta):
+        # after a store that grew the directory by delta bytes; -> the total once evicted
+        with self.locked() as f:
+            total = self.read(f)
+            # no .usage yet (new directory, or one from before it was kept): count what's there
+            total = sum(size for _, _, size in self.files()) if total is None else total+delta
+            if total > self.max_bytes:
+                total = self.evict()
+            self.write(f, total)
+            return total
+
+    def evict(self):
+        # call with the lock held; the newest file stays even if it alone is over the budget
+        files = self.files()
+        total = sum(size for _, _, size in files)
+        for _, name, size in files[:-1]:
+            if total <= self.max_bytes*self.low_water: break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    def reset(self):
+        with self.locked() as f:
+            for _, name, _ in self.files():
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    pass
+            self.write(f, 0)
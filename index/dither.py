@@ -0,0 +1,103 @@
+import numpy as np
+from quantize import palette_key, palette_lut
+
+# Dithering against any palette. pixels are (H, W, 3) arrays (PixelCanvas.pixels, or
+# surfarray.pixels3d(surf).swapaxes(0, 1)); every function returns a new uint8 array.
+#
+# Error diffusion runs as a wavefront instead of pixel by pixel: with both kernels below a pixel
+# only takes error from pixels on its left in the same row or from rows above, at most one
+# column to its right. So every pixel with the same x + 2*y is independent, and each of those
+# anti-diagonals is handled as one array step, W + 2H steps for the whole image.
+# Ordered (Bayer) and blue-noise dithering are a single threshold add + palette lookup.
+
+FLOYD_STEINBERG = [(1, 0, 7/16), (-1, 1, 3/16), (0, 1, 5/16), (1, 1, 1/16)]
+ATKINSON = [(1, 0, 1/8), (2, 0, 1/8), (-1, 1, 1/8), (0, 1, 1/8), (1, 1, 1/8), (0, 2, 1/8)]
+
+def nearest(cols, palette, bits=5):
+    c = np.clip(cols, 0, 255).astype(np.uint8) >> (8-bits)
+    return palette_lut(palette, bits)[c[..., 0], c[..., 1], c[..., 2]]
+
+def error_diffuse(pixels, palette, kernel=FLOYD_STEINBERG):
+    h, w = pixels.shape[:2]
+    pal = np.asarray(palette_key(palette), dtype=np.float32)
+    pad = 2
+    work = np.zeros((h+2*pad, w+2*pad, 3), dtype=np.float32)
+    work[pad:pad+h, pad:pad+w] = pixels
+    out = np.empty((h, w), dtype=np.intp)
+    for t in range(w + 2*(h-1)):
+        y0 = max(0, (t-w+2)//2)
+        y1 = min(h-1, t//2)
+        ys = np.arange(y0, y1+1)
+        xs = t - 2*ys
+        old = work[ys+pad, xs+pad]
+        idx = nearest(old, palette)
+        out[ys, xs] = idx
+        err = old - pal[idx]
+        for dx, dy, weight in kernel:
+            # one shift at a time, so no two sources ever land on the same target
+            work[ys+pad+dy, xs+pad+dx] += err*weight
+    return np.asarray(palette_key(palette), dtype=np.uint8)[out]
+
+def floyd_steinberg(pixels, palette):
+    return error_diffuse(pixels, palette, FLOYD_STEINBERG)
+
+def atkinson(pixels, palette):
+    # only 6/8 of the error is passed on, which keeps highlights and shadows clean
+    return error_diffuse(pixels, palette, ATKINSON)
+
+def bayer_matrix(n):
+    m = np.zeros((1, 1), dtype=np.int64)
+    while len(m) < n:
+        m = np.block([[4*m, 4*m+2], [4*m+3, 4*m+1]])
+    return (m+0.5)/m.size - 0.5
+
+_blue = {}
+
+def blue_noise(size=64, seed=0):
+    # white noise minus its blurred self keeps the high frequencies; ranking the values makes
+    # the thresholds uniform again. Cheap stand-in for void-and-cluster, tiles seamlessly (FFT).
+    key = (size, seed)
+    if key not in _blue:
+        noise = np.random.default_rng(seed).random((size, size))
+        f = np.fft.fftfreq(size)
+        sigma = 1.5
+        lowpass = np.exp(-2*(np.pi*sigma)**2*(f[:, None]**2 + f[None, :]**2))
+        high = noise - np.real(np.fft.ifft2(np.fft.fft2(noise)*lowpass))
+        ranks = np.empty(high.size)
+        ranks[np.argsort(high, axis=None)] = np.arange(high.size)
+        _blue[key] = ((ranks+0.5)/high.size - 0.5).reshape(size, size)
+    return _blue[key]
+
+def palette_spread(palette):
+    # typical distance between palette neighbours, used as the default threshold amplitude
+    pal = np.asarray(palette_key(palette), dtype=np.float64)
+    if len(pal) < 2: return 0.0
+    d = np.sqrt(((pal[:, None, :]-pal[None, :, :])**2).sum(2))
+    d[np.diag_indices(len(pal))] = np.inf
+    return float(np.median(d.min(1)))
+
+def threshold_dither(pixels, palette, thresholds, spread=None):
+    h, w = pixels.shape[:2]
+    th, tw = thresholds.shape
+    spread = palette_spread(palette) if spread is None else spread
+    tiled = np.tile(thresholds, (-(-h//th), -(-w//tw)))[:h, :w, None]
+    idx = nearest(pixels.astype(np.float32) + tiled*spread, palette)
+    return np.asarray(palette_key(palette), dtype=np.uint8)[idx]
+
+def ordered(pixels, palette, n=4, spread=None):
+    return threshold_dither(pixels, palette, bayer_matrix(n), spread)
+
+def blue_noise_dither(pixels, palette, size=64, seed=0, spread=None):
+    return threshold_dither(pixels, palette, blue_noise(size, seed), spread)
+
+MODES = {
+    "floyd-steinberg": floyd_steinberg,
+    "atkinson": atkinson,
+    "bayer": ordered,
+    "blue-noise": blue_noise_dither,
+}
+
+def dither(pixels, palette, mode="floyd-steinberg"):
+    if mode not in MODES:
+        raise ValueError(f"unknown dither mode {mode!r}, expected one of {', '.join(MODES)}")
+    return MODES[mode](pixels, palette)
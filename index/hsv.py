@@ -0,0 +1,59 @@
+import numpy as np
+
+# HSV <-> RGB on whole arrays, giving the same numbers as pygame.Color.hsva (h in degrees,
+# s and v in percent, RGB truncated). The grid scripts keep colour grids as (w, h, 3) int16
+# arrays of h, s, v: hue shifts and brightness changes are integer adds on those, and RGB is only
+# made for drawing. Saturation is almost always 100 there, so that goes through a cached
+# hue x value table and a hue shift is just a rotated index into it.
+
+def hsv_to_rgb(hsv):
+    hsv = np.asarray(hsv, dtype=np.float64)
+    h = hsv[..., 0] % 360
+    s = hsv[..., 1]/100
+    v = hsv[..., 2]/100
+    hi = np.floor(h/60).astype(int) % 6
+    f = h/60 - np.floor(h/60)
+    p = v*(1-s)
+    q = v*(1-s*f)
+    t = v*(1-s*(1-f))
+    r = np.choose(hi, [v, q, p, p, t, v])
+    g = np.choose(hi, [t, v, v, q, p, p])
+    b = np.choose(hi, [p, p, t, v, v, q])
+    return (np.stack([r, g, b], -1)*255).astype(np.uint8)
+
+def rgb_to_hsv(rgb):
+    rgb = np.asarray(rgb, dtype=np.float64)/255
+    mx = rgb.max(-1)
+    mn = rgb.min(-1)
+    delta = mx - mn
+    safe = np.where(delta == 0, 1, delta)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    h = np.where(mx == r, ((g-b)/safe) % 6, np.where(mx == g, (b-r)/safe + 2, (r-g)/safe + 4))*60
+    h = np.where(delta == 0, 0, h)
+    s = np.where(mx == 0, 0, delta/np.where(mx == 0, 1, mx))*100
+    return np.stack([h, s, mx*100], -1)
+
+_luts = {}
+
+def hue_value_lut(s=100):
+    # (360, 101, 3): RGB for every whole hue and value at saturation s
+    if s not in _luts:
+        h, v = np.meshgrid(np.arange(360), np.arange(101), indexing="ij")
+        _luts[s] = hsv_to_rgb(np.stack([h, np.full_like(h, s), v], -1))
+    return _luts[s]
+
+def hsv_grid(h, s, v):
+    h, s, v = np.broadcast_arrays(h, s, v)
+    return np.stack([np.asarray(h) % 360, s, v], -1).astype(np.int16)
+
+def to_rgb(hsv, shift=0):
+    # int HSV grid -> uint8 RGB; shift rotates the hue on the way out
+    hsv = np.asarray(hsv)
+    h = (hsv[..., 0] + shift) % 360
+    v = np.clip(hsv[..., 2], 0, 100)
+    full = hsv[..., 1] == 100
+    if full.all():
+        return hue_value_lut()[h, v]
+    out = hsv_to_rgb(np.stack([h, hsv[..., 1], v], -1))
+    out[full] = hue_value_lut()[h[full], v[full]]
+    return out
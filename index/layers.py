@@ -0,0 +1,144 @@
+import hashlib
+import json
+import random
+import numpy as np
+from canvas import PixelCanvas
+
+# Layer stack for a scene: every layer (background, stars, nebula, a planet, its rings, moons,
+# atmospheres, flares) is drawn into its own buffer and the buffers are blended in order. A layer
+# is kept with a hash of its inputs, so when one planet changes only that layer is drawn again and
+# the stack is blended from there up; the composite below the first changed layer is kept too.
+#
+# Layers come as Layer(name, inputs, draw, opacity, mode, box, opaque). draw(canvas) paints with
+# the usual draw functions in scene coordinates; box=(x0, y0, x1, y1) promises it stays inside
+# that part of the scene, so only that much is drawn and blended. How a layer is drawn depends
+# on its mode:
+#   alpha     covered pixels replace the stack below, mixed at opacity. Opaque layers cover
+#             everything and are drawn once; the rest are drawn twice, on black and on white, and
+#             the pixels that come out the same are the ones they cover, so they may only blend
+#             over pixels they drew themselves (a shadow on their own planet).
+#   add, screen, multiply
+#             drawn once on their neutral colour (black, black, white), which leaves the stack
+#             unchanged wherever the layer drew nothing: glows, flares and tints.
+
+MODES = ("alpha", "add", "multiply", "screen")
+NEUTRAL = {"add": (0, 0, 0), "screen": (0, 0, 0), "multiply": (255, 255, 255)}
+
+class Layer:
+    def __init__(self, name, inputs, draw, opacity=1.0, mode="alpha", box=None, opaque=False):
+        if mode not in MODES:
+            raise ValueError(f"unknown blend mode {mode!r}, expected one of {', '.join(MODES)}")
+        self.name = name
+        self.inputs = inputs
+        self.draw = draw
+        self.opacity = opacity
+        self.mode = mode
+        self.box = box
+        self.opaque = opaque
+
+    def key(self, extra=()):
+        blob = json.dumps([self.name, self.inputs, self.opacity, self.mode, self.box, self.opaque, list(extra)],
+                          sort_keys=True, default=str)
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+def blend(out, rgb, cover=None, opacity=1.0, mode="alpha"):
+    # out (H, W, 3) uint8 is blended in place; cover is an (H, W) mask, None is everywhere
+    if mode == "alpha":
+        mixed = rgb
+    else:
+        a = out.astype(np.uint16)
+        b = rgb.astype(np.uint16)
+        if mode == "add": mixed = np.minimum(a+b, 255)
+        elif mode == "multiply": mixed = a*b//255
+        elif mode == "screen": mixed = 255 - (255-a)*(255-b)//255
+        else: raise ValueError(f"unknown blend mode {mode!r}, expected one of {', '.join(MODES)}")
+    if opacity != 1.0:
+        mixed = out*(1-opacity) + mixed*opacity
+    if cover is None: out[:] = mixed
+    else: np.copyto(out, mixed.astype(np.uint8), where=cover[..., None])
+    return out
+
+def clip_box(box, window):
+    x0, y0, x1, y1 = window
+    if box is not None:
+        x0, y0, x1, y1 = max(x0, box[0]), max(y0, box[1]), min(x1, box[2]), min(y1, box[3])
+    return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+def render_layer(layer, w, h, window=None):
+    # -> (rgb, coverage, window) with coverage None when the layer covers all of window,
+    # or None when its box is outside the window
+    window = clip_box(layer.box, window or (0, 0, w, h))
+    if window is None: return None
+    if layer.mode != "alpha" or layer.opaque:
+        canvas = PixelCanvas(w, h, NEUTRAL.get(layer.mode, (0, 0, 0)), window)
+        layer.draw(canvas)
+        return canvas.pixels, None, window
+    state = random.getstate()
+    black = PixelCanvas(w, h, (0, 0, 0), window)
+    layer.draw(black)
+    random.setstate(state)
+    white = PixelCanvas(w, h, (255, 255, 255), window)
+    layer.draw(white)
+    cover = (black.pixels == white.pixels).all(-1)
+    return black.pixels, (None if cover.all() else cover), window
+
+def blend_into(out, origin, buf, layer):
+    # buf from render_layer, out's pixel [0, 0] sits at origin in scene coordinates
+    rgb, cover, (x0, y0, x1, y1) = buf
+    ox, oy = origin
+    blend(out[y0-oy:y1-oy, x0-ox:x1-ox], rgb, cover, layer.opacity, layer.mode)
+
+def draw_layer(layer, canvas):
+    # one layer straight onto canvas (or a tile of it), the same pixels the stack would give
+    if layer.mode == "alpha" and layer.opacity == 1.0 and layer.box is None:
+        layer.draw(canvas)
+        return
+    window = (canvas.ox, canvas.oy, canvas.ox+canvas.pixels.shape[1], canvas.oy+canvas.pixels.shape[0])
+    buf = render_layer(layer, canvas.w, canvas.h, window)
+    if buf is not None: blend_into(canvas.pixels, (canvas.ox, canvas.oy), buf, layer)
+
+class LayerStack:
+    def __init__(self, w, h, window=None, extra=()):
+        # extra goes into every layer key (renderer version, ...)
+        self.w = w
+        self.h = h
+        self.window = window
+        self.extra = tuple(extra)
+        self.keys = []
+        self.buffers = []
+        self.below = []
+        self.rendered = 0
+
+    def stages(self, layers, out):
+        # composites layers into out (H, W, 3), yielding each layer's name once it is in
+        keys = [layer.key(self.extra) for layer in layers]
+        same = 0
+        while same < min(len(keys), len(self.keys)) and keys[same] == self.keys[same]:
+            same += 1
+        buffers = self.buffers[:same]
+        below = self.below[:same]
+        origin = self.window[:2] if self.window else (0, 0)
+        # buffers further up whose inputs did not change are reused even if they moved in the stack
+        old = dict(zip(self.keys, self.buffers))
+        # nothing below the first changed layer: start from black, not last render's pixels
+        if same: out[:] = below[-1]
+        else: out[:] = 0
+        for i in range(same, len(layers)):
+            layer = layers[i]
+            if keys[i] in old:
+                buf = old[keys[i]]
+            else:
+                buf = render_layer(layer, self.w, self.h, self.window)
+                self.rendered += 1
+            if buf is not None: blend_into(out, origin, buf, layer)
+            buffers.append(buf)
+            below.append(out.copy())
+            yield layer.name
+        self.keys, self.buffers, self.below = keys, buffers, below
+
+    def render(self, layers, out):
+        for _ in self.stages(layers, out): pass
+        return out
+
+    def clear(self):
+        self.keys, self.buffers, self.below = [], [], []
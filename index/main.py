@@ -1,20 +1,37 @@
 import pygame
 import random
 import math
-from perlin_noise import PerlinNoise
+import json
+import time
+import numpy as np
+from noise_field import NoiseField
+from canvas import PixelCanvas
+from planet_shader import shade_planet
+from render_cache import scene_key
+from png_stream import save_png_blocks
+from quantize import quantize
+from dither import dither as dither_pixels
+from blur import box_blur, gaussian_blur
+from sprites import radial_glow, halo, stamp, premultiplied, distance_field
+from starfield import star_field, noise_density
+from placement import place_planets, place_moons, bodies_grid
+from rings import ring_pixels
+from profiler import NO_PROFILE, profiled
+from noise_cache import noise_fields
+from layers import Layer, LayerStack, blend, draw_layer
 import asyncio
 
 WIDTH, HEIGHT = 1600, 1100
 BLOCK_SIZE = 8
 LOW_W, LOW_H = WIDTH//BLOCK_SIZE, HEIGHT//BLOCK_SIZE
 
-pygame.init()
-window = pygame.display.set_mode((WIDTH, HEIGHT))
+# no display at import: headless and batch callers never open one, WallpaperCreator does when it
+# has a window to show
 
 def lerp_color(a, b, t):
     return tuple(int(a[i]*(1-t)+b[i]*t) for i in range(3))
 
-def get_palette(type_name):
+def get_palette(type_name, rng=random):
     palettes = {
         "red": [
             (32, 5, 8),
@@ -56,111 +73,79 @@ def get_palette(type_name):
 
 
 
-    return random.choice(list(palettes.values()))
+    return rng.choice(list(palettes.values()))
 
-def random_palette(count, vibrance=0.8, from_type=None):
+def random_palette(count, vibrance=0.8, from_type=None, rng=random):
     if from_type:
-        base = get_palette(from_type)
+        base = get_palette(from_type, rng)
         chosen = []
         for i in range(count):
             idx = int(i*len(base)/count)
             chosen.append(base[idx])
         return chosen
-    return [tuple(int(vibrance*random.randint(128,255)+(1-vibrance)*random.randint(0,60)) for _ in range(3)) for _ in range(count)]
-
-def upscale_px(surf):
-    return pygame.transform.scale(surf, (WIDTH, HEIGHT))
-
-def random_safe_planet_positions(n, low_w, low_h, min_r, max_r):
-    poses = []
-    for loop in range(n*6):
-        r = random.randint(min_r, max_r)
-        cx = random.randint(r+16, low_w-r-16)
-        cy = random.randint(r+16, low_h-r-16)
-        if all(math.hypot(cx-x, cy-y)>r2+r+28 for (x, y, r2) in poses):
-            poses.append((cx, cy, r))
-            if len(poses) == n: break
-    return poses
-
-def draw_px_gradient_bg(surf, stops):
-    for y in range(LOW_H):
-        t = y / LOW_H
-        if len(stops)==2:
-            col = lerp_color(stops[0], stops[1], t)
-        else:
-            sec = t*(len(stops)-1)
-            base = int(sec)
-            frac = sec-base
-            col = lerp_color(stops[base],stops[min(len(stops)-1,base+1)],frac)
-        for x in range(LOW_W):
-            surf.set_at((x,y), col)
+    return [tuple(int(vibrance*rng.randint(128,255)+(1-vibrance)*rng.randint(0,60)) for _ in range(3)) for _ in range(count)]
+
+def upscale_px(surf, size=None):
+    return pygame.transform.scale(surf, size or (WIDTH, HEIGHT))
+
+def random_safe_planet_positions(n, low_w, low_h, min_r, max_r, rng=random):
+    # as many of the n planets as fit, small scenes get fewer
+    return place_planets(n, low_w, low_h, min_r, max_r, gap=28, margin=16, rng=rng, strict=False)
 
-def draw_px_stars(surf, density=0.004, palette=None):
+def draw_px_gradient_bg(canvas, stops):
+    stops = np.array(stops, dtype=np.float64)
+    sec = np.arange(canvas.h)/canvas.h*(len(stops)-1)
+    base = sec.astype(int)
+    frac = (sec-base)[:, None]
+    canvas.fill_rows((stops[base]*(1-frac) + stops[np.minimum(len(stops)-1, base+1)]*frac).astype(int))
+
+def draw_px_stars(canvas, density=0.004, palette=None, seed=None, density_map=None):
     if palette is None: palette = [(255,255,255),(238,230,255),(220,240,180)]
-    ct = int(density * LOW_W * LOW_H)
-    for _ in range(ct):
-        x,y = random.randint(0,LOW_W-1), random.randint(0,LOW_H-1)
-        surf.set_at((x,y), random.choice(palette))
-        if random.random()<0.1:
-            for dx,dy in [(1,0),(0,1),(-1,0),(0,-1)]:
-                if 0<=x+dx<LOW_W and 0<=y+dy<LOW_H:
-                    surf.set_at((x+dx,y+dy), random.choice(palette))
-        if random.random()<0.02:
-            r = random.randint(1,2)
-            for xx in range(-r,r+1):
-                for yy in range(-r,r+1):
-                    if 0<=x+xx<LOW_W and 0<=y+yy<LOW_H:
-                        surf.set_at((x+xx,y+yy), (255,255,255))
-
-def draw_px_nebula(surf, palette, octaves=5, alpha=0.49):
-    noise = PerlinNoise(octaves=octaves)
-    for y in range(LOW_H):
-        for x in range(LOW_W):
-            val = (noise([x/LOW_W, y/LOW_H])+1)/2
-            if val>0.62:
-                idx = int(val*(len(palette)-1))
-                neb = tuple(int((1-alpha)*surf.get_at((x,y))[i]+alpha*palette[idx][i]) for i in range(3))
-                surf.set_at((x,y), neb)
-            if random.random()<0.001 and val>0.66 and x%4==0 and y%4==0:
-                surf.set_at((x,y), (220,130,255))
-
-def draw_cluster_nebula(surf, clusters, palette, max_size=42):
+    ct = int(density * canvas.w * canvas.h)
+    rng = np.random.default_rng(random.getrandbits(32) if seed is None else seed)
+    canvas.put(*star_field(rng, canvas.w, canvas.h, ct, palette, density=density_map))
+
+def nebula_density(w, h, octaves, seed, bias):
+    # low frequency noise over the whole scene, so every tile samples the same map
+    noise = NoiseField(octaves=octaves, seed=seed)
+    return noise_density(noise_fields.field(noise, w, h), bias)
+
+def draw_px_nebula(canvas, palette, octaves=5, alpha=0.49, seed=None):
+    noise = NoiseField(octaves=octaves, seed=seed)
+    arr = canvas.pixels
+    xs = np.arange(canvas.ox, canvas.ox+arr.shape[1])
+    ys = np.arange(canvas.oy, canvas.oy+arr.shape[0])
+    val = (noise_fields.crop(noise, canvas.w, canvas.h, xs[0], ys[0], xs[-1]+1, ys[-1]+1)+1)/2
+    rng = np.random.default_rng(random.getrandbits(32) if seed is None else seed)
+    mask = val>0.62
+    idx = (val[mask]*(len(palette)-1)).astype(int)
+    arr[mask] = ((1-alpha)*arr[mask] + alpha*np.array(palette)[idx]).astype(np.uint8)
+    grid4 = (ys%4==0)[:,None] & (xs%4==0)[None,:]
+    sparks = rng.random((canvas.h, canvas.w))[ys[0]:ys[-1]+1, xs[0]:xs[-1]+1]
+    arr[(sparks<0.001) & (val>0.66) & grid4] = (220,130,255)
+
+def draw_cluster_nebula(canvas, clusters, palette, max_size=42):
+    rng = np.random.default_rng(random.getrandbits(32))
     for _ in range(clusters):
-        cx = random.randint(42,LOW_W-42)
-        cy = random.randint(37,LOW_H-37)
+        cx = random.randint(42,canvas.w-42)
+        cy = random.randint(37,canvas.h-37)
         size = random.randint(int(max_size*0.6),max_size)
         color = random.choice(palette)
-        for y in range(-size,size):
-            for x in range(-size,size):
-                dist = math.sqrt(x*x+y*y)
-                if dist<size and random.random()<0.71*(1-dist/size):
-                    px, py = cx+x, cy+y
-                    if 0<=px<LOW_W and 0<=py<LOW_H:
-                        surf.set_at((px,py), color)
-
-def draw_px_planet(surf, cx, cy, r, palette, noise, bands):
-    for y in range(-r, r):
-        for x in range(-r, r):
-            if x*x + y*y <= r*r:
-                rx, ry = cx+x, cy+y
-                if 0<=rx<LOW_W and 0<=ry<LOW_H:
-                    norm = math.sqrt(x*x+y*y)/r
-                    idx = int(norm * (bands-1))
-                    col = palette[idx]
-                    surf.set_at((rx, ry), col)
-
-                    if abs(norm-1)<0.08:
-                        surf.set_at((rx, ry), lerp_color(col, (255,255,255), 0.92))
-
-def draw_planet_shadow(surf, cx, cy, r, shade=(0,0,0), alpha=0.31):
-    for y in range(-r, r):
-        for x in range(-r, r):
-            if x*x + y*y <= r*r and x>0:
-                rx, ry = cx+x, cy+y
-                if 0<=rx<LOW_W and 0<=ry<LOW_H:
-                    col = surf.get_at((rx,ry))
-                    shad = tuple(int(col[i]*(1-alpha)+shade[i]*alpha) for i in range(3))
-                    surf.set_at((rx,ry), shad)
+        speckle = rng.random((2*size, 2*size))
+        view, xs, ys = canvas.box(cx-size, cy-size, cx+size, cy+size)
+        if view is None: continue
+        dist = np.sqrt((xs-cx)**2 + (ys-cy)**2)
+        speckle = speckle[ys[0,0]-cy+size:ys[-1,0]-cy+size+1, xs[0,0]-cx+size:xs[0,-1]-cx+size+1]
+        view[(dist<size) & (speckle<0.71*(1-dist/size))] = color
+
+def draw_px_planet(canvas, cx, cy, r, palette, noise, bands):
+    shade_planet(canvas.pixels, cx, cy, r, palette, bands, origin=(canvas.ox, canvas.oy), rim=(0.08, (255,255,255), 0.92))
+
+def draw_planet_shadow(canvas, cx, cy, r, shade=(0,0,0), alpha=0.31):
+    view, xs, ys = canvas.box(cx-r, cy-r, cx+r, cy+r)
+    if view is None: return
+    x, y = xs-cx, ys-cy
+    canvas.blend(view, (x*x + y*y <= r*r) & (x>0), shade, alpha)
 
 """def draw_px_craters(surf, cx, cy, r, min_r, max_r, count):
     for _ in range(count):
@@ -176,30 +161,23 @@ def draw_planet_shadow(surf, cx, cy, r, shade=(0,0,0), alpha=0.31):
                     if 0<=px<LOW_W and 0<=py<LOW_H:
                         surf.set_at((px, py), (50,46,32))"""
 
-def draw_px_highlight(surf, cx, cy, r, highlight_col):
-    for theta in range(72,114,1):
-        dx = int(r*math.cos(math.radians(theta)))
-        dy = int(r*math.sin(math.radians(theta)))
-        for t in range(2,8):
-            x = cx+dx//t
-            y = cy+dy//t
-            if 0<=x<LOW_W and 0<=y<LOW_H:
-                surf.set_at((x,y), highlight_col)
+def draw_px_highlight(canvas, cx, cy, r, highlight_col):
+    theta = np.radians(np.arange(72,114,1))
+    dx = (r*np.cos(theta)).astype(int)[:, None]
+    dy = (r*np.sin(theta)).astype(int)[:, None]
+    t = np.arange(2,8)[None, :]
+    canvas.put((cx+dx//t).ravel(), (cy+dy//t).ravel(), highlight_col)
 
-def draw_px_rings(surf, cx, cy, r, palette, rings=3, fade=17):
+def draw_px_rings(canvas, cx, cy, r, palette, rings=3, fade=17, gaps=None, seed=None):
     wave_freq = 13
     wave_amp = 2
+    rng = np.random.default_rng(random.getrandbits(32) if seed is None else seed)
     for ring in range(rings):
-        cr = r + ring*random.randint(8,13)
+        cr = r + ring*(random.randint(8,13) if gaps is None else gaps[ring])
         col = tuple(min(255,max(0,palette[-1][i]-(fade*ring))) for i in range(3))
-        for theta in range(0,360,1):
-            wav = int(math.sin(theta/wave_freq+ring)*wave_amp) if ring>0 else 0
-            x = int(cx + (cr+wav)*math.cos(math.radians(theta)))
-            y = int(cy + (cr+wav)*math.sin(math.radians(theta)))
-            if 0<=x<LOW_W and 0<=y<LOW_H:
-                surf.set_at((x,y), col)
-                if random.random()<0.07 and 0<=x+1<LOW_W and 0<=y+1<LOW_H:
-                    surf.set_at((x+1,y+1), col)
+        # scene box, not the canvas window, so every tile draws the same sparkles
+        canvas.put(*ring_pixels(cx, cy, cr, col, wave_freq=wave_freq, wave_amp=wave_amp if ring>0 else 0,
+                                phase=ring, sparkle=0.07, rng=rng, box=(0, 0, canvas.w, canvas.h)))
 
 def draw_px_moons(surf, planet_x, planet_y, planet_r, count, min_r, max_r, palette, noise):
     moon_positions = set()
@@ -211,7 +189,7 @@ def draw_px_moons(surf, planet_x, planet_y, planet_r, count, min_r, max_r, palet
         my = int(planet_y + math.sin(angle)*dist)
         moon_positions.add((mx,my,r))
         moon_col = [lerp_color(palette[random.randint(0,len(palette)-1)], (180,180,206), 0.19) for _ in range(random.randint(2,5))]
-        moon_noise = PerlinNoise(octaves=random.randint(2,3))
+        moon_noise = NoiseField(octaves=random.randint(2,3))
         draw_px_planet(surf,mx,my,r,moon_col,moon_noise,len(moon_col))
         draw_planet_shadow(surf, mx,my,r,shade=(0,0,0),alpha=random.uniform(0.1,0.44))
         #draw_px_craters(surf,mx,my,r,2,6,random.randint(5,15))
@@ -230,22 +208,21 @@ def draw_cosmic_haze(surf, palette, haze_count=6, max_rad_range=(30,90), alpha=6
         color = random.choice(palette)
         # Prevent overly white haze
         color = tuple(int(c*0.75 + random.choice(palette)[i]*0.25) for i, c in enumerate(color))
-        haze = pygame.Surface((rad*2, rad*2), pygame.SRCALPHA)
-        for r in range(rad, 0, -1):
-            cr = tuple(int((r/rad) * color[i]) for i in range(3))
-            haze_alpha = int((min(alpha, 90) * r) / rad)  # never more than 90
-            pygame.draw.circle(haze, cr+(haze_alpha,), (rad, rad), r)
+        haze = radial_glow(rad, color, min(alpha, 90))  # never more than 90
         surf.blit(haze, (cx-rad, cy-rad), special_flags=pygame.BLEND_RGBA_ADD)
 
 
-def blend_layers(base, overlays):
+def blend_layers(base, overlays, mode="add"):
+    # surfaces over a copy of base with layers.blend; "add" is what BLEND_RGBA_ADD did to the colours
     result = base.copy()
+    arr = pygame.surfarray.pixels3d(result)
     for layer in overlays:
-        result.blit(layer,(0,0), special_flags=pygame.BLEND_RGBA_ADD)
+        blend(arr, pygame.surfarray.pixels3d(layer), mode=mode)
+    del arr
     return result
 
 """def add_noise_texture(surf, intensity=0, octaves=0):
-    noise = PerlinNoise(octaves=octaves)
+    noise = NoiseField(octaves=octaves)
     for y in range(LOW_H):
         for x in range(LOW_W):
             val = (noise([x/LOW_W,y/LOW_H]) +1)/2
@@ -254,16 +231,13 @@ def blend_layers(base, overlays):
             new_col = tuple(max(0,min(255,old[i]+delta))for i in range(3))
             surf.set_at((x,y), new_col)"""
 
-def soften_artifact_edges(surf, radius=1):
+def soften_artifact_edges(surf, radius=1, sigma=None):
+    # box mean over (2r+1)^2 for every pixel at least radius from the border, or a Gaussian with sigma
     arr = pygame.surfarray.pixels3d(surf)
-    for y in range(radius, LOW_H-radius):
-        for x in range(radius, LOW_W-radius):
-            values = []
-            for dx in range(-radius, radius+1):
-                for dy in range(-radius, radius+1):
-                    values.append(arr[x+dx,y+dy])
-            mean = [int(sum(col)/len(col))for col in zip(*values)]
-            arr[x,y] = mean
+    w, h = arr.shape[:2]
+    if w > 2*radius and h > 2*radius:
+        soft = box_blur(arr, radius) if sigma is None else gaussian_blur(arr, sigma)
+        arr[radius:w-radius, radius:h-radius] = soft[radius:w-radius, radius:h-radius].astype(np.uint8)
     del arr
 
 """def paint_deep_space_patches(surf, palette, patch_count=4, min_size=38, max_size=110):
@@ -281,13 +255,7 @@ def soften_artifact_edges(surf, radius=1):
         surf.blit(patch, (cx-rad,cy-rad),special_flags=pygame.BLEND_RGBA_ADD)"""
 
 def procedural_lensflare(surf, cx,cy,palette, size=26, intensity=0.54):
-    flare = pygame.Surface((size*2,size*2), pygame.SRCALPHA)
-    center_color = palette[0]
-    for r in range(size,0,-1):
-        t = r/size
-        base = tuple(int(center_color[i]*(t**intensity)) for i in range(3))
-        alpha = int(120 * t)
-        pygame.draw.circle(flare, base+(alpha,), (size,size),r)
+    flare = radial_glow(size, palette[0], 120, 1, intensity)
     surf.blit(flare,(cx-size,cy-size), special_flags=pygame.BLEND_RGBA_ADD)
 
 def draw_rich_px_scene(surf, planet_palette_type='nebula', nebula_palette_type='nebula', extra_deep=None):
@@ -310,7 +278,7 @@ def generate_px_planets(surf, n, min_r, max_r, shadow_degrees=(95,290)):
     positions = random_safe_planet_positions(n, LOW_W, LOW_H, min_r, max_r)
     planet_infos = []
     for idx, (cx, cy, r) in enumerate(positions):
-        planet_noise = PerlinNoise(octaves=random.randint(2,6))
+        planet_noise = NoiseField(octaves=random.randint(2,6))
         draw_px_planet(surf, cx, cy, r, palettes[idx], planet_noise, len(palettes[idx]))
         #draw_px_craters(surf, cx, cy,r, 2, max(int(r*0.44),4), random.randint(5,9))
         highlight_col = lerp_color((255,255,255), palettes[idx][0], 0.5)
@@ -324,27 +292,31 @@ def generate_px_planets(surf, n, min_r, max_r, shadow_degrees=(95,290)):
         planet_infos.append({"cx":cx, "cy":cy, "r":r, "rings":random.randint(1,3),"atoms_mcol": atoms_col})
         return positions, palettes, planet_infos
 
-def generate_moons(surf, positions, min_r=5, max_r=12):
-    moon_all_palettes = []
-    moons_by_planet = []
+def plan_moons(positions, min_r=5, max_r=12, rng=random):
+    # moons keep clear of every planet and of each other; ones that find no room are dropped
+    grid = bodies_grid(positions)
+    moons = []
     for cx, cy, r in positions:
-        moon_count = random.randint(1,3)
-        moons = []
-        moon_pal = random_palette(random.randint(2,4),0.84)
-        moon_all_palettes.append(moon_pal)
-        moon_noise = PerlinNoise(octaves=random.randint(2,3))
-        for _ in range(moon_count):
-            angle = random.uniform(0,2*math.pi)
-            dist = r + random.randint(min_r+7,max_r+16)
-            mx = int(cx + math.cos(angle) * dist)
-            my = int(cy + math.sin(angle) * dist)
-            m_r = random.randint(min_r,max_r)
-            draw_px_planet(surf, mx,my, m_r,moon_pal,moon_noise,len(moon_pal))
-            draw_planet_shadow(surf, mx,my,m_r, shade=(0,0,0),alpha = random.uniform(0.18,0.34))
-            #draw_px_craters(surf, mx,my, m_r, 2, m_r // 2,random.randint(3,7))
-            moons.append((mx,my,m_r))
-        moons_by_planet.append(moons)
-    return moon_all_palettes, moons_by_planet
+        moon_count = rng.randint(1,3)
+        moon_pal = random_palette(rng.randint(2,4),0.84,rng=rng)
+        octaves = rng.randint(2,3)
+        bodies = [{"x": x, "y": y, "r": mr, "shadow": rng.uniform(0.18,0.34)}
+                  for x, y, mr in place_moons(grid, cx, cy, r, moon_count, min_r, max_r, (7, 16), rng=rng)]
+        moons.append({"palette": moon_pal, "octaves": octaves, "noise_seed": rng.randint(1, 10**5), "bodies": bodies})
+    return moons
+
+def draw_moons(canvas, moons):
+    for moon in moons:
+        moon_noise = NoiseField(octaves=moon["octaves"], seed=moon["noise_seed"])
+        for body in moon["bodies"]:
+            draw_px_planet(canvas, body["x"], body["y"], body["r"], moon["palette"], moon_noise, len(moon["palette"]))
+            draw_planet_shadow(canvas, body["x"], body["y"], body["r"], shade=(0,0,0), alpha=body["shadow"])
+            #draw_px_craters(canvas, body["x"], body["y"], body["r"], 2, body["r"] // 2,random.randint(3,7))
+
+def generate_moons(surf, positions, min_r=5, max_r=12):
+    moons = plan_moons(positions, min_r, max_r)
+    draw_moons(surf, moons)
+    return [m["palette"] for m in moons], [[(b["x"], b["y"], b["r"]) for b in m["bodies"]] for m in moons]
 
 def planet_atmospheres_layer(planet_data, atmos_alpha=105, blur_rad=13):
     atmos_surf = pygame.Surface((LOW_W, LOW_H), pygame.SRCALPHA)
@@ -364,12 +336,6 @@ def draw_lensflares(surf, planet_data):
             fy = int(planet["cy"] + math.sin(angle)*dist)
             procedural_lensflare(surf, fx, fy, [planet["atmcol"], (255,255,255)], size=random.randint(14,38), intensity=0.44+random.randint()*0.52)
 
-def merge_pixel_layers(base, overlays, blend_flag=pygame.BLEND_RGBA_ADD):
-    composite = base.copy()
-    for layer in overlays:
-        composite.blit(layer, (0, 0), special_flags=blend_flag)
-        return composite
-
 def draw_loose_particles(surf, regions, palette, count_per_region=26, max_dist=86):
     for cx, cy, r in regions:
         region_ct = random.randint(count_per_region//2, count_per_region)
@@ -396,15 +362,13 @@ def paint_light_trils(surf, planet_positions, n=2, max_len=48, palette=None):
                         surf.set_at((tx+1, ty+1),(255,255,252))
 
 def cosmic_noise_overlay(surf, pal, alpha=16, octaves=6):
-    noise = PerlinNoise(octaves=octaves)
-    for y in range(LOW_H):
-        for x in range(LOW_W):
-            v = (noise([x/LOW_W,y/LOW_H])+1)/2
-            if v>0.6:
-                idx = int(v*(len(pal)-1))
-                base = surf.get_at((x,y))
-                col = tuple((base[i]*(255-alpha) + pal[idx][i]*alpha)//255 for i in range(3))
-                surf.set_at((x,y),col)
+    noise = NoiseField(octaves=octaves)
+    v = (noise.grid(np.arange(LOW_W)/LOW_W, np.arange(LOW_H)/LOW_H).T+1)/2
+    arr = pygame.surfarray.pixels3d(surf)
+    mask = v>0.6
+    idx = (v[mask]*(len(pal)-1)).astype(int)
+    arr[mask] = (arr[mask].astype(np.int32)*(255-alpha) + np.array(pal)[idx]*alpha)//255
+    del arr
 
 def soften_high_contrast_pixel_edges(surf, passes=2):
     for _ in range(passes):
@@ -505,23 +469,14 @@ def fake_galaxy_arms(surf, center, rad, arms=3, thickness=9, palette=None, fade=
                         col = tuple( int(fadefac*palette[cidx][ii] + (1-fadefac)*surf.get_at((x,y))[ii]) for ii in range(3) )
                         surf.set_at((x, y), col)
 
-def quantize_colors(surf, palette, dither=False):
+def quantize_colors(surf, palette, dither=False, exact=False):
+    # dither: False, True (Floyd-Steinberg) or any mode name from dither.MODES
     arr = pygame.surfarray.pixels3d(surf)
-    for x in range(arr.shape[0]):
-        for y in range(arr.shape[1]):
-            orig = tuple(arr[x, y])
-            idx = min(range(len(palette)), key=lambda i: sum((orig[j]-palette[i][j])**2 for j in range(3)))
-            c = palette[idx]
-            if dither:
-                # Floyd-Steinberg
-                error = [orig[j]-c[j] for j in range(3)]
-                arr[x,y] = c
-                if x+1<arr.shape[0]: arr[x+1,y] = [min(255,max(0,arr[x+1,y][j]+error[j]*7/16)) for j in range(3)]
-                if x-1>=0 and y+1<arr.shape[1]: arr[x-1,y+1] = [min(255,max(0,arr[x-1,y+1][j]+error[j]*3/16)) for j in range(3)]
-                if y+1<arr.shape[1]: arr[x,y+1] = [min(255,max(0,arr[x,y+1][j]+error[j]*5/16)) for j in range(3)]
-                if x+1<arr.shape[0] and y+1<arr.shape[1]: arr[x+1,y+1] = [min(255,max(0,arr[x+1,y+1][j]+error[j]*1/16)) for j in range(3)]
-            else:
-                arr[x,y] = c
+    if not dither:
+        arr[:] = quantize(arr, palette, exact)
+    else:
+        mode = "floyd-steinberg" if dither is True else dither
+        arr.swapaxes(0, 1)[:] = dither_pixels(arr.swapaxes(0, 1), palette, mode)
     del arr
 
 def make_big_palette(size, bases=[(36,40,100), (220,190,111), (145,228,155), (65,65,215), (179,36,148)], jitter=13):
@@ -623,17 +578,19 @@ def add_galactic_center(surf,cx,cy,radius,palette, bright_col=(255,255,255)):
         pygame.draw.circle(surf, base+(a,),(cx,cy),r)
 
 def draw_perlin_twinkle(surf, palette,octaves=5,threshold=0.88):
-    noise = PerlinNoise(octaves=octaves)
-    for y in range(LOW_H):
-        for x in range(LOW_W):
-            val = (noise([x/LOW_W,y/LOW_H])+1)/2
-            if val>threshold:
-                surf.set_at((x,y),random.choice(palette))
-                if random.random()<0.2:
-                    dx,dy = random.randint(-1,1), random.randint(-1,1)
-                    tx,ty = x+dx,y+dy
-                    if 0<=x<LOW_W and 0<=ty<LOW_H:
-                        surf.set_at((tx,ty),random.choice(palette))
+    noise = NoiseField(octaves=octaves)
+    val = (noise.grid(np.arange(LOW_W)/LOW_W, np.arange(LOW_H)/LOW_H).T+1)/2
+    rng = np.random.default_rng(random.getrandbits(32))
+    pal = np.array(palette)
+    xs, ys = np.nonzero(val>threshold)
+    arr = pygame.surfarray.pixels3d(surf)
+    arr[xs,ys] = pal[rng.integers(len(palette), size=len(xs))]
+    pick = rng.random(len(xs))<0.2
+    tx = xs[pick] + rng.integers(-1,2,size=pick.sum())
+    ty = ys[pick] + rng.integers(-1,2,size=pick.sum())
+    ok = (0<=tx)&(tx<LOW_W)&(0<=ty)&(ty<LOW_H)
+    arr[tx[ok],ty[ok]] = pal[rng.integers(len(palette), size=ok.sum())]
+    del arr
 
 def cosmic_field_overlay(surf, centers, palette, n_lines=44):
     for cx,cy in centers:
@@ -684,11 +641,7 @@ def draw_planet_atmosphere(surf,base,planets, atmos_alpha=130, blur_rad=12):
     cx,cy,r = 0,0,0
     for planet in planets:
         cx,cy,r = planet["cx"], planet["cy"],planet["r"]
-        color = planet["atmcol"]
-        for i in range(blur_rad,0,-1):
-            a = int(atmos_alpha * (i/blur_rad))
-            col = tuple(min(255,max(0,int(color[j]*(1-i/blur_rad))))for j in range(3)) + (a,)
-            pygame.draw.circle(surf, col, (cx,cy),r+i)
+        stamp(surf, halo(r, blur_rad, planet["atmcol"], atmos_alpha), cx-r-blur_rad, cy-r-blur_rad)
     surf.blit(base,(0,0))
 
 def draw_lensflares(surf, planets):
@@ -702,118 +655,357 @@ def draw_lensflares(surf, planets):
             procedural_lensflare(surf, fx, fy, [planet["atmcol"],(240,240,240)], size = random.randint(13,34), intensity=0.46 + random.random()*0.54)
 
 def procedural_lensflare(surf, cx,cy, palette, size=25,intensity=0.56):
-    flare = pygame.Surface((size*2,size*2), pygame.SRCALPHA)
-    base_color = palette[0]
-    for r in range(size,0,-1):
-        fade_factor = (r/size) ** intensity
-        color = tuple(int(base_color[i]*fade_factor)for i in range(3))
-        alpha = int(120 * fade_factor)
-        pygame.draw.circle(flare, color+(alpha,),(size,size),r)
+    flare = radial_glow(size, palette[0], 120, intensity)
     surf.blit(flare, (cx-size,cy-size),special_flags=pygame.BLEND_RGBA_ADD)
 
 def generate_and_draw_scene():
-    low_res_surface = pygame.Surface((LOW_W,LOW_H))
+    low_res_canvas = PixelCanvas(LOW_W,LOW_H)
     paltype = random.choice(["nebula","sunset","ocean","forest", "gold"])
     bg_colors = random_palette(random.randint(2,4),0.9,paltype)
-    draw_px_gradient_bg(low_res_surface,bg_colors)
-    #add_noise_texture(low_res_surface,intensity=8,octaves=3)
-    draw_px_stars(low_res_surface, density=0.004,palette=[(255,255,255),(210,230,230),(170,220,225)])
-    #draw_px_nebula(low_res_surface, random_palette(random.randint(3,7),0.85,paltype), octaves=4,alpha=0.54)
-    #draw_cluster_nebula(low_res_surface,clusters=random.randint(7,15),palette=random_palette(random.randint(3,5),0.83),max_size=random.randint(24,53))
+    draw_px_gradient_bg(low_res_canvas,bg_colors)
+    #add_noise_texture(low_res_canvas,intensity=8,octaves=3)
+    draw_px_stars(low_res_canvas, density=0.004,palette=[(255,255,255),(210,230,230),(170,220,225)])
+    #draw_px_nebula(low_res_canvas, random_palette(random.randint(3,7),0.85,paltype), octaves=4,alpha=0.54)
+    #draw_cluster_nebula(low_res_canvas,clusters=random.randint(7,15),palette=random_palette(random.randint(3,5),0.83),max_size=random.randint(24,53))
     planet_palette = [random_palette(random.randint(5,10),0.92,paltype)for _ in range(random.randint(2,3))]
     planet_positions = random_safe_planet_positions(len(planet_palette),LOW_W, LOW_H,15,32)
 
     planet_infos = []
     for idx, (cx,cy,rad) in enumerate(planet_positions):
-        noise = PerlinNoise(octaves=random.randint(3,6))
-        draw_px_planet(low_res_surface,cx,cy,rad,planet_palette[idx],noise,len(planet_palette[idx]))
-        draw_planet_shadow(low_res_surface,cx,cy,rad,shade=(0,0,0),alpha=random.uniform(0.26,0.45))
-        #draw_px_craters(low_res_surface,cx,cy.rad,random.randint(2,6),random.randint(5,15),random.randint(6,19))
+        noise = NoiseField(octaves=random.randint(3,6))
+        draw_px_planet(low_res_canvas,cx,cy,rad,planet_palette[idx],noise,len(planet_palette[idx]))
+        draw_planet_shadow(low_res_canvas,cx,cy,rad,shade=(0,0,0),alpha=random.uniform(0.26,0.45))
+        #draw_px_craters(low_res_canvas,cx,cy.rad,random.randint(2,6),random.randint(5,15),random.randint(6,19))
         highlight_col = lerp_color((255,255,255),planet_palette[idx][0],0.55)
-        draw_px_rings(low_res_surface,cx,cy,rad,planet_palette[idx],rings=random.randint(1,4),fade=random.randint(12,23))
+        draw_px_rings(low_res_canvas,cx,cy,rad,planet_palette[idx],rings=random.randint(1,4),fade=random.randint(12,23))
         atmos_col = lerp_color(planet_palette[idx][0],(245,245,250),0.60)
         planet_infos.append({"cx":cx,"cy":cy,"r":rad,"atmcol":atmos_col})
 
-        moons_palettes, moons_info = generate_moons(low_res_surface, planet_positions,min_r=6,max_r=13)
+        moons_palettes, moons_info = generate_moons(low_res_canvas, planet_positions,min_r=6,max_r=13)
         atmosphere_layer = planet_atmospheres_layer(planet_infos)
-        final_img = blend_layers(low_res_surface,[atmosphere_layer])
+        final_img = blend_layers(low_res_canvas.to_surface(),[atmosphere_layer])
         draw_lensflares(final_img, planet_infos)
 
         hi_res_surface = upscale_px(final_img)
+        window = pygame.display.get_surface() or pygame.display.set_mode((WIDTH, HEIGHT))
         window.blit(hi_res_surface,(0,0))
         pygame.display.flip()
 
+# A scene is planned once from a seed into a plain JSON spec (palettes, positions, noise seeds,
+# ring gaps, moons...). render_scene only reads the spec, so the same spec gives the same
+# pixels on any machine or worker. Bump RENDER_VERSION whenever the drawing code changes what a
+# spec looks like, it is part of the render cache key.
+
+RENDER_VERSION = 3
+
+def plan_scene(seed, low_w=LOW_W, low_h=LOW_H):
+    rng = random.Random(seed)
+    paltype = rng.choice(["nebula", "sunset", "ocean", "forest", "gold"])
+    bg_colors = random_palette(rng.randint(2, 4), 0.9, paltype, rng)
+    stars = {"density": 0.004, "palette": [(255, 255, 255), (210, 230, 230), (170, 220, 255)], "seed": rng.getrandbits(32)}
+    # derived from the star seed rather than drawn from rng, so the rest of the plan stays put
+    stars["clump"] = {"octaves": 2, "seed": stars["seed"] % 10**5 + 1, "bias": 0.6}
+    planet_count = rng.randint(2, 3)
+    palettes = [random_palette(rng.randint(5, 10), 0.92, paltype, rng) for _ in range(planet_count)]
+    positions = random_safe_planet_positions(planet_count, low_w, low_h, 15, 32, rng)
+    planets = []
+    for idx, (cx, cy, rad) in enumerate(positions):
+        pal = palettes[idx]
+        rings = rng.randint(1, 4)
+        planets.append({"cx": cx, "cy": cy, "r": rad, "palette": pal,
+                        "octaves": rng.randint(3, 6), "noise_seed": rng.randint(1, 10**5),
+                        "shadow": rng.uniform(0.26, 0.45),
+                        "highlight": lerp_color((255, 255, 255), pal[0], 0.55),
+                        "rings": rings, "ring_fade": rng.randint(12, 23),
+                        "ring_gaps": [rng.randint(8, 13) for _ in range(rings)], "ring_seed": rng.getrandbits(32),
+                        "atmcol": lerp_color(pal[0], (245, 245, 250), 0.69)})
+    moons = plan_moons(positions, 6, 13, rng)
+    # overlays come last, so adding them left everything above as it was
+    nebula = {"palette": random_palette(rng.randint(3, 7), 0.85, paltype, rng), "octaves": 4,
+              "seed": rng.randint(1, 10**5), "alpha": round(rng.uniform(0.38, 0.54), 3)}
+    for p in planets:
+        p["flares"] = []
+        for _ in range(rng.randint(1, 3)):
+            angle = rng.uniform(0, 2*math.pi)
+            dist = p["r"] + rng.randint(6, 28)
+            p["flares"].append({"x": int(p["cx"] + math.cos(angle)*dist), "y": int(p["cy"] + math.sin(angle)*dist),
+                                "size": rng.randint(5, 12), "falloff": round(0.46 + rng.random()*0.54, 2)})
+    spec = {"seed": seed, "size": [low_w, low_h], "paltype": paltype, "background": bg_colors,
+            "stars": stars, "nebula": nebula, "planets": planets, "moons": moons}
+    # tuples -> lists, so a spec straight from here and one read back from disk are identical
+    return json.loads(json.dumps(spec))
+
+def draw_stars_layer(canvas, stars):
+    clump = stars.get("clump")
+    dmap = None if clump is None else nebula_density(canvas.w, canvas.h, clump["octaves"], clump["seed"], clump["bias"])
+    draw_px_stars(canvas, density=stars["density"], palette=stars["palette"], seed=stars["seed"], density_map=dmap)
+
+def draw_planet_layer(canvas, p):
+    cx, cy, rad, pal = p["cx"], p["cy"], p["r"], p["palette"]
+    noise = NoiseField(octaves=p["octaves"], seed=p["noise_seed"])
+    draw_px_planet(canvas, cx, cy, rad, pal, noise, len(pal))
+    draw_planet_shadow(canvas, cx, cy, rad, shade=(0, 0, 0), alpha=p["shadow"])
+    draw_px_highlight(canvas, cx, cy, rad, p["highlight"])
+
+def draw_rings_layer(canvas, p):
+    draw_px_rings(canvas, p["cx"], p["cy"], p["r"], p["palette"], rings=p["rings"], fade=p["ring_fade"],
+                  gaps=p["ring_gaps"], seed=p["ring_seed"])
+
+def draw_nebula_layer(canvas, nebula):
+    # full strength here, the layer's opacity mixes it over the stars
+    draw_px_nebula(canvas, nebula["palette"], octaves=nebula["octaves"], alpha=1.0, seed=nebula["seed"])
+
+def add_glow(canvas, rgb, x, y):
+    # rgb (h, w, 3) added onto the canvas with its top-left at scene (x, y), clipped
+    view, xs, ys = canvas.box(x, y, x+rgb.shape[1], y+rgb.shape[0])
+    if view is None: return
+    view[:] = np.minimum(view + rgb[ys-y, xs-x].astype(np.uint16), 255)
+
+def draw_atmosphere_layer(canvas, p, width=12, alpha=130):
+    # the halo's colour weighted by its alpha, outside the planet only
+    cx, cy, r = p["cx"], p["cy"], p["r"]
+    rgb, a, mask = halo(r, width, p["atmcol"], alpha)
+    outside = mask & (distance_field(mask.shape[1], mask.shape[0], r+width, r+width) > r)
+    add_glow(canvas, np.where(outside[..., None], rgb*(a[..., None]/255), 0).astype(np.uint8), cx-r-width, cy-r-width)
+
+def draw_flares_layer(canvas, p):
+    for f in p["flares"]:
+        flare = premultiplied(radial_glow(f["size"], p["atmcol"], 120, f["falloff"]))
+        add_glow(canvas, flare, f["x"]-f["size"], f["y"]-f["size"])
+
+def disc_box(cx, cy, r, pad=1):
+    return [cx-r-pad, cy-r-pad, cx+r+pad+1, cy+r+pad+1]
+
+def union_box(boxes):
+    boxes = list(boxes)
+    if not boxes: return [0, 0, 0, 0]
+    return [min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes)]
+
+PLANET_KEYS = ("cx", "cy", "r", "palette", "octaves", "noise_seed", "shadow", "highlight")
+RING_KEYS = ("cx", "cy", "r", "palette", "rings", "ring_fade", "ring_gaps", "ring_seed")
+GLOW_KEYS = ("cx", "cy", "r", "atmcol")
+
+def scene_layers(spec):
+    # the scene as a layer stack, bottom first; each layer's inputs are just the part of the
+    # spec it draws from, so editing one planet only changes that planet's layers. Boxes keep
+    # the planet, moon and glow layers from drawing (twice) over the whole scene.
+    layers = [Layer("background", spec["background"], lambda c: draw_px_gradient_bg(c, spec["background"]), opaque=True),
+              Layer("stars", spec["stars"], lambda c: draw_stars_layer(c, spec["stars"]))]
+    nebula = spec.get("nebula")
+    if nebula:
+        layers.append(Layer("nebula", nebula, lambda c: draw_nebula_layer(c, nebula), opacity=nebula["alpha"]))
+    for idx, p in enumerate(spec["planets"]):
+        layers.append(Layer(f"planet {idx}", {k: p[k] for k in PLANET_KEYS}, lambda c, p=p: draw_planet_layer(c, p),
+                            box=disc_box(p["cx"], p["cy"], p["r"])))
+        layers.append(Layer(f"rings {idx}", {k: p[k] for k in RING_KEYS}, lambda c, p=p: draw_rings_layer(c, p)))
+    for idx, moon in enumerate(spec["moons"]):
+        layers.append(Layer(f"moons {idx}", moon, lambda c, moon=moon: draw_moons(c, [moon]),
+                            box=union_box(disc_box(b["x"], b["y"], b["r"]) for b in moon["bodies"])))
+    for idx, p in enumerate(spec["planets"]):
+        glow = {k: p[k] for k in GLOW_KEYS}
+        layers.append(Layer(f"atmosphere {idx}", glow, lambda c, p=p: draw_atmosphere_layer(c, p), mode="screen",
+                            box=disc_box(p["cx"], p["cy"], p["r"], 12)))
+        if p.get("flares"):
+            layers.append(Layer(f"flares {idx}", dict(glow, flares=p["flares"]), lambda c, p=p: draw_flares_layer(c, p),
+                                mode="add", box=union_box([f["x"]-f["size"], f["y"]-f["size"], f["x"]+f["size"], f["y"]+f["size"]]
+                                                          for f in p["flares"])))
+    return layers
+
+def check_size(canvas, spec):
+    if [canvas.w, canvas.h] != list(spec["size"]):
+        raise ValueError(f"scene spec is for a {spec['size'][0]}x{spec['size'][1]} canvas, got {canvas.w}x{canvas.h}")
+
+def render_stages(canvas, spec):
+    # yields after every stage so the async loop can get a frame/events in between; plain layers
+    # are drawn straight over each other, the rest blended one at a time, the same pixels as a
+    # LayerStack gives without keeping every layer's buffer
+    check_size(canvas, spec)
+    for layer in scene_layers(spec):
+        draw_layer(layer, canvas)
+        yield layer.name
+
+def render_scene(canvas, spec):
+    for _ in render_stages(canvas, spec): pass
+
+def save_scene_spec(spec, filename):
+    with open(filename, "w") as f:
+        json.dump(spec, f, indent=1)
+
+def load_scene_spec(filename):
+    with open(filename) as f:
+        return json.load(f)
+
 class WallpaperCreator:
-    def __init__(self, width=1600, height=1100, block_size=8):
+    def __init__(self, width=1600, height=1100, block_size=8, headless=False, cache=None, png_level=6, profiler=None,
+                 layered=False):
         self.width = width
         self.height = height
         self.block_size = block_size
         self.low_w = width // block_size
         self.low_h = height // block_size
-        pygame.init()
-        self.window = pygame.display.set_mode((self.width, self.height))
-        pygame.display.set_caption("Perlin Noise Pixel Art Space Wallpaper Creator")
-        self.low_surface = pygame.Surface((self.low_w, self.low_h))
+        self.window = None
+        if not headless:
+            pygame.init()
+            self.window = pygame.display.set_mode((self.width, self.height))
+            pygame.display.set_caption("Perlin Noise Pixel Art Space Wallpaper Creator")
+        self.canvas = PixelCanvas(self.low_w, self.low_h)
         self.clock = pygame.time.Clock()
         self.running = True
+        self.cache = cache
+        self.png_level = png_level
+        # a profiler.StageProfiler to time every stage, off by default
+        self.profiler = profiler or NO_PROFILE
+        # layered keeps every layer's buffer, so an edited spec only redraws the layers it touched
+        self.layers = LayerStack(self.low_w, self.low_h, extra=(RENDER_VERSION,)) if layered else None
+        self.spec = None
         self.planet_data = []
         self.moons_data = []
+        # composed + upscaled frame, rebuilt only after the canvas changes
+        self.frame = None
+        self.needs_repaint = True
+        self.regenerate = False
+        self.generating = None
+        self.longest_stall = 0.0
+
+    def invalidate(self):
+        self.frame = None
+        self.needs_repaint = True
 
     def clear_surface(self):
-        self.low_surface.fill((0, 0, 0))
-
-    def generate_scene(self):
-        self.clear_surface()
-        paltype = random.choice(["nebula", "sunset", "ocean", "forest", "gold"])
-        bg_colors = random_palette(random.randint(2, 4), 0.9, paltype)
-        draw_px_gradient_bg(self.low_surface, bg_colors)
-        #add_noise_texture(self.low_surface, intensity=8, octaves=3)
-        draw_px_stars(self.low_surface, density=0.004, palette=[(255, 255, 255), (210, 230, 230), (170, 220, 255)])
-        #draw_px_nebula(self.low_surface, random_palette(random.randint(3, 7), 0.85, paltype), octaves=4, alpha=0.54)
-        #draw_cluster_nebula(self.low_surface, clusters=random.randint(7, 15), palette=random_palette(random.randint(3, 5), 0.83), max_size=random.randint(24, 53))
-        planet_count = random.randint(2, 3)
-        self.planet_palette = [random_palette(random.randint(5, 10), 0.92, paltype) for _ in range(planet_count)]
-        self.planet_positions = random_safe_planet_positions(planet_count, self.low_w, self.low_h, 15, 32)
-        self.planet_data.clear()
-
-        for idx, (cx, cy, rad) in enumerate(self.planet_positions):
-            noise = PerlinNoise(octaves=random.randint(3, 6))
-            draw_px_planet(self.low_surface, cx, cy, rad, self.planet_palette[idx], noise, len(self.planet_palette[idx]))
-            draw_planet_shadow(self.low_surface, cx, cy, rad, shade=(0, 0, 0), alpha=random.uniform(0.26, 0.45))
-            #draw_px_craters(self.low_surface, cx, cy, rad, random.randint(2, 6), random.randint(5, 15), random.randint(6, 19))
-            highlight_col = lerp_color((255, 255, 255), self.planet_palette[idx][0], 0.55)
-            draw_px_highlight(self.low_surface, cx, cy, rad, highlight_col)
-            draw_px_rings(self.low_surface, cx, cy, rad, self.planet_palette[idx], rings=random.randint(1, 4), fade=random.randint(12, 23))
-            atmos_col = lerp_color(self.planet_palette[idx][0], (245, 245, 250), 0.69)
-            self.planet_data.append({"cx": cx, "cy": cy, "r": rad, "atmcol": atmos_col})
-
-        self.moons_palettes, self.moons_data = generate_moons(self.low_surface, self.planet_positions, min_r=6, max_r=13)
+        self.canvas.fill((0, 0, 0))
+        self.invalidate()
+
+    def generate_scene(self, seed=None):
+        if seed is None: seed = random.getrandbits(32)
+        self.load_scene(plan_scene(seed, self.low_w, self.low_h))
+
+    def cache_key(self, png=False):
+        # a PNG also depends on the zlib level, the low buffer doesn't
+        return scene_key(self.spec, self.width, self.height, self.block_size, RENDER_VERSION,
+                         self.png_level if png else None)
+
+    def load_scene(self, spec):
+        for _ in self.scene_stages(spec): pass
+
+    def scene_stages(self, spec):
+        self.spec = spec
+        self.profiler.begin(spec["seed"])
+        key = self.cache_key() if self.cache else None
+        low = self.cache.get_low(key) if self.cache else None
+        if low is not None and low.shape == self.canvas.pixels.shape:
+            self.canvas.pixels[:] = low
+        else:
+            if self.layers is None:
+                stages = render_stages(self.canvas, spec)
+            else:
+                check_size(self.canvas, spec)
+                stages = self.layers.stages(scene_layers(spec), self.canvas.pixels)
+            for stage in self.profiler.stages(stages, self.canvas.pixels):
+                # partial canvas is shown by the next render_final
+                self.invalidate()
+                yield stage
+            if self.cache: self.cache.put_low(key, self.canvas.pixels)
+        self.invalidate()
+        self.planet_positions = [(p["cx"], p["cy"], p["r"]) for p in spec["planets"]]
+        self.planet_palette = [p["palette"] for p in spec["planets"]]
+        self.planet_data = [{"cx": p["cx"], "cy": p["cy"], "r": p["r"], "atmcol": tuple(p["atmcol"])} for p in spec["planets"]]
+        self.moons_palettes = [m["palette"] for m in spec["moons"]]
+        self.moons_data = [[(b["x"], b["y"], b["r"]) for b in m["bodies"]] for m in spec["moons"]]
+
+    def recolor_planet(self, idx=None, palette=None):
+        # new palette for one planet, with layered=True only that planet and its rings are redrawn
+        if self.spec is None or not self.spec["planets"]: return
+        if self.generating is not None and not self.generating.done(): return
+        spec = json.loads(json.dumps(self.spec))
+        if idx is None: idx = random.randrange(len(spec["planets"]))
+        p = spec["planets"][idx]
+        if palette is None: palette = random_palette(len(p["palette"]), 0.92, spec["paltype"])
+        p["palette"] = [list(c) for c in palette]
+        self.load_scene(spec)
+
+    async def generate_scene_async(self, seed=None):
+        # same result as generate_scene, but hands control back to the event loop after each
+        # stage; longest_stall is the longest stretch (seconds) spent without yielding
+        if seed is None: seed = random.getrandbits(32)
+        self.longest_stall = 0.0
+        t = time.perf_counter()
+        for stage in self.scene_stages(plan_scene(seed, self.low_w, self.low_h)):
+            self.longest_stall = max(self.longest_stall, time.perf_counter()-t)
+            await asyncio.sleep(0)
+            t = time.perf_counter()
+        self.longest_stall = max(self.longest_stall, time.perf_counter()-t)
+
+    def start_generation(self, seed=None):
+        # an R pressed mid-generation stays pending until the running one is done
+        if self.generating is None or self.generating.done():
+            self.regenerate = False
+            self.generating = asyncio.ensure_future(self.generate_scene_async(seed))
+        return self.generating
+
+    @profiled("compose")
+    def compose_low(self):
+        # atmospheres and flares are layers of the scene now, the canvas is the whole image
+        return self.canvas.to_surface()
+
+    def final_frame(self):
+        if self.frame is None:
+            low = self.compose_low()
+            with self.profiler.stage("upscale"):
+                self.frame = upscale_px(low, (self.width, self.height))
+        return self.frame
 
     def render_final(self):
-        #atmosphere_layer = planet_atmospheres_layer(self.planet_data)
-        final_img = blend_layers(self.low_surface, [])
-        #draw_lensflares(final_img, self.planet_data)
-        hi_res_surface = upscale_px(final_img)
-        self.window.blit(hi_res_surface, (0, 0))
+        if not self.needs_repaint: return
+        self.window.blit(self.final_frame(), (0, 0))
+        if self.profiler.enabled and self.spec is not None:
+            pygame.display.set_caption(self.profiler.title())
         pygame.display.flip()
+        self.needs_repaint = False
 
     def save_wallpaper(self, filename='space_wallpaper.png'):
-        #atmosphere_layer = planet_atmospheres_layer(self.planet_data)
-        final_img = blend_layers(self.low_surface, [])
-        #draw_lensflares(final_img, self.planet_data)
-        hi_res_surface = upscale_px(final_img)
-        pygame.image.save(hi_res_surface, filename)
+        # mid-generation the canvas is partial while spec is already the new scene, keep it out of the cache
+        finished = self.generating is None or self.generating.done()
+        if self.cache and self.spec is not None and finished and filename.lower().endswith(".png"):
+            key = self.cache_key(png=True)
+            if self.cache.get_png(key, filename): return
+            self.write_wallpaper(filename)
+            self.cache.put_png(key, filename)
+        else:
+            self.write_wallpaper(filename)
+
+    @profiled("save")
+    def write_wallpaper(self, filename):
+        if filename.lower().endswith(".png"):
+            # straight from the low-res buffer, the upscaled image is never built
+            low = pygame.surfarray.array3d(self.compose_low()).swapaxes(0, 1)
+            save_png_blocks(low, self.width, self.height, filename, self.png_level)
+        else:
+            pygame.image.save(self.final_frame(), filename)
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.running = False
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.running = False
+            elif event.key == pygame.K_s:
+                self.save_wallpaper()
+            elif event.key == pygame.K_r:
+                self.regenerate = True
+            elif event.key == pygame.K_p:
+                self.recolor_planet()
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE, pygame.WINDOWEXPOSED,
+                            pygame.WINDOWRESTORED, pygame.WINDOWSIZECHANGED):
+            # window contents were lost, blit the cached frame again
+            self.needs_repaint = True
 
     def event_loop(self):
         while self.running:
             for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.running = False
-                    elif event.key == pygame.K_s:
-                        self.save_wallpaper()
+                self.handle_event(event)
+            if self.regenerate:
+                self.regenerate = False
+                self.generate_scene()
 
             self.render_final()
             self.clock.tick(30)
@@ -821,9 +1013,14 @@ class WallpaperCreator:
 
 
 async def main():
+    # layered keeps every layer buffer for R/P edits, a plain render is quicker for fresh scenes
     creator = WallpaperCreator()
-    creator.generate_scene()
+    creator.start_generation()
     while creator.running:
+        for event in pygame.event.get():
+            creator.handle_event(event)
+        if creator.regenerate:
+            creator.start_generation()
         creator.render_final()
         await asyncio.sleep(1/30)  # 30fps, no blocking
 
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+import numpy as np
+try:
+    from disk_budget import DiskBudget
+except ImportError:
+    # imported as index.noise_cache by the scripts at the top level (2.py)
+    from index.disk_budget import DiskBudget
+
+# Evaluated noise fields, kept so a field is computed once per process (or once per cache
+# directory) instead of on every stage, tile and regenerate that asks for it.
+#
+# A field is noise.grid(np.arange(x0, x1)/w*scale, np.arange(y0, y1)/h*scale): region (x0, y0,
+# x1, y1) of a w x h pixel grid, the convention all the draw functions use. Entries are keyed by
+# everything that changes the numbers (seed, octaves, layers, persistence, lacunarity, w, h,
+# scale, region, dtype). The memory tier is an LRU by bytes like sprites.SpriteCache; with a root
+# directory fields are also stored as <key>.npy (temp name + rename, safe across batch workers),
+# read back memory-mapped and evicted least recently used first once the directory passes
+# disk_bytes, counted over every process using it (disk_budget.DiskBudget).
+# Returned arrays are read-only, copy before writing into one.
+
+class NoiseCache:
+    def __init__(self, root=None, max_bytes=64*1024*1024, disk_bytes=512*1024*1024, dtype=np.float32):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.disk_bytes = disk_bytes
+        self.dtype = np.dtype(dtype)
+        self.fields = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk = None
+
+    def key(self, noise, w, h, region, scale):
+        blob = json.dumps([noise.seed, noise.octaves, noise.layers, noise.persistence, noise.lacunarity,
+                           w, h, scale, list(region), self.dtype.str])
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+    def field(self, noise, w, h, region=None, scale=1.0):
+        # (y1-y0, x1-x0) array, region defaults to the whole w x h grid
+        region = tuple(int(v) for v in (region or (0, 0, w, h)))
+        key = self.key(noise, w, h, region, scale)
+        arr = self.fields.get(key)
+        if arr is not None:
+            self.fields.move_to_end(key)
+            self.hits += 1
+            return arr
+        arr = self.load(key)
+        if arr is None:
+            self.misses += 1
+            x0, y0, x1, y1 = region
+            arr = noise.grid(np.arange(x0, x1)/w*scale, np.arange(y0, y1)/h*scale).astype(self.dtype)
+            self.store(key, arr)
+        else:
+            self.hits += 1
+        arr.flags.writeable = False
+        self.remember(key, arr)
+        return arr
+
+    def crop(self, noise, w, h, x0, y0, x1, y1, scale=1.0):
+        # box of the whole-grid field; the part outside the grid is evaluated on the spot
+        full = self.field(noise, w, h, scale=scale)
+        if x0 >= 0 and y0 >= 0 and x1 <= w and y1 <= h:
+            return full[y0:y1, x0:x1]
+        out = noise.grid(np.arange(x0, x1)/w*scale, np.arange(y0, y1)/h*scale).astype(self.dtype)
+        ix0, iy0, ix1, iy1 = max(x0, 0), max(y0, 0), min(x1, w), min(y1, h)
+        if ix0 < ix1 and iy0 < iy1:
+            out[iy0-y0:iy1-y0, ix0-x0:ix1-x0] = full[iy0:iy1, ix0:ix1]
+        return out
+
+    def remember(self, key, arr):
+        self.fields[key] = arr
+        self.bytes += arr.nbytes
+        while self.bytes > self.max_bytes and len(self.fields) > 1:
+            _, old = self.fields.popitem(last=False)
+            self.bytes -= old.nbytes
+
+    def path(self, key):
+        return os.path.join(self.root, key + ".npy")
+
+    def budget(self):
+        # one per root, batch workers point root at the shared directory after import
+        if self.disk is None or self.disk.root != self.root:
+            self.disk = DiskBudget(self.root, self.disk_bytes, (".npy",))
+        self.disk.max_bytes = self.disk_bytes
+        return self.disk
+
+    def load(self, key):
+        if not self.root: return None
+        try:
+            arr = np.load(self.path(key), mmap_mode="r")
+            # the mtime is the LRU order for every process sharing the directory
+            os.utime(self.path(key))
+        except (OSError, ValueError):
+            return None
+        return arr
+
+    def store(self, key, arr):
+        if not self.root: return
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        try:
+            old = os.path.getsize(self.path(key))
+        except FileNotFoundError:
+            old = 0
+        os.replace(tmp, self.path(key))
+        self.budget().add(os.path.getsize(self.path(key))-old)
+
+    def clear(self):
+        self.fields.clear()
+        self.bytes = 0
+
+# shared by everything a process renders; batch workers point root at a common directory
+noise_fields = NoiseCache()
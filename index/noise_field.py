@@ -0,0 +1,78 @@
+import random
+import numpy as np
+
+# Whole-grid port of perlin_noise.PerlinNoise. Lattice vectors are seeded exactly like the
+# library (seed * hash of the lattice point), so layers=1 gives the same field PerlinNoise
+# would give for the same octaves/seed, just evaluated for every coordinate in one go.
+
+def _fade(t):
+    return t*t*t*(t*(t*6-15)+10)
+
+def lattice_vec(seed, i, j):
+    rng = random.Random(seed*max(1, abs(i + 10*j + 1)))
+    return rng.uniform(-1, 1), rng.uniform(-1, 1)
+
+class NoiseField:
+    def __init__(self, octaves=1, seed=None, layers=1, persistence=0.5, lacunarity=2.0):
+        if octaves <= 0:
+            raise ValueError("octaves expected to be positive number")
+        self.octaves = octaves
+        self.seed = seed if seed else random.randint(1, 10**5)
+        self.layers = layers
+        self.persistence = persistence
+        self.lacunarity = lacunarity
+        self.vecs = {}
+
+    def lattice(self, seed, i0, i1, j0, j1):
+        gx = np.empty((j1-j0+1, i1-i0+1))
+        gy = np.empty_like(gx)
+        for j in range(j0, j1+1):
+            for i in range(i0, i1+1):
+                key = (seed, i, j)
+                if key not in self.vecs:
+                    self.vecs[key] = lattice_vec(seed, i, j)
+                gx[j-j0, i-i0], gy[j-j0, i-i0] = self.vecs[key]
+        return gx, gy
+
+    def layer(self, x, y, freq, seed):
+        x = x*freq
+        y = y*freq
+        x0 = np.floor(x)
+        y0 = np.floor(y)
+        fx, fy = x-x0, y-y0
+        ix = x0.astype(np.int64)
+        iy = y0.astype(np.int64)
+        i0, j0 = int(ix.min()), int(iy.min())
+        gx, gy = self.lattice(seed, i0, int(ix.max())+1, j0, int(iy.max())+1)
+        ix -= i0
+        iy -= j0
+        out = np.zeros(np.broadcast(x, y).shape)
+        for di in (0, 1):
+            dx = fx-di
+            wx = _fade(1-np.abs(dx))
+            for dj in (0, 1):
+                dy = fy-dj
+                wy = _fade(1-np.abs(dy))
+                out += wx*wy*(gx[iy+dj, ix+di]*dx + gy[iy+dj, ix+di]*dy)
+        return out
+
+    def sample(self, x, y):
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        if x.size == 0:
+            return np.zeros(x.shape, dtype=np.float32)
+        out = np.zeros(x.shape)
+        amp, freq, total = 1.0, self.octaves, 0.0
+        for k in range(self.layers):
+            out += amp*self.layer(x, y, freq, self.seed+k)
+            total += amp
+            amp *= self.persistence
+            freq *= self.lacunarity
+        return (out/total).astype(np.float32)
+
+    def grid(self, xs, ys):
+        # 1D axes in, (len(ys), len(xs)) field out
+        return self.sample(np.asarray(xs)[None, :], np.asarray(ys)[:, None])
+
+    def __call__(self, coordinates):
+        x, y = coordinates
+        return float(self.sample(x, y))
@@ -0,0 +1,177 @@
+import math
+import random
+import numpy as np
+
+# Non-overlapping placement for planets, moons and denser fields of small bodies.
+#
+# Bodies are (x, y, r) circles, two of them fit when their centres are more than r1 + r2 + gap
+# apart. A SpatialHash buckets them by cell so a fit test only looks at nearby bodies. Planets
+# come from Bridson's Poisson-disk sampling with a radius per sample: grow out from placed bodies
+# with candidates in an annulus just past the spacing until nothing more fits, which gives a
+# maximal packing, then pick n of those at random so they end up spread over the whole scene.
+# Packings are loose in tight scenes, so those fall back to a bounded backtracking search over a
+# lattice of centres (search_bodies). When that can't fit n either, strict=True raises
+# PlacementError (carrying the bodies that did fit) and strict=False returns those bodies.
+
+class PlacementError(ValueError):
+    def __init__(self, msg, placed):
+        # both in args, so it pickles back from a pool worker
+        super().__init__(msg, placed)
+        self.placed = placed
+
+    def __str__(self):
+        return self.args[0]
+
+class SpatialHash:
+    def __init__(self, cell):
+        self.cell = max(1, cell)
+        self.cells = {}
+        self.max_r = 0
+
+    def key(self, x, y):
+        return int(x//self.cell), int(y//self.cell)
+
+    def add(self, x, y, r):
+        self.cells.setdefault(self.key(x, y), []).append((x, y, r))
+        self.max_r = max(self.max_r, r)
+
+    def fits(self, x, y, r, gap=0):
+        reach = r + self.max_r + gap
+        i0, j0 = self.key(x-reach, y-reach)
+        i1, j1 = self.key(x+reach, y+reach)
+        for i in range(i0, i1+1):
+            for j in range(j0, j1+1):
+                for bx, by, br in self.cells.get((i, j), ()):
+                    if (x-bx)**2 + (y-by)**2 <= (r+br+gap)**2:
+                        return False
+        return True
+
+def bodies_grid(bodies, gap=0):
+    grid = SpatialHash(2*max((b[2] for b in bodies), default=1) + gap)
+    for x, y, r in bodies:
+        grid.add(x, y, r)
+    return grid
+
+def poisson_bodies(w, h, min_r, max_r, gap=0, margin=0, rng=random, k=30, grid=None):
+    # maximal Poisson-disk packing of circles with radii in [min_r, max_r] inside the margin
+    grid = grid or SpatialHash(2*max_r + gap)
+    def inside(x, y, r):
+        return r+margin <= x <= w-r-margin and r+margin <= y <= h-r-margin
+    out, active = [], []
+    for _ in range(k):
+        r = rng.randint(min_r, max_r)
+        if not inside(w//2, h//2, r): r = min_r
+        if not inside(w//2, h//2, r): return out
+        x = rng.randint(r+margin, w-r-margin)
+        y = rng.randint(r+margin, h-r-margin)
+        if grid.fits(x, y, r, gap):
+            out.append((x, y, r))
+            active.append((x, y, r))
+            grid.add(x, y, r)
+            break
+    while active:
+        i = rng.randrange(len(active))
+        ax, ay, ar = active[i]
+        for _ in range(k):
+            r = rng.randint(min_r, max_r)
+            d = ar + r + gap + 1
+            angle = rng.uniform(0, 2*math.pi)
+            dist = rng.uniform(d, 2*d)
+            x = int(round(ax + math.cos(angle)*dist))
+            y = int(round(ay + math.sin(angle)*dist))
+            if inside(x, y, r) and grid.fits(x, y, r, gap):
+                out.append((x, y, r))
+                active.append((x, y, r))
+                grid.add(x, y, r)
+                break
+        else:
+            active[i] = active[-1]
+            active.pop()
+    return out
+
+def lattice(w, h, r, margin, max_candidates):
+    # candidate centres for an r circle, at most about max_candidates of them, edges included
+    lo = r + margin
+    if w-lo < lo or h-lo < lo: return None
+    step = max(1, math.ceil(math.sqrt((w-2*lo+1)*(h-2*lo+1)/max_candidates)))
+    gx = np.unique(np.append(np.arange(lo, w-lo+1, step), w-lo))
+    gy = np.unique(np.append(np.arange(lo, h-lo+1, step), h-lo))
+    return [a.ravel() for a in np.meshgrid(gx, gy)]
+
+def search_bodies(radii, w, h, gap=0, margin=0, rng=random, max_candidates=400, branch=4, budget=60):
+    # backtracking over lattice centres, biggest body first. At every step the candidates are
+    # tried least constraining first (the ones that leave the most room for the bodies still to
+    # place), so tight scenes end up with bodies in the corners and along the edges. Bounded by
+    # branch candidates per level and budget nodes in total, so a miss doesn't prove there is no
+    # layout; returns the most bodies it managed to place.
+    radii = sorted(radii, reverse=True)
+    cands = [lattice(w, h, r, margin, max_candidates) for r in radii]
+    if not radii or any(c is None for c in cands): return []
+    jitter = np.random.default_rng(rng.getrandbits(32))
+    best = []
+    nodes = 0
+
+    def dfs(k, cands, chosen):
+        nonlocal best, nodes
+        if len(chosen) > len(best): best = chosen
+        if k == len(radii): return True
+        if any(len(c[0]) == 0 for c in cands[k:]): return False
+        nodes += 1
+        if nodes > budget: return False
+        xs, ys = cands[k]
+        score = jitter.random(len(xs))
+        for l in range(k+1, len(radii)):
+            lx, ly = cands[l]
+            room = (np.hypot(xs[:, None]-lx[None, :], ys[:, None]-ly[None, :]) > radii[k]+radii[l]+gap).sum(1)
+            score = np.minimum(score, room) if l > k+1 else room + score
+        for j in np.argsort(-score)[:branch]:
+            x, y = xs[j], ys[j]
+            nxt = list(cands)
+            for l in range(k+1, len(radii)):
+                lx, ly = cands[l]
+                keep = np.hypot(lx-x, ly-y) > radii[k]+radii[l]+gap
+                nxt[l] = (lx[keep], ly[keep])
+            if dfs(k+1, nxt, chosen + [(int(x), int(y), radii[k])]): return True
+        return False
+
+    dfs(0, cands, [])
+    return best
+
+def place_planets(n, w, h, min_r, max_r, gap=0, margin=0, rng=random, k=30, tries=4, strict=True):
+    if n <= 0: return []
+    best = []
+    for _ in range(tries):
+        bodies = poisson_bodies(w, h, min_r, max_r, gap, margin, rng, k)
+        if len(bodies) >= n:
+            return rng.sample(bodies, n)
+        best = max(best, bodies, key=len)
+    # packings can be loose in a small scene: search for a layout with radii drawn like the
+    # packing's, then with every body at min_r
+    for radii in ([rng.randint(min_r, max_r) for _ in range(n)], [min_r]*n):
+        bodies = search_bodies(radii, w, h, gap, margin, rng)
+        if len(bodies) >= n:
+            return bodies
+        best = max(best, bodies, key=len)
+    msg = f"only {len(best)} of {n} bodies (r {min_r}-{max_r}, gap {gap}) fit in {w}x{h}"
+    if strict: raise PlacementError(msg, best)
+    return best
+
+def place_moons(grid, cx, cy, parent_r, count, min_r, max_r, clearance=(7, 16), gap=1, rng=random, k=30, strict=False):
+    # count moons orbiting parent_r + r + clearance out, clear of everything already in grid
+    # (planets, other moons); placed moons are added to grid. Moons that find no room are
+    # left out, strict=True raises instead.
+    moons = []
+    for _ in range(count):
+        for _ in range(k):
+            r = rng.randint(min_r, max_r)
+            angle = rng.uniform(0, 2*math.pi)
+            dist = parent_r + r + rng.randint(*clearance)
+            x = int(cx + math.cos(angle)*dist)
+            y = int(cy + math.sin(angle)*dist)
+            if grid.fits(x, y, r, gap):
+                grid.add(x, y, r)
+                moons.append((x, y, r))
+                break
+    if strict and len(moons) < count:
+        raise PlacementError(f"only {len(moons)} of {count} moons fit around ({cx}, {cy})", moons)
+    return moons
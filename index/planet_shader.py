@@ -0,0 +1,71 @@
+import random
+import numpy as np
+
+# One shader for every planet/moon body. Works on the [-r, r) bounding box as arrays:
+# radial distance field -> noise texture -> band index -> palette colours, then the
+# rim / crater / light spot / speck masks are layered on top (later ones win, same
+# order the old per-pixel loops used) and everything lands in one masked write.
+#
+# pixels is an (H, W, 3) array: PixelCanvas.pixels, or pygame.surfarray.pixels3d(surf).swapaxes(0, 1).
+
+def planet_pixels(cx, cy, r, palette, bands=None, noise=None, noise_scale=(1.0, 1.0), mix=(1.0, 0.0),
+                  span=None, band_fn=None, rim=None, craters=None, spots=None, specks=None,
+                  strict=False, cell=1, rng=None):
+    bands = len(palette) if bands is None else bands
+    y, x = np.mgrid[-r:r, -r:r]
+    d2 = x*x + y*y
+    mask = d2 < r*r if strict else d2 <= r*r
+    radial = np.sqrt(d2)/r
+
+    n = None
+    if isinstance(noise, np.ndarray):
+        # precomputed [x][y] grid with one value per cell x cell block, NaN where it runs out
+        gx, gy = (x+r)//cell, (y+r)//cell
+        ok = (gx < noise.shape[0]) & (gy < noise.shape[1])
+        n = np.full(x.shape, np.nan, dtype=np.result_type(noise.dtype, np.float32))
+        n[ok] = noise[gx[ok], gy[ok]]
+    elif noise is not None:
+        n = noise.sample((cx+x)*noise_scale[0], (cy+y)*noise_scale[1])
+
+    if band_fn is not None:
+        idx = band_fn(radial, n)
+    else:
+        span = bands-1 if span is None else span
+        t = mix[0]*radial if n is None else mix[0]*radial + mix[1]*((n+1)/2)
+        idx = (t*span).astype(int)
+    cols = np.array(palette, dtype=np.float64)[np.clip(idx, 0, bands-1)]
+
+    if rim is not None:
+        width, col, amount = rim
+        m = np.abs(radial-1) < width
+        cols[m] = cols[m]*(1-amount) + np.array(col)*amount
+    if craters is not None and n is not None:
+        thresh, max_radial, col = craters
+        cols[(n < thresh) & (radial < max_radial)] = col
+    if spots is not None and n is not None:
+        thresh, max_radial, col = spots
+        cols[(n > thresh) & (radial < max_radial)] = col
+    if specks is not None:
+        prob, centre, half, col = specks
+        if rng is None: rng = np.random.default_rng(random.getrandbits(32))
+        cols[(rng.random(x.shape) < prob) & (np.abs(radial-centre) < half)] = col
+    return cx-r, cy-r, cols.astype(np.uint8), mask
+
+def stamp(pixels, x0, y0, cols, mask, block=1):
+    # every source pixel paints a block x block square like surface.fill((x, y, P, P)) did;
+    # lowest priority offsets go first so the last source in row-major order still wins
+    h, w = mask.shape
+    H, W = pixels.shape[:2]
+    for dy in range(block-1, -1, -1):
+        for dx in range(block-1, -1, -1):
+            tx, ty = x0+dx, y0+dy
+            i0, i1 = max(0, -tx), min(w, W-tx)
+            j0, j1 = max(0, -ty), min(h, H-ty)
+            if i0 >= i1 or j0 >= j1: continue
+            m = mask[j0:j1, i0:i1]
+            pixels[ty+j0:ty+j1, tx+i0:tx+i1][m] = cols[j0:j1, i0:i1][m]
+
+def shade_planet(pixels, cx, cy, r, palette, bands=None, block=1, origin=(0, 0), **opts):
+    # origin: scene coords of pixels[0, 0] when pixels is only a tile of the scene
+    x0, y0, cols, mask = planet_pixels(cx, cy, r, palette, bands, cell=block, **opts)
+    stamp(pixels, x0-origin[0], y0-origin[1], cols, mask, block)
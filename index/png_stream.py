@@ -0,0 +1,93 @@
+import struct
+import zlib
+import numpy as np
+
+# Streaming PNG encoder (8-bit RGB). Rows go through zlib as they arrive and leave as IDAT chunks,
+# so nothing bigger than a few scanlines is ever held. save_png_blocks goes straight from a low-res
+# buffer to the upscaled file: each low-res row is widened once, written with the Sub filter (the
+# repeated pixels turn into runs of zeros) and its copies underneath use the Up filter, which
+# makes them all-zero lines. level is the zlib level: 1 is fastest, 9 smallest.
+
+def _chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+def sub_filter(row):
+    # row is (w, 3) uint8 -> filter byte 1 + bytes minus the pixel to their left
+    line = row.reshape(-1)
+    out = np.empty(len(line)+1, dtype=np.uint8)
+    out[0] = 1
+    out[1:4] = line[:3]
+    out[4:] = line[3:] - line[:-3]
+    return out.tobytes()
+
+class PngWriter:
+    def __init__(self, filename, width, height, level=6, idat_size=1 << 16):
+        self.f = open(filename, "wb")
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self.idat_size = idat_size
+        self.z = zlib.compressobj(level)
+        self.pending = []
+        self.pending_len = 0
+        self.f.write(b"\x89PNG\r\n\x1a\n")
+        self.f.write(_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        self.up_line = b"\x02" + bytes(3*width)
+
+    def feed(self, data):
+        data = self.z.compress(data)
+        if not data: return
+        self.pending.append(data)
+        self.pending_len += len(data)
+        if self.pending_len >= self.idat_size:
+            self.f.write(_chunk(b"IDAT", b"".join(self.pending)))
+            self.pending, self.pending_len = [], 0
+
+    def write_rows(self, rows):
+        # rows: (n, width, 3) uint8
+        rows = np.ascontiguousarray(rows, dtype=np.uint8)
+        if rows.shape[1:] != (self.width, 3):
+            raise ValueError(f"expected rows of {self.width} RGB pixels, got shape {rows.shape}")
+        lines = np.zeros((len(rows), 3*self.width+1), dtype=np.uint8)
+        lines[:, 1:] = rows.reshape(len(rows), -1)
+        self.feed(lines.tobytes())
+        self.rows += len(rows)
+
+    def write_repeated(self, row, count):
+        # one pixel row written count times: Sub line, then Up (zero) lines
+        if count <= 0: return
+        self.feed(sub_filter(np.asarray(row, dtype=np.uint8)) + self.up_line*(count-1))
+        self.rows += count
+
+    def close(self):
+        if self.rows != self.height:
+            self.f.close()
+            raise ValueError(f"PNG header says {self.height} rows, {self.rows} were written")
+        self.pending.append(self.z.flush())
+        self.f.write(_chunk(b"IDAT", b"".join(self.pending)))
+        self.f.write(_chunk(b"IEND", b""))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.f.close()
+
+def block_index(n, low_n):
+    # nearest-neighbour source index for every output column/row, same mapping as pygame.transform.scale
+    return np.arange(n)*low_n//n
+
+def save_png_blocks(low, width, height, filename, level=6):
+    # low: (low_h, low_w, 3) buffer, written as a width x height PNG without building the big image
+    low = np.asarray(low, dtype=np.uint8)
+    low_h, low_w = low.shape[:2]
+    xs = block_index(width, low_w)
+    counts = np.bincount(block_index(height, low_h), minlength=low_h)
+    with PngWriter(filename, width, height, level) as png:
+        for y in range(low_h):
+            if counts[y]:
+                png.write_repeated(low[y, xs], counts[y])
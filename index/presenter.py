@@ -0,0 +1,27 @@
+import numpy as np
+import pygame
+
+# Draws a colour grid as PIXEL_SIZE blocks in two calls instead of one draw.rect per cell: the
+# (grid_w, grid_h, 3) array goes into a grid-sized surface with surfarray.blit_array and
+# transform.scale blows that up into a cached full-size surface. When the grid is the same as
+# last frame both steps are skipped and only the cached surface is blitted.
+
+class GridPresenter:
+    def __init__(self, grid_w, grid_h, pixel_size):
+        self.small = pygame.Surface((grid_w, grid_h))
+        self.scaled = pygame.Surface((grid_w*pixel_size, grid_h*pixel_size))
+        self.last = None
+
+    def changed(self, grid):
+        return self.last is None or self.last.shape != grid.shape or not np.array_equal(self.last, grid)
+
+    def present(self, surface, grid, dest=(0, 0)):
+        # grid is x first like surfarray; returns whether anything had to be redrawn
+        grid = np.asarray(grid)
+        changed = self.changed(grid)
+        if changed:
+            self.last = grid.copy()
+            pygame.surfarray.blit_array(self.small, np.clip(grid, 0, 255).astype(np.uint8))
+            pygame.transform.scale(self.small, self.scaled.get_size(), self.scaled)
+        surface.blit(self.scaled, dest)
+        return changed
@@ -0,0 +1,121 @@
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Opt-in per-stage profiling for WallpaperCreator. A StageProfiler records one entry per stage:
+# wall time, how many pixels of the canvas it changed (when given the canvas array to diff) and,
+# with memory=True, the tracemalloc peak above what was allocated when the stage started.
+# Records carry the scene they belong to, so one profiler can stay on for a whole batch.
+#
+# Off is NO_PROFILE: stage() hands back one shared nullcontext and stages() returns the generator
+# untouched, so leaving the hooks in costs a method call per stage.
+
+class StageProfiler:
+    enabled = True
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.records = []
+        self.scene = None
+        self.origin = time.perf_counter()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def begin(self, scene):
+        self.scene = scene
+
+    def clear(self):
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, pixels=None):
+        # pixels: an array to diff before/after (counts changed pixels) or just a pixel count
+        rec = {"name": name, "scene": self.scene}
+        before = pixels.copy() if hasattr(pixels, "copy") else None
+        if self.memory:
+            tracemalloc.reset_peak()
+            mem0 = tracemalloc.get_traced_memory()[0]
+        t = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            end = time.perf_counter()
+            rec["start_ms"] = (t-self.origin)*1000
+            rec["ms"] = (end-t)*1000
+            if before is not None:
+                rec["pixels"] = int((before != pixels).any(-1).sum())
+            elif pixels is not None:
+                rec["pixels"] = int(pixels)
+            if self.memory:
+                rec["peak_kb"] = (tracemalloc.get_traced_memory()[1]-mem0)/1024
+            if rec["name"] is not None:
+                self.records.append(rec)
+
+    def stages(self, it, pixels=None):
+        # times a generator that yields after each stage, a record is named by what it yields
+        it = iter(it)
+        while True:
+            with self.stage(None, pixels) as rec:
+                try:
+                    name = next(it)
+                except StopIteration:
+                    return
+                rec["name"] = name
+            yield name
+
+    def last_scene(self):
+        return [r for r in self.records if r["scene"] == self.scene]
+
+    def title(self, top=4):
+        # short enough for a window caption: total, then the slowest stages of the last scene
+        recs = self.last_scene()
+        slow = sorted(recs, key=lambda r: -r["ms"])[:top]
+        return f"scene {self.scene}: {sum(r['ms'] for r in recs):.0f}ms | " + \
+            ", ".join(f"{r['name']} {r['ms']:.1f}ms" for r in slow)
+
+    def report(self):
+        lines = []
+        for r in self.records:
+            extra = "".join([f" {r['pixels']:>8}px" if "pixels" in r else "",
+                             f" {r['peak_kb']:>9.1f}KB" if "peak_kb" in r else ""])
+            lines.append(f"{str(r['scene']):>12} {r['name']:16} {r['ms']:9.2f}ms{extra}")
+        return "\n".join(lines)
+
+    def to_json(self, filename):
+        with open(filename, "w") as f:
+            json.dump({"records": self.records}, f, indent=1)
+
+    def to_chrome_trace(self, filename):
+        # chrome://tracing / Perfetto "complete" events, one process per worker
+        events = [{"name": r["name"], "ph": "X", "ts": r["start_ms"]*1000, "dur": r["ms"]*1000,
+                   "pid": os.getpid(), "tid": 0, "cat": "scene",
+                   "args": {k: v for k, v in r.items() if k in ("scene", "pixels", "peak_kb")}}
+                  for r in self.records]
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+class NullProfiler:
+    enabled = False
+    records = []
+    _off = nullcontext()
+
+    def begin(self, scene): pass
+    def clear(self): pass
+    def stage(self, name, pixels=None): return self._off
+    def stages(self, it, pixels=None): return it
+    def title(self, top=4): return ""
+
+NO_PROFILE = NullProfiler()
+
+def profiled(name):
+    # for methods of objects with a .profiler
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(self, *args, **kwargs):
+            with self.profiler.stage(name):
+                return fn(self, *args, **kwargs)
+        return inner
+    return wrap
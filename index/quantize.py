@@ -0,0 +1,57 @@
+from collections import OrderedDict
+import numpy as np
+
+# Palette quantisation on whole arrays. The default path is a lookup cube: every RGB colour is
+# cut down to `bits` bits per channel (32x32x32 at bits=5) and the cube cell holds the palette
+# index nearest to its centre. Building a cube is one vectorised nearest search over the cells
+# (cheap even for the 1000+ colour palettes make_big_palette gives) and the cubes are kept per
+# palette, so a batch reusing a palette only pays for it once. exact=True instead searches the
+# distinct colours of the image directly, which is what the old per-pixel min() did.
+
+MAX_LUTS = 32
+_luts = OrderedDict()
+
+def palette_key(palette):
+    return tuple(tuple(int(c) for c in col[:3]) for col in palette)
+
+def nearest_exact(cols, palette, chunk=4096):
+    # cols (n, 3) -> index of the nearest palette colour, ties go to the first one like min() did
+    # |c-p|^2 = |c|^2 - 2c.p + |p|^2 and |c|^2 doesn't change the argmin; all integers, so float64 is exact
+    cols = np.asarray(cols, dtype=np.float64).reshape(-1, 3)
+    pal = np.asarray(palette_key(palette), dtype=np.float64)
+    pal2 = (pal*pal).sum(1)
+    out = np.empty(len(cols), dtype=np.intp)
+    step = max(1, chunk*64//max(1, len(pal)))
+    for i in range(0, len(cols), step):
+        out[i:i+step] = (pal2[None, :] - 2*cols[i:i+step] @ pal.T).argmin(1)
+    return out
+
+def palette_lut(palette, bits=5):
+    key = (palette_key(palette), bits)
+    lut = _luts.get(key)
+    if lut is not None:
+        _luts.move_to_end(key)
+        return lut
+    n = 1 << bits
+    centres = (np.arange(n) << (8-bits)) + ((1 << (8-bits)) >> 1)
+    r, g, b = np.meshgrid(centres, centres, centres, indexing="ij")
+    idx = nearest_exact(np.stack([r, g, b], -1), key[0])
+    lut = idx.reshape(n, n, n).astype(np.uint8 if len(key[0]) <= 256 else np.uint16)
+    _luts[key] = lut
+    while len(_luts) > MAX_LUTS:
+        _luts.popitem(last=False)
+    return lut
+
+def quantize_indices(pixels, palette, exact=False, bits=5):
+    pixels = np.asarray(pixels)
+    if exact:
+        packed = (pixels[..., 0].astype(np.int32) << 16) | (pixels[..., 1].astype(np.int32) << 8) | pixels[..., 2]
+        uniq, inverse = np.unique(packed, return_inverse=True)
+        cols = np.stack([uniq >> 16, (uniq >> 8) & 255, uniq & 255], -1)
+        return nearest_exact(cols, palette)[inverse].reshape(packed.shape)
+    shift = 8-bits
+    lut = palette_lut(palette, bits)
+    return lut[pixels[..., 0] >> shift, pixels[..., 1] >> shift, pixels[..., 2] >> shift]
+
+def quantize(pixels, palette, exact=False, bits=5):
+    return np.asarray(palette_key(palette), dtype=np.uint8)[quantize_indices(pixels, palette, exact, bits)]
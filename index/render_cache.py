@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from disk_budget import DiskBudget
+
+# On-disk render cache. Entries are keyed by a hash of the scene spec + output size + renderer
+# version and hold the low-res buffer (<key>.npy) and the final upscaled image (<key>.png); PNG
+# keys also hold the zlib level. Hits bump the file mtime and the size is kept by a
+# disk_budget.DiskBudget, which drops the least recently used files once the directory passes
+# max_bytes, counting every process's files, so it behaves as an LRU by size. Safe to share
+# between batch workers: files are written to a temp name and renamed into place.
+
+def scene_key(spec, width, height, block_size, version, png_level=None):
+    key = {"spec": spec, "size": [width, height], "block": block_size, "version": version}
+    if png_level is not None: key["png_level"] = png_level
+    blob = json.dumps(key, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+class RenderCache:
+    def __init__(self, root="render_cache", max_bytes=256*1024*1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.budget = DiskBudget(root, max_bytes, (".npy", ".png"))
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key, ext):
+        return os.path.join(self.root, key + ext)
+
+    def touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def replace(self, tmp, path):
+        # rename into place and charge the size difference to the shared budget
+        try:
+            old = os.path.getsize(path)
+        except FileNotFoundError:
+            old = 0
+        os.replace(tmp, path)
+        self.budget.add(os.path.getsize(path)-old)
+
+    def get_low(self, key):
+        path = self.path(key, ".npy")
+        if not self.touch(path):
+            self.misses += 1
+            return None
+        try:
+            low = np.load(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return low
+
+    def put_low(self, key, pixels):
+        tmp = self.path(key, f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, pixels)
+        self.replace(tmp, self.path(key, ".npy"))
+
+    def get_png(self, key, filename):
+        # copies the cached image to filename, False on a miss
+        path = self.path(key, ".png")
+        if not self.touch(path):
+            self.misses += 1
+            return False
+        try:
+            shutil.copyfile(path, filename)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put_png(self, key, filename):
+        tmp = self.path(key, f".{os.getpid()}.tmp")
+        shutil.copyfile(filename, tmp)
+        self.replace(tmp, self.path(key, ".png"))
+
+    def size(self):
+        return self.budget.total()
+
+    def clear(self):
+        self.budget.reset()
@@ -0,0 +1,40 @@
+import numpy as np
+
+# Rings, orbits and rim lights from a polar distance field. Every pixel in the ring's bounding
+# box gets its distance to the centre (minus the wave at its angle); the ones that land in
+# [r - 0.5, r - 0.5 + thickness) belong to the ring. That is gap free at any radius and costs
+# one pass over the box, instead of 360 cos/sin/set_at steps that miss pixels on big rings and
+# hit the same ones over and over on small ones.
+#
+# Results are flat xs, ys, cols like starfield, for PixelCanvas.put or starfield.scatter.
+
+def ring_field(cx, cy, r, thickness=1, wave_freq=1, wave_amp=0, phase=0, box=None):
+    # -> xs, ys and u, how far across the thickness each pixel sits (0 inner edge .. 1 outer)
+    reach = int(r + thickness + abs(wave_amp)) + 1
+    x0, y0, x1, y1 = cx-reach, cy-reach, cx+reach+1, cy+reach+1
+    if box is not None:
+        x0, y0, x1, y1 = max(x0, box[0]), max(y0, box[1]), min(x1, box[2]), min(y1, box[3])
+    if x0 >= x1 or y0 >= y1:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+    ys, xs = np.mgrid[y0:y1, x0:x1]
+    dx, dy = xs-cx, ys-cy
+    d = np.hypot(dx, dy)
+    if wave_amp:
+        # angle in degrees, the unit wave_freq was tuned for
+        deg = np.degrees(np.arctan2(dy, dx)) % 360
+        d = d - np.sin(deg/wave_freq + phase)*wave_amp
+    u = d - (r-0.5)
+    m = (u >= 0) & (u < thickness)
+    return xs[m], ys[m], u[m]/thickness
+
+def ring_pixels(cx, cy, r, color, thickness=1, fade=0.0, wave_freq=1, wave_amp=0, phase=0,
+                sparkle=0.0, rng=None, box=None):
+    # fade dims the colour towards the outer edge; sparkle is the chance a ring pixel also
+    # lights the pixel down-right of it
+    xs, ys, u = ring_field(cx, cy, r, thickness, wave_freq, wave_amp, phase, box)
+    cols = (np.asarray(color[:3], dtype=np.float64)*(1-fade*u)[:, None]).clip(0, 255).astype(np.uint8)
+    if not sparkle:
+        return xs, ys, cols
+    s = rng.random(len(xs)) < sparkle
+    return np.concatenate([xs, xs[s]+1]), np.concatenate([ys, ys[s]+1]), np.concatenate([cols, cols[s]])
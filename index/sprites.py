@@ -0,0 +1,132 @@
+from collections import OrderedDict
+import numpy as np
+import pygame
+
+# Radial falloff sprites (haze, lens flares, atmospheres, shadows). Each one is built once from a
+# distance field with array math instead of rad concentric circles or a set_at per pixel, then kept
+# in an LRU keyed on its shape parameters (radius, colour, alpha, falloff exponent). The cache is
+# module level, so every wallpaper a process renders (batch workers included) shares it.
+# max_bytes bounds the pixel memory held; the least recently used sprites go first.
+
+class SpriteCache:
+    def __init__(self, max_bytes=32*1024*1024):
+        self.max_bytes = max_bytes
+        self.sprites = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = build()
+        self.sprites[key] = sprite
+        self.bytes += sprite_bytes(sprite)
+        while self.bytes > self.max_bytes and len(self.sprites) > 1:
+            _, old = self.sprites.popitem(last=False)
+            self.bytes -= sprite_bytes(old)
+        return sprite
+
+    def clear(self):
+        self.sprites.clear()
+        self.bytes = 0
+
+def sprite_bytes(sprite):
+    if isinstance(sprite, pygame.Surface):
+        return sprite.get_width()*sprite.get_height()*4
+    return sum(a.nbytes for a in sprite)
+
+cache = SpriteCache()
+
+def falloff_key(x):
+    # exponents often come from random.random(); two decimals is far below what 8-bit alpha shows
+    return round(float(x), 2)
+
+def distance_field(w, h, cx, cy):
+    # distance from each pixel centre to (cx, cy), the point the old circles were drawn around
+    ys, xs = np.ogrid[0:h, 0:w]
+    return np.sqrt((xs+0.5-cx)**2 + (ys+0.5-cy)**2)
+
+def surface_from(rgb, alpha):
+    # rgb (h, w, 3), alpha (h, w), both already in 0..255
+    h, w = alpha.shape
+    surf = pygame.Surface((w, h), pygame.SRCALPHA)
+    px = pygame.surfarray.pixels3d(surf)
+    px[:] = rgb.astype(np.uint8).swapaxes(0, 1)
+    del px
+    pa = pygame.surfarray.pixels_alpha(surf)
+    pa[:] = alpha.astype(np.uint8).T
+    del pa
+    return surf
+
+def premultiplied(surf):
+    # (h, w, 3) uint8 colour times alpha of an SRCALPHA sprite, ready to add onto a layer
+    rgb = pygame.surfarray.pixels3d(surf).swapaxes(0, 1)
+    a = pygame.surfarray.pixels_alpha(surf).T
+    out = (rgb*(a[..., None]/255)).astype(np.uint8)
+    del rgb, a
+    return out
+
+def radial_glow(radius, color, alpha, falloff=1.0, color_falloff=None):
+    # what drawing filled circles from radius down to 1 leaves behind: the pixel keeps the ring
+    # t = r/radius of the smallest circle covering it, alpha*t**falloff, colour*t**color_falloff
+    color = tuple(int(c) for c in color[:3])
+    falloff = falloff_key(falloff)
+    color_falloff = falloff if color_falloff is None else falloff_key(color_falloff)
+    def build():
+        d = distance_field(2*radius, 2*radius, radius, radius)
+        inside = d <= radius
+        t = np.maximum(1, np.ceil(d))/radius
+        a = np.where(inside, alpha*t**falloff, 0)
+        rgb = np.where(inside[..., None], np.asarray(color)*(t**color_falloff)[..., None], 0)
+        return surface_from(rgb, a)
+    return cache.get(("glow", radius, color, alpha, falloff, color_falloff), build)
+
+def radial_fade(radius, color, alpha, falloff=1.0, offset=(0, 0)):
+    # flat colour, alpha*(1-d/radius)**falloff inside the circle; offset moves the centre
+    # (right, up) inside the 2*radius square like the planet shadows did
+    color = tuple(int(c) for c in color[:3])
+    falloff = falloff_key(falloff)
+    offset = (int(offset[0]), int(offset[1]))
+    def build():
+        d = distance_field(2*radius, 2*radius, radius+offset[0]+0.5, radius-offset[1]+0.5)
+        inside = d < radius
+        a = np.where(inside, alpha*np.clip(1-d/radius, 0, 1)**falloff, 0)
+        rgb = np.where(inside[..., None], np.asarray(color), 0)
+        return surface_from(rgb, a)
+    return cache.get(("fade", radius, color, alpha, falloff, offset), build)
+
+def halo(radius, width, color, alpha):
+    # stacked discs radius+width .. radius+1: ring i keeps alpha*i/width and colour*(1-i/width),
+    # the disc itself gets ring 1. Returned as arrays (rgb, alpha, mask) so it can be stamped
+    # over a layer the way draw.circle overwrote it, not alpha blended.
+    color = tuple(int(c) for c in color[:3])
+    def build():
+        size = 2*(radius+width)
+        d = distance_field(size, size, radius+width, radius+width)
+        mask = d <= radius+width
+        i = np.clip(np.ceil(d-radius), 1, width)
+        rgb = np.clip(np.asarray(color)*(1-i/width)[..., None], 0, 255).astype(np.uint8)
+        a = (alpha*i/width).astype(np.uint8)
+        return rgb, a, mask
+    return cache.get(("halo", radius, width, color, alpha), build)
+
+def stamp(surf, sprite, x, y):
+    # overwrite surf (SRCALPHA) with the masked sprite arrays at top-left (x, y), clipped
+    rgb, a, mask = sprite
+    h, w = mask.shape
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(surf.get_width(), x+w), min(surf.get_height(), y+h)
+    if x0 >= x1 or y0 >= y1: return
+    sl = (slice(y0-y, y1-y), slice(x0-x, x1-x))
+    m = mask[sl]
+    px = pygame.surfarray.pixels3d(surf).swapaxes(0, 1)[y0:y1, x0:x1]
+    px[m] = rgb[sl][m]
+    del px
+    pa = pygame.surfarray.pixels_alpha(surf).T[y0:y1, x0:x1]
+    pa[m] = a[sl][m]
+    del pa
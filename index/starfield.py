@@ -0,0 +1,85 @@
+import numpy as np
+
+# Star fields as arrays. Every star (position, colour, whether it gets plus arms or a box) is
+# drawn from the rng in one go, shapes become extra copies of the positions shifted by each
+# offset, and the whole field is handed back as flat xs, ys, cols for a single scatter write
+# (PixelCanvas.put, or scatter() on any (H, W, 3) array). Cost only depends on the star count.
+#
+# density is an optional (h, w) weight map: positions are drawn from it instead of uniformly,
+# e.g. a nebula's noise field so stars bunch up where the gas is.
+
+PLUS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+def box_offsets(r):
+    return [(xx, yy) for xx in range(-r, r+1) for yy in range(-r, r+1)]
+
+def noise_density(values, bias=0.6):
+    # noise in -1..1 -> weights; bias 0 is uniform, 1 puts no stars at the noise minimum
+    v = (np.asarray(values, dtype=np.float64)+1)/2
+    return (1-bias) + bias*np.clip(v, 0, 1)
+
+def sample_positions(rng, w, h, count, density=None):
+    if density is None:
+        return rng.integers(0, w, count), rng.integers(0, h, count)
+    p = np.asarray(density, dtype=np.float64)
+    if p.shape != (h, w):
+        raise ValueError(f"density map is {p.shape}, expected {(h, w)}")
+    cdf = np.cumsum(p.ravel())
+    idx = np.searchsorted(cdf, rng.random(count)*cdf[-1], side="right")
+    idx = np.minimum(idx, p.size-1)
+    return idx % w, idx // w
+
+def spread(xs, ys, offsets):
+    # one copy of every point per offset, offset-major like the old nested loops
+    off = np.asarray(offsets).reshape(-1, 2)
+    return (xs[None, :]+off[:, :1]).ravel(), (ys[None, :]+off[:, 1:]).ravel()
+
+def join(parts):
+    xs = np.concatenate([p[0] for p in parts]).astype(np.int64)
+    ys = np.concatenate([p[1] for p in parts]).astype(np.int64)
+    cols = np.concatenate([np.broadcast_to(p[2], (len(p[0]), 3)) for p in parts])
+    return xs, ys, cols
+
+def star_field(rng, w, h, count, palette, plus=0.1, boxed=0.02, box_radii=(1, 2),
+               box_color=(255, 255, 255), same_arm_color=False, density=None):
+    pal = np.asarray(palette)
+    xs, ys = sample_positions(rng, w, h, count, density)
+    cols = pal[rng.integers(len(pal), size=count)]
+    parts = [(xs, ys, cols)]
+    arm = rng.random(count) < plus
+    for dx, dy in PLUS:
+        c = cols[arm] if same_arm_color else pal[rng.integers(len(pal), size=arm.sum())]
+        parts.append((xs[arm]+dx, ys[arm]+dy, c))
+    box = rng.random(count) < boxed
+    rs = rng.integers(box_radii[0], box_radii[1]+1, size=count)
+    for r in range(box_radii[0], box_radii[1]+1):
+        sel = box & (rs == r)
+        bx, by = spread(xs[sel], ys[sel], box_offsets(r))
+        parts.append((bx, by, box_color))
+    return join(parts)
+
+def star_clusters(rng, w, h, clusters, per, palette, max_dist, margin=(0, 0), tail=0.0, density=None):
+    # clusters centres (inside margin) with per stars each at a random angle and whole-pixel
+    # distance up to max_dist; tail is the chance of a second pixel to the right
+    pal = np.asarray(palette)
+    mx, my = margin
+    if density is None:
+        cx, cy = rng.integers(mx, w-mx+1, clusters), rng.integers(my, h-my+1, clusters)
+    else:
+        x1, y1 = min(w, w-mx+1), min(h, h-my+1)
+        cx, cy = sample_positions(rng, x1-mx, y1-my, clusters, np.asarray(density)[my:y1, mx:x1])
+        cx, cy = cx+mx, cy+my
+    n = clusters*per
+    ang = rng.uniform(0, 2*np.pi, n)
+    dist = rng.integers(0, max_dist+1, n)
+    xs = (np.repeat(cx, per) + np.cos(ang)*dist).astype(np.int64)
+    ys = (np.repeat(cy, per) + np.sin(ang)*dist).astype(np.int64)
+    cols = pal[rng.integers(len(pal), size=n)]
+    t = rng.random(n) < tail
+    return join([(xs, ys, cols), (xs[t]+1, ys[t], cols[t])])
+
+def scatter(pixels, xs, ys, cols):
+    # pixels (H, W, 3); out of bounds stars are dropped, later stars win
+    h, w = pixels.shape[:2]
+    ok = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+    pixels[ys[ok], xs[ok]] = cols[ok]
@@ -0,0 +1,93 @@
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import multiprocessing
+import time
+import numpy as np
+from png_stream import PngWriter
+
+# Tiled renderer for print-size output: python index/tiled.py --seed 7 --width 7680 --height 4320 --out big.png
+# The output is cut into tile x tile squares (rounded to whole blocks). Each worker renders only the
+# low-res window under its tile from the shared scene spec (PixelCanvas window, everything still drawn
+# in scene coordinates so neighbouring tiles agree on every pixel), blows it up by block_size and sends
+# the tile back. For .png the parent collects one row of tiles at a time and streams it through
+# PngWriter; for .npy tiles go straight into a disk-backed array. Either way no process holds more
+# than two rows of tiles. The result is identical to WallpaperCreator.save_wallpaper.
+
+def tile_boxes(width, height, tile, block):
+    tile = max(block, tile//block*block)
+    return [(x0, y0, min(width, x0+tile), min(height, y0+tile))
+            for y0 in range(0, height, tile) for x0 in range(0, width, tile)]
+
+def render_tile(job):
+    from main import render_scene
+    from canvas import PixelCanvas
+    spec, width, height, (x0, y0, x1, y1) = job
+    low_w, low_h = spec["size"]
+    # same nearest-neighbour mapping as pygame.transform.scale, also when width isn't a multiple of block
+    xs = np.arange(x0, x1)*low_w//width
+    ys = np.arange(y0, y1)*low_h//height
+    canvas = PixelCanvas(low_w, low_h, window=(xs[0], ys[0], xs[-1]+1, ys[-1]+1))
+    render_scene(canvas, spec)
+    return (x0, y0, x1, y1), canvas.pixels[(ys-ys[0])[:, None], (xs-xs[0])[None, :]]
+
+def render_tiled(spec, width, height, block_size, filename, tile=1024, workers=None, png_level=6):
+    if list(spec["size"]) != [width//block_size, height//block_size]:
+        raise ValueError(f"scene spec is {spec['size'][0]}x{spec['size'][1]} low-res, "
+                         f"{width}x{height} at block {block_size} needs {width//block_size}x{height//block_size}")
+    to_npy = filename.lower().endswith(".npy")
+    jobs = [(spec, width, height, box) for box in tile_boxes(width, height, tile, block_size)]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers) as pool:
+        if to_npy:
+            out = np.lib.format.open_memmap(filename, mode="w+", dtype=np.uint8, shape=(height, width, 3))
+            for (x0, y0, x1, y1), pixels in pool.imap_unordered(render_tile, jobs):
+                out[y0:y1, x0:x1] = pixels
+            out.flush()
+            del out
+        else:
+            # one row of tiles at a time, the next row renders while this one is encoded
+            bands = [[job for job in jobs if job[3][1] == y0] for y0 in sorted({job[3][1] for job in jobs})]
+            with PngWriter(filename, width, height, png_level) as png:
+                pending = pool.map_async(render_tile, bands[0])
+                for i in range(len(bands)):
+                    tiles = pending.get()
+                    if i+1 < len(bands): pending = pool.map_async(render_tile, bands[i+1])
+                    (_, y0, _, y1), _ = tiles[0]
+                    band = np.empty((y1-y0, width, 3), dtype=np.uint8)
+                    for (x0, _, x1, _), pixels in tiles:
+                        band[:, x0:x1] = pixels
+                    png.write_rows(band)
+                    del tiles, band
+        # see batch.py, SDL eats the SIGTERM from terminate()
+        pool.close()
+        pool.join()
+    return len(jobs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render one very large wallpaper in tiles.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spec", default=None, help="render a saved scene spec instead of planning one from --seed")
+    parser.add_argument("--width", type=int, default=7680)
+    parser.add_argument("--height", type=int, default=4320)
+    parser.add_argument("--block-size", type=int, default=8)
+    parser.add_argument("--tile", type=int, default=1024, help="tile edge in output pixels")
+    parser.add_argument("--workers", type=int, default=None, help="defaults to the CPU count")
+    parser.add_argument("--out", default="space_wallpaper_tiled.png", help=".png, or .npy to keep the raw RGB array")
+    parser.add_argument("--png-level", type=int, default=6, choices=range(10), metavar="0-9",
+                        help="zlib level, 1 is fastest, 9 smallest")
+    args = parser.parse_args()
+    from main import plan_scene, load_scene_spec
+    if args.spec:
+        spec = load_scene_spec(args.spec)
+    else:
+        spec = plan_scene(args.seed, args.width//args.block_size, args.height//args.block_size)
+    start = time.perf_counter()
+    tiles = render_tiled(spec, args.width, args.height, args.block_size, args.out, args.tile, args.workers, args.png_level)
+    total = time.perf_counter()-start
+    print(f"{args.width}x{args.height} in {tiles} tiles: {total:.2f}s, "
+          f"{args.width*args.height/total/1e6:.1f} Mpx/s -> {args.out}")
+
+if __name__ == "__main__":
+    main()
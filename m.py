@@ -1,7 +1,12 @@
 import pygame
 import random
 import math
-from perlin_noise import PerlinNoise
+import numpy as np
+from index.noise_field import NoiseField
+from index.planet_shader import shade_planet
+from index.rings import ring_pixels
+from index.starfield import star_field, star_clusters, scatter
+from index.sprites import radial_fade
 
 WIDTH, HEIGHT = 900, 680
 PLANET_RADIUS = 130
@@ -26,40 +31,26 @@ def draw_gradient_bg(surface, top_color, bottom_color):
         pygame.draw.line(surface, color, (0, y), (WIDTH, y))
 
 def background_noise_overlay(surface, intensity=17):
-    noise = PerlinNoise(octaves=3)
-    for y in range(0, HEIGHT, PIXEL_SIZE):
-        for x in range(0, WIDTH, PIXEL_SIZE):
-            val = (noise([x/WIDTH, y/HEIGHT])+1)/2
-            bright = min(255, max(0, int(val*intensity)))
-            col = (bright, bright, bright)
-            surface.fill(col, ((x, y, PIXEL_SIZE, PIXEL_SIZE)))
+    noise = NoiseField(octaves=3)
+    val = (noise.grid(np.arange(0, WIDTH, PIXEL_SIZE)/WIDTH, np.arange(0, HEIGHT, PIXEL_SIZE)/HEIGHT).T+1)/2
+    bright = np.clip((val*intensity).astype(int), 0, 255)
+    bright = bright.repeat(PIXEL_SIZE, 0).repeat(PIXEL_SIZE, 1)
+    arr = pygame.surfarray.pixels3d(surface)
+    w, h = min(arr.shape[0], bright.shape[0]), min(arr.shape[1], bright.shape[1])
+    arr[:w, :h] = bright[:w, :h, None]
+    del arr
 
 def scatter_stars(surface, count, color_palette):
-    for _ in range(count):
-        x, y = random.randint(0, WIDTH-1), random.randint(0, HEIGHT-1)
-        color = random.choice(color_palette)
-        surface.set_at((x, y), color)
-        if random.random()<0.14:
-            # Small cluster
-            for dx, dy in [(-1,0),(1,0),(0,-1),(0,1)]:
-                if 0<=x+dx<WIDTH and 0<=y+dy<HEIGHT:
-                    surface.set_at((x+dx, y+dy), color)
+    rng = np.random.default_rng(random.getrandbits(32))
+    # 14% get a small plus-shaped cluster in their own colour
+    stars = star_field(rng, WIDTH, HEIGHT, count, color_palette, plus=0.14, boxed=0, same_arm_color=True)
+    scatter(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), *stars)
 
 def cluster_star_bursts(surface, clusters, stars_per=15):
     colors = [(255,255,255), (255,240,180), (210,190,255)]
-    for _ in range(clusters):
-        cx = random.randint(60, WIDTH-60)
-        cy = random.randint(40, HEIGHT-40)
-        for _ in range(stars_per):
-            angle = random.uniform(0, 2*math.pi)
-            dist = random.randint(0, 22)
-            x = int(cx + math.cos(angle)*dist)
-            y = int(cy + math.sin(angle)*dist)
-            col = random.choice(colors)
-            if 0<=x<WIDTH and 0<=y<HEIGHT:
-                surface.set_at((x, y), col)
-                if random.random() < 0.14:
-                    surface.set_at((x+1, y), col)
+    rng = np.random.default_rng(random.getrandbits(32))
+    stars = star_clusters(rng, WIDTH, HEIGHT, clusters, stars_per, colors, 22, margin=(60, 40), tail=0.14)
+    scatter(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), *stars)
 
 def planet_palette_gradient(base_color, bands, highlight=40):
     r, g, b = base_color
@@ -72,46 +63,16 @@ def planet_palette_gradient(base_color, bands, highlight=40):
     return cols
 
 def draw_textured_planet(surface, cx, cy, radius, palette, noise, bands):
-    for y in range(-radius, radius):
-        for x in range(-radius, radius):
-            if x*x + y*y <= radius*radius:
-                nx = (cx + x)/WIDTH
-                ny = (cy + y)/HEIGHT
-                n_raw = noise([nx*3, ny*3])
-                radial = math.sqrt(x*x + y*y)/radius
-                value = 0.6*radial + 0.4*((n_raw+1)/2)
-                idx = int(value * (bands-1))
-                color = palette[max(0,min(bands-1,idx))]
-                screen.fill(color, ((cx+x, cy+y, PIXEL_SIZE, PIXEL_SIZE)))
-                # Rim highlight
-                if abs(radial-1)<0.05:
-                    screen.fill((255,255,255), ((cx+x, cy+y, PIXEL_SIZE, PIXEL_SIZE)))
-                # Crater (noise threshold)
-                if n_raw < -0.3 and radial < 0.88:
-                    screen.fill((40,44,55), ((cx+x, cy+y, PIXEL_SIZE, PIXEL_SIZE)))
-                # Light spots
-                if n_raw > 0.45 and radial < 0.73:
-                    screen.fill((230,230,255), ((cx+x, cy+y, PIXEL_SIZE, PIXEL_SIZE)))
+    shade_planet(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), cx, cy, radius, palette, bands,
+                 noise=noise, noise_scale=(3/WIDTH, 3/HEIGHT), mix=(0.6, 0.4),
+                 rim=(0.05, (255,255,255), 1.0), craters=(-0.3, 0.88, (40,44,55)),
+                 spots=(0.45, 0.73, (230,230,255)), block=PIXEL_SIZE)
 
 def rim_lighting(surface, cx, cy, radius, color, thickness):
-    for t in range(thickness):
-        for deg in range(0, 360, 1):
-            rad = radius + t
-            x = int(cx + rad*math.cos(deg*math.pi/180))
-            y = int(cy + rad*math.sin(deg*math.pi/180))
-            if 0<=x<WIDTH and 0<=y<HEIGHT:
-                surface.set_at((x,y), color)
+    scatter(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), *ring_pixels(cx, cy, radius, color, thickness))
 
 def draw_planet_shadow(surface, cx, cy, radius, offset=(30,16)):
-    shadow = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
-    for y in range(radius*2):
-        for x in range(radius*2):
-            dx, dy = x-radius-offset[0], y-radius+offset[1]
-            dist = math.sqrt(dx*dx+dy*dy)
-            if dist < radius:
-                alpha = int(60 * (1-dist/radius))
-                shadow.set_at((x,y), (10,10,20,alpha))
-    surface.blit(shadow, (cx-radius, cy-radius))
+    surface.blit(radial_fade(radius, (10,10,20), 60, offset=offset), (cx-radius, cy-radius))
 
 def draw_pixel_moons(surface, cx, cy, count, max_r, parent_r, noise, base_palette):
     for i in range(count):
@@ -140,13 +101,14 @@ def draw_craters(surface, cx, cy, radius, count):
                         surface.set_at((px, py), crater_color)
 
 def draw_nebula_overlay(surface, color1, color2, alpha=95):
-    nebula = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    noise = PerlinNoise(octaves=5)
-    for y in range(0, HEIGHT, PIXEL_SIZE*3):
-        for x in range(0, WIDTH, PIXEL_SIZE*3):
-            nval = (noise([x/WIDTH, y/HEIGHT])+1)/2
-            color = lerp(color1, color2, nval)
-            nebula.fill((*color,alpha), ((x, y, PIXEL_SIZE*3, PIXEL_SIZE*3)))
+    step = PIXEL_SIZE*3
+    noise = NoiseField(octaves=5)
+    nval = (noise.grid(np.arange(0, WIDTH, step)/WIDTH, np.arange(0, HEIGHT, step)/HEIGHT).T+1)/2
+    c1, c2 = np.array(color1), np.array(color2)
+    small = pygame.Surface(nval.shape, pygame.SRCALPHA)
+    pygame.surfarray.pixels3d(small)[:] = (c1*(1-nval[..., None]) + c2*nval[..., None]).astype(np.uint8)
+    pygame.surfarray.pixels_alpha(small)[:] = alpha
+    nebula = pygame.transform.scale(small, (nval.shape[0]*step, nval.shape[1]*step))
     surface.blit(nebula,(0,0))
 
 def draw_highlights(surface, cx, cy, radius, highlight_color):
@@ -168,7 +130,7 @@ def draw_planet():
 
     planet_base = tuple(random.randint(85,155) for _ in range(3))
     planet_palette = planet_palette_gradient(planet_base, bands=11, highlight=19)
-    planet_noise = PerlinNoise(octaves=4)
+    planet_noise = NoiseField(octaves=4)
     pcx = WIDTH//2 + random.randint(-80,80)
     pcy = HEIGHT//2 + random.randint(-30,40)
     draw_textured_planet(screen, pcx, pcy, PLANET_RADIUS, planet_palette, planet_noise, bands=len(planet_palette))
@@ -176,7 +138,7 @@ def draw_planet():
     draw_planet_shadow(screen, pcx, pcy, PLANET_RADIUS)
     draw_craters(screen, pcx, pcy, PLANET_RADIUS, count=random.randint(12,18))
     draw_highlights(screen, pcx, pcy, PLANET_RADIUS, (250,250,240))
-    moon_noise = PerlinNoise(octaves=3)
+    moon_noise = NoiseField(octaves=3)
     draw_pixel_moons(screen, pcx, pcy, count=random.randint(2,4), max_r=28, parent_r=PLANET_RADIUS, noise=moon_noise, base_palette=planet_base)
 
 draw_planet()
@@ -1,7 +1,10 @@
 import pygame
 import random
 import math
-from perlin_noise import PerlinNoise
+import numpy as np
+from index.noise_field import NoiseField
+from index.planet_shader import shade_planet
+from index.starfield import star_field, scatter
 
 WIDTH, HEIGHT = 800,600
 PLANET_RADIUS = 120
@@ -30,26 +33,19 @@ def planet_color_gradient(base_color, bands):
     ]
 
 def draw_planet(surface, cx,cy,radius,palette, levels=6, noise=None):
-    for y in range(-radius,radius):
-        for x in range(-radius,radius):
-            if x*x + y*y <= radius*radius:
-                nx,ny = (cx+x)/WIDTH,(cy+y)/HEIGHT
-                band = int(((x*x+y*y)**0.5/radius) * (levels-1))
-                n_val = 0
-                if noise:
-                    n_raw = noise([nx*3,ny*3])
-                    n_val = int(((n_raw+1)/2)*2)
-                idx = min(levels-1,max(0,band + n_val))
-                surface.fill(palette[idx], ((cx+x,cy+y,PIXEL_SIZE,PIXEL_SIZE)))
+    def bands(radial, n):
+        n_val = 0 if n is None else (((n+1)/2)*2).astype(int)
+        return (radial*(levels-1)).astype(int) + n_val
+    shade_planet(pygame.surfarray.pixels3d(surface).swapaxes(0,1), cx, cy, radius, palette, levels,
+                 noise=noise, noise_scale=(3/WIDTH, 3/HEIGHT), band_fn=bands, block=PIXEL_SIZE)
 
 def draw_stars(surface, star_density=0.002,colors=None):
     if colors is None:
         colors = [(255,255,255),(220,210,180)]
     total_stars = int(WIDTH*HEIGHT*star_density)
-    for _ in range(total_stars):
-        x,y = random.randint(0, WIDTH-1), random.randint(0,HEIGHT-1)
-        color = random.choice(colors)
-        surface.set_at((x,y),color) 
+    rng = np.random.default_rng(random.getrandbits(32))
+    stars = star_field(rng, WIDTH, HEIGHT, total_stars, colors, plus=0, boxed=0)
+    scatter(pygame.surfarray.pixels3d(surface).swapaxes(0,1), *stars)
 
 def draw_wallpaper():
     top_color = tuple(random.randint(10,80) for _ in range(3))
@@ -58,7 +54,7 @@ def draw_wallpaper():
     draw_stars(screen,star_density=0.002)
     planet_base_color = tuple(random.randint(100,230) for _ in range(3))
     planet_palette = planet_color_gradient(planet_base_color,6)
-    planet_noise = PerlinNoise(octaves=4)
+    planet_noise = NoiseField(octaves=4)
     pcx, pcy = WIDTH//2 + random.randint(-100,100), HEIGHT//2+ random.randint(-50,50)
     draw_planet(screen, pcx, pcy, PLANET_RADIUS, planet_palette, levels=len(planet_palette), noise=planet_noise)
 
@@ -1,7 +1,12 @@
 import pygame
 import random
 import math
-from perlin_noise import PerlinNoise
+import numpy as np
+from index.noise_field import NoiseField
+from index.planet_shader import shade_planet
+from index.rings import ring_pixels
+from index.starfield import star_field, star_clusters, scatter
+from index.sprites import radial_fade
 
 WIDTH, HEIGHT = 800, 600
 PLANET_RADIUS = 120
@@ -17,24 +22,17 @@ def draw_stars(surface, star_density=0.002, colors=None):
     if colors is None:
         colors = [(255,255,255), (220,210,180)]
     total_stars = int(WIDTH*HEIGHT*star_density)
-    for _ in range(total_stars):
-        x, y = random.randint(0, WIDTH-1), random.randint(0, HEIGHT-1)
-        color = random.choice(colors)
-        surface.set_at((x, y), color)
+    rng = np.random.default_rng(random.getrandbits(32))
+    stars = star_field(rng, WIDTH, HEIGHT, total_stars, colors, plus=0, boxed=0)
+    scatter(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), *stars)
 
-def draw_planet(surface, cx, cy, radius, palette, levels=6, noise=None):
-    for y in range(-radius, radius):
-        for x in range(-radius, radius):
-            if x*x + y*y <= radius*radius:
-                nx, ny = (cx + x)/WIDTH, (cy + y)/HEIGHT
-                shade = palette[int(((x*x + y*y)**0.5 / radius) * (levels-1))]
-                n_val = 0
-                if noise:
-                    # Mix noise into band selection for pixel-art texture
-                    n_raw = noise([nx*3, ny*3])
-                    n_val = int(((n_raw+1)/2) * (levels-1))
-                idx = min(levels-1, max(0, int((((x*x + y*y)**0.5 / radius) * (levels-1) + n_val)//2)))
-                screen.fill(palette[idx], ((cx+x, cy+y, PIXEL_SIZE, PIXEL_SIZE)))
+def draw_planet(surface, cx, cy, radius, palette, levels=6, noise=None, noise_scale=3):
+    def bands(radial, n):
+        # Mix noise into band selection for pixel-art texture
+        n_val = 0 if n is None else (((n+1)/2) * (levels-1)).astype(int)
+        return ((radial * (levels-1)).astype(int) + n_val)//2
+    shade_planet(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), cx, cy, radius, palette, levels,
+                 noise=noise, noise_scale=(noise_scale/WIDTH, noise_scale/HEIGHT), band_fn=bands, block=PIXEL_SIZE)
 
 def pixel_quantize(palette, value, levels):
     step = 255 // levels
@@ -58,27 +56,10 @@ def draw_moons(surface, planet_cx, planet_cy, planet_r, palette, noise=None):
         moon_r = random.randint(18, 36)
         cx = int(planet_cx + math.cos(angle)*dist)
         cy = int(planet_cy + math.sin(angle)*dist)
-        levels = len(palette)
-        for y in range(-moon_r, moon_r):
-            for x in range(-moon_r, moon_r):
-                if x*x + y*y <= moon_r*moon_r:
-                    nx, ny = (cx + x) / WIDTH, (cy + y) / HEIGHT
-                    shade = palette[int(((x*x + y*y)**0.5 / moon_r) * (levels-1))]
-                    n_val = 0
-                    if noise:
-                        n_raw = noise([nx*8, ny*8])
-                        n_val = int(((n_raw+1)/2) * (levels-1))
-                    idx = min(levels-1, max(0, int((((x*x + y*y)**0.5 / moon_r) * (levels-1) + n_val)//2)))
-                    surface.fill(palette[idx], ((cx+x, cy+y, PIXEL_SIZE, PIXEL_SIZE)))
+        draw_planet(surface, cx, cy, moon_r, palette, levels=len(palette), noise=noise, noise_scale=8)
 
 def rim_light(surface, cx, cy, radius, color, thickness):
-    for t in range(thickness):
-        for theta in range(0,360,int(1.5)):
-            r = radius + t
-            x = int(cx + r*math.cos(math.radians(theta)))
-            y = int(cy + r*math.sin(math.radians(theta)))
-            if 0<=x<WIDTH and 0<=y<HEIGHT:
-                surface.set_at((x,y), color)
+    scatter(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), *ring_pixels(cx, cy, radius, color, thickness))
 
 def draw_craters(surface, cx, cy, radius, palette, count=14):
     for _ in range(count):
@@ -115,7 +96,7 @@ def make_space_scene():
     draw_background(screen,vertical_bands=len(bg_palette),palette=bg_palette)
     draw_stars(screen,star_density=0.002,colors=[(255,255,255),(180,200,250)])
     planet_cx, planet_cy = WIDTH//2 + random.randint(-70,80), HEIGHT//2 + random.randint(-30,40)
-    noise = PerlinNoise(octaves=4)
+    noise = NoiseField(octaves=4)
     draw_planet(screen, planet_cx, planet_cy, PLANET_RADIUS, planet_palette, levels=len(planet_palette), noise=noise)
     rim_light(screen,planet_cx,planet_cy,PLANET_RADIUS,random.choice(planet_palette),thickness=5)
     draw_craters(screen,planet_cx,planet_cy,PLANET_RADIUS,planet_palette,count=random.randint(12,18))
@@ -135,15 +116,8 @@ def draw_horizontal_stripes(surface, bands=6, palette=None):
         surface.fill(palette[i], rect)
 
 def generate_noise_grid(w, h, scale, octaves=4):
-    noise = PerlinNoise(octaves=octaves)
-    grid = []
-    for x in range(w):
-        row = []
-        for y in range(h):
-            val = noise([x/scale, y/scale])
-            row.append(val)
-        grid.append(row)
-    return grid
+    noise = NoiseField(octaves=octaves)
+    return noise.grid(np.arange(w)/scale, np.arange(h)/scale).T
 
 def dither_pixel_art(surface, grid, palette, band_levels):
     rows, cols = len(grid), len(grid[0])
@@ -155,47 +129,23 @@ def dither_pixel_art(surface, grid, palette, band_levels):
             pygame.draw.rect(surface, palette[idx], rect)
 
 def draw_planet_dither(surface, cx, cy, radius, palette, bands=8, noise_grid=None):
-    for y in range(-radius, radius):
-        for x in range(-radius, radius):
-            if x*x + y*y < radius*radius:
-                rx, ry = cx + x, cy + y
-                if 0 <= rx < WIDTH and 0 <= ry < HEIGHT:
-                    ridx = int(((x*x + y*y)**0.5 / radius) * (bands-1))
-                    nx, ny = (x+radius)//PIXEL_SIZE, (y+radius)//PIXEL_SIZE
-                    nidx = ridx
-                    if noise_grid:
-                        try:
-                            nval = noise_grid[nx][ny]
-                            offs = int(((nval+1)/2) * (bands-3))
-                            nidx = max(0, min(bands-1, (ridx+offs)//2))
-                        except:
-                            pass
-                    col = palette[nidx]
-                    surface.fill(col, ((rx, ry, PIXEL_SIZE, PIXEL_SIZE)))
+    def band_idx(radial, n):
+        ridx = (radial * (bands-1)).astype(int)
+        if n is None:
+            return ridx
+        offs = (np.nan_to_num((n+1)/2) * (bands-3)).astype(int)
+        return np.where(np.isnan(n), ridx, (ridx+offs)//2)
+    shade_planet(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), cx, cy, radius, palette, bands,
+                 noise=noise_grid, band_fn=band_idx, strict=True, block=PIXEL_SIZE)
 
 def draw_shadow(surface, cx, cy, radius, intensity, color):
-    shadow = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
-    for y in range(radius*2):
-        for x in range(radius*2):
-            dx, dy = x-radius, y-radius
-            dist = math.sqrt(dx*dx+dy*dy)
-            if dist < radius:
-                alpha = int( intensity * (1-dist/radius) )
-                shadow.set_at((x,y), (*color,alpha))
-    surface.blit(shadow, (cx-radius, cy-radius))
+    surface.blit(radial_fade(radius, color, intensity), (cx-radius, cy-radius))
 
 def random_star_clusters(surface, cluster_count=6, stars_per=23, color_list=None):
     color_list = color_list or [(255,255,255),(255,229,170),(230,210,250),(180,255,230)]
-    for _ in range(cluster_count):
-        cx = random.randint(80, WIDTH-80)
-        cy = random.randint(60, HEIGHT-60)
-        for _ in range(stars_per):
-            angle = random.uniform(0, 2*math.pi)
-            dist = random.randint(0, 38)
-            x = int(cx + math.cos(angle)*dist)
-            y = int(cy + math.sin(angle)*dist)
-            c = random.choice(color_list)
-            surface.set_at((x,y), c)
+    rng = np.random.default_rng(random.getrandbits(32))
+    stars = star_clusters(rng, WIDTH, HEIGHT, cluster_count, stars_per, color_list, 38, margin=(80, 60))
+    scatter(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), *stars)
 
 def draw_star_streak(surface, x, y, length, direction, color):
     angle = math.radians(direction)
@@ -248,16 +198,8 @@ def randomize_scene():
     draw_multiple_planets(screen, random.randint(0,2), planet_palette2, min_r=45, max_r=68)
 
 def seamless_noise_grid(w, h, scale, octaves=5):
-    noise = PerlinNoise(octaves=octaves)
-    grid = []
-    for x in range(w):
-        row = []
-        for y in range(h):
-            sx, sy = x/w, y/h
-            val = noise([sx*scale, sy*scale])
-            row.append(val)
-        grid.append(row)
-    return grid
+    noise = NoiseField(octaves=octaves)
+    return noise.grid(np.arange(w)/w*scale, np.arange(h)/h*scale).T
 
 def draw_grid_overlay(surface, grid, palette, opacity=50):
     rows = len(grid)
@@ -281,13 +223,7 @@ def pixelate_art(surface, block_size):
     pygame.surfarray.blit_array(surface, arr)
 
 def highlight_edges(surface, cx, cy, r, color, thickness):
-    for t in range(thickness):
-        for deg in range(0, 360, 1):
-            rad = r + t
-            x = int(cx + rad*math.cos(deg*math.pi/180))
-            y = int(cy + rad*math.sin(deg*math.pi/180))
-            if 0<=x<WIDTH and 0<=y<HEIGHT:
-                surface.set_at((x,y), color)
+    scatter(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), *ring_pixels(cx, cy, r, color, thickness))
 
 def draw_ringed_planet(surface, cx, cy, r, palette, noise_grid):
     draw_planet_dither(surface, cx, cy, r, palette, bands=len(palette), noise_grid=noise_grid)
@@ -296,13 +232,7 @@ def draw_ringed_planet(surface, cx, cy, r, palette, noise_grid):
         rx, ry = int(cx+r*0.5*math.cos(angle)), int(cy+r*0.5*math.sin(angle))
         thickness = random.randint(2,5)
         color = random.choice(palette)
-        for t in range(thickness):
-            for deg in range(0, 360, 1):
-                dist = r+28+t
-                x = int(cx + dist*math.cos(deg*math.pi/180))
-                y = int(cy + dist*math.sin(deg*math.pi/180))
-                if 0<=x<WIDTH and 0<=y<HEIGHT:
-                    surface.set_at((x,y), color)
+        scatter(pygame.surfarray.pixels3d(surface).swapaxes(0, 1), *ring_pixels(cx, cy, r+28, color, thickness))
 
 def draw_pixel_moons(surface, count, base_palette, noise_grid):
     for i in range(count):
@@ -316,8 +246,9 @@ def draw_pixel_moons(surface, count, base_palette, noise_grid):
         if random.random() < 0.35:
             highlight_edges(surface, cx, cy, moon_r, moon_palette[0], 2)
 
-def main_wallpaper_loop():
+def main_wallpaper_loop(seed=None):
     for i in range(3):
+        random.seed(None if seed is None else seed+i)
         screen.fill((0,0,0))
         randomize_scene()
         p_palette = random_palette(6)
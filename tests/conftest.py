@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the index modules import each other by bare name, like index/main.py does
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "index"))
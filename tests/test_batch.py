@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+import pygame
+import main
+from batch import run_batch
+
+def test_two_worker_batch(tmp_path, capsys):
+    out = tmp_path / "out"
+    timings = run_batch(4, 800, 600, 8, seed=3, out_dir=str(out), workers=2, buffer_dir=str(tmp_path / "buffers"))
+    assert sorted(s for s, _, _ in timings) == [3, 4, 5, 6]
+    for s in range(3, 7):
+        assert pygame.image.load(str(out / f"wallpaper_{s}.png")).get_size() == (800, 600)
+    # rerun resumes from the buffers, nothing left to render
+    assert run_batch(4, 800, 600, 8, seed=3, out_dir=str(out), workers=2, buffer_dir=str(tmp_path / "buffers")) == []
+    assert "nothing to render" in capsys.readouterr().out
+
+def test_headless_render_needs_no_display(tmp_path):
+    # fresh interpreter without SDL_VIDEODRIVER: importing main and saving must not open a display
+    code = ("import main, pygame\n"
+            "wc = main.WallpaperCreator(400, 300, 8, headless=True)\n"
+            "wc.generate_scene(1)\n"
+            f"wc.save_wallpaper({str(tmp_path / 'h.png')!r})\n"
+            "assert not pygame.display.get_init()\n")
+    env = {k: v for k, v in os.environ.items() if k not in ("SDL_VIDEODRIVER", "DISPLAY", "WAYLAND_DISPLAY")}
+    env["PYTHONPATH"] = os.path.dirname(main.__file__)
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+    assert (tmp_path / "h.png").exists()
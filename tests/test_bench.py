@@ -0,0 +1,26 @@
+import numpy as np
+import bench
+import dither
+import hsv
+import quantize
+import sprites
+from noise_cache import noise_fields
+from noise_field import NoiseField
+
+def test_cold_empties_every_cache():
+    pixels = np.random.default_rng(0).integers(0, 256, (16, 16, 3), dtype=np.uint8)
+    palette = [(0, 0, 0), (255, 255, 255), (200, 30, 30)]
+    quantize.quantize(pixels, palette)
+    dither.dither(pixels, palette, "blue-noise")
+    hsv.hue_value_lut()
+    sprites.radial_glow(6, (255, 200, 100), 120)
+    noise_fields.field(NoiseField(octaves=2, seed=3), 16, 16)
+    caches = [quantize._luts, hsv._luts, dither._blue, sprites.cache.sprites, noise_fields.fields]
+    assert all(caches)
+    bench.cold()
+    assert not any(caches)
+
+def test_report_names_cold_caches():
+    report = bench.run([(160, 112)], [1], repeat=1, stages=["gradient_bg", "quantize_colors"])
+    assert report["meta"]["cold_caches"] == list(bench.COLD_CACHES)
+    assert [r["stage"] for r in report["results"]] == ["gradient_bg", "quantize_colors"]
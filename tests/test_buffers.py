@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from buffers import BufferStore
+
+META = {"w": 12, "h": 8, "count": 4}
+
+def test_resume_keeps_done_slots(tmp_path):
+    root = str(tmp_path / "buf")
+    store = BufferStore(root, META, layers=("low", "final"))
+    assert store.pending() == [0, 1, 2, 3]
+    store.slot(1)[:] = 7
+    store.slot(1, "final")[:] = 9
+    store.mark_done(1)
+    store.slot(2)[:] = 5  # drawn but never marked done, like a worker killed mid-slot
+    del store
+    again = BufferStore(root, META, layers=("low", "final"))
+    assert again.pending() == [0, 2, 3]
+    assert again.is_done(1) and not again.is_done(2)
+    assert (again.slot(1) == 7).all() and (again.slot(1, "final") == 9).all()
+
+def test_workers_share_the_mapping(tmp_path):
+    root = str(tmp_path / "buf")
+    parent = BufferStore(root, META)
+    worker = BufferStore.open(root)
+    assert worker.meta == parent.meta
+    worker.slot(3)[:] = np.arange(3, dtype=np.uint8)
+    worker.mark_done(3)
+    assert parent.is_done(3)
+    assert (parent.slot(3) == np.arange(3)).all()
+
+def test_other_run_refused(tmp_path):
+    root = str(tmp_path / "buf")
+    BufferStore(root, META)
+    with pytest.raises(ValueError):
+        BufferStore(root, dict(META, w=16))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from dither import FLOYD_STEINBERG, ATKINSON, MODES, dither, error_diffuse, nearest
+
+PALETTE = [(0, 0, 0), (255, 255, 255), (200, 40, 40), (30, 60, 190), (240, 200, 60)]
+
+def image(seed=0, h=23, w=31):
+    return np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+def raster_diffuse(pixels, palette, kernel):
+    # the plain pixel by pixel loop the wavefront replaces
+    pal = np.asarray(palette, dtype=np.float32)
+    work = pixels.astype(np.float32)
+    h, w = work.shape[:2]
+    out = np.empty((h, w, 3), dtype=np.uint8)
+    for y in range(h):
+        for x in range(w):
+            idx = nearest(work[y, x], palette)
+            out[y, x] = palette[idx]
+            err = work[y, x] - pal[idx]
+            for dx, dy, weight in kernel:
+                if 0 <= x+dx < w and y+dy < h:
+                    work[y+dy, x+dx] += err*weight
+    return out
+
+@pytest.mark.parametrize("mode", list(MODES))
+def test_only_palette_colours(mode):
+    out = dither(image(), PALETTE, mode)
+    assert out.shape == (23, 31, 3) and out.dtype == np.uint8
+    assert set(map(tuple, out.reshape(-1, 3))) <= set(PALETTE)
+
+@pytest.mark.parametrize("kernel", [FLOYD_STEINBERG, ATKINSON])
+def test_wavefront_matches_raster_order(kernel):
+    pixels = image(1)
+    assert np.array_equal(error_diffuse(pixels, PALETTE, kernel), raster_diffuse(pixels, PALETTE, kernel))
+
+@pytest.mark.parametrize("mode", list(MODES))
+def test_mid_grey_mixes_black_and_white(mode):
+    out = dither(np.full((64, 64, 3), 128, dtype=np.uint8), [(0, 0, 0), (255, 255, 255)], mode)
+    assert abs(out.mean() - 128) < 8
+
+def test_palette_pixels_stay_put():
+    pixels = np.asarray(PALETTE, dtype=np.uint8)[np.random.default_rng(2).integers(0, len(PALETTE), (16, 16))]
+    for mode in ("floyd-steinberg", "atkinson"):
+        assert np.array_equal(dither(pixels, PALETTE, mode), pixels)
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        dither(image(), PALETTE, "sierra")
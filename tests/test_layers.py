@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import main
+from canvas import PixelCanvas
+from layers import Layer, LayerStack, blend, render_layer
+
+def pixels(*rows):
+    return np.array(rows, dtype=np.uint8).reshape(1, -1, 3)
+
+BASE = pixels((0, 100, 200), (255, 128, 10))
+TOP = pixels((50, 200, 100), (255, 0, 128))
+
+@pytest.mark.parametrize("mode,expected", [
+    ("alpha", TOP),
+    ("add", pixels((50, 255, 255), (255, 128, 138))),
+    ("multiply", pixels((0, 78, 78), (255, 0, 5))),
+    ("screen", pixels((50, 222, 222), (255, 128, 133))),
+])
+def test_blend_modes(mode, expected):
+    assert np.array_equal(blend(BASE.copy(), TOP, mode=mode), expected)
+
+def test_blend_opacity_and_cover():
+    out = blend(BASE.copy(), TOP, cover=np.array([[True, False]]), opacity=0.5, mode="add")
+    assert np.array_equal(out, pixels((25, 177, 227), (255, 128, 10)))
+
+def test_neutral_backdrop_leaves_stack_alone():
+    # add/screen/multiply layers draw on their neutral colour, an empty layer changes nothing
+    for mode in ("add", "screen", "multiply"):
+        rgb, cover, window = render_layer(Layer("empty", [], lambda c: None, mode=mode), 2, 1)
+        assert cover is None and window == (0, 0, 2, 1)
+        assert np.array_equal(blend(BASE.copy(), rgb, mode=mode), BASE)
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        Layer("x", [], lambda c: None, mode="overlay")
+
+def test_box_limits_drawing():
+    def draw(c):
+        c.fill((9, 9, 9))
+    rgb, cover, window = render_layer(Layer("boxed", [], draw, box=[2, 1, 5, 3]), 8, 6)
+    assert window == (2, 1, 5, 3) and rgb.shape == (2, 3, 3) and cover is None
+    assert render_layer(Layer("outside", [], draw, box=[10, 10, 12, 12]), 8, 6) is None
+
+def test_stack_matches_direct_render():
+    for seed in range(8):
+        spec = main.plan_scene(seed, 150, 112)
+        direct = PixelCanvas(150, 112)
+        main.render_scene(direct, spec)
+        stacked = LayerStack(150, 112).render(main.scene_layers(spec), np.zeros((112, 150, 3), np.uint8))
+        assert np.array_equal(direct.pixels, stacked)
+
+def test_recolor_redraws_one_layer():
+    spec = main.plan_scene(3, 200, 137)
+    stack = LayerStack(200, 137)
+    out = np.zeros((137, 200, 3), np.uint8)
+    stack.render(main.scene_layers(spec), out)
+    first = stack.rendered
+    spec["planets"][0]["palette"] = [[200, 10, 10]]*len(spec["planets"][0]["palette"])
+    stack.render(main.scene_layers(spec), out)
+    # the planet and its rings, everything else comes from the cache
+    assert stack.rendered - first == 2
+    direct = PixelCanvas(200, 137)
+    main.render_scene(direct, spec)
+    assert np.array_equal(direct.pixels, out)
+
+def test_scene_has_overlay_layers():
+    spec = main.plan_scene(3, 200, 137)
+    names = [layer.name.split()[0] for layer in main.scene_layers(spec)]
+    assert names[:3] == ["background", "stars", "nebula"]
+    assert "atmosphere" in names and "flares" in names
+    assert names.index("moons") < names.index("atmosphere") < names.index("flares")
@@ -0,0 +1,33 @@
+import os
+import numpy as np
+from noise_cache import NoiseCache
+from noise_field import NoiseField
+
+def cached_bytes(root):
+    return sum(os.path.getsize(os.path.join(root, n)) for n in os.listdir(root) if n.endswith(".npy"))
+
+def test_field_matches_direct_grid():
+    noise = NoiseField(octaves=3, seed=4)
+    field = NoiseCache().field(noise, 64, 48)
+    direct = noise.grid(np.arange(64)/64, np.arange(48)/48).astype(np.float32)
+    assert np.array_equal(field, direct)
+    assert not field.flags.writeable
+
+def test_shared_directory_stays_under_limit(tmp_path):
+    # two workers on one --noise-cache, each 40 KB field counts against the one disk_bytes
+    root = str(tmp_path / "noise")
+    a = NoiseCache(root, disk_bytes=300*1024)
+    b = NoiseCache(root, disk_bytes=300*1024)
+    for seed in range(20):
+        (a if seed % 2 else b).field(NoiseField(octaves=2, seed=seed), 100, 100)
+        assert cached_bytes(root) <= 300*1024
+    assert cached_bytes(root) > 150*1024
+
+def test_field_stored_by_one_is_read_by_the_other(tmp_path):
+    root = str(tmp_path / "noise")
+    a, b = NoiseCache(root), NoiseCache(root)
+    noise = NoiseField(octaves=2, seed=9)
+    first = a.field(noise, 80, 60)
+    again = b.field(noise, 80, 60)
+    assert (a.misses, b.misses, b.hits) == (1, 0, 1)
+    assert np.array_equal(first, again)
@@ -0,0 +1,72 @@
+import struct
+import zlib
+import numpy as np
+import pygame
+import pytest
+from png_stream import PngWriter, save_png_blocks
+
+def chunks(path):
+    data = open(path, "rb").read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    pos, out = 8, []
+    while pos < len(data):
+        n, = struct.unpack(">I", data[pos:pos+4])
+        tag, body = data[pos+4:pos+8], data[pos+8:pos+8+n]
+        assert struct.unpack(">I", data[pos+8+n:pos+12+n])[0] == zlib.crc32(tag + body)
+        out.append((tag, body))
+        pos += 12+n
+    return out
+
+def scanlines(path):
+    # raw filtered lines, filter bytes 0 (None), 1 (Sub) and 2 (Up) undone
+    found = chunks(path)
+    w, h = struct.unpack(">II", found[0][1][:8])
+    raw = np.frombuffer(zlib.decompress(b"".join(b for t, b in found if t == b"IDAT")), dtype=np.uint8)
+    lines = raw.reshape(h, 3*w+1)
+    out = np.zeros((h, 3*w), dtype=np.uint8)
+    for y, line in enumerate(lines):
+        row = line[1:].copy()
+        if line[0] == 1:
+            row = np.cumsum(row.reshape(-1, 3), axis=0, dtype=np.uint8).reshape(-1)
+        elif line[0] == 2 and y:
+            row += out[y-1]
+        else:
+            assert line[0] == 0
+        out[y] = row
+    return out.reshape(h, w, 3)
+
+def scaled(low, width, height):
+    surf = pygame.surfarray.make_surface(low.swapaxes(0, 1))
+    return pygame.surfarray.array3d(pygame.transform.scale(surf, (width, height))).swapaxes(0, 1)
+
+@pytest.mark.parametrize("width,height", [(160, 96), (163, 101), (37, 250)])
+def test_save_png_blocks_equals_upscale(tmp_path, width, height):
+    low = np.random.default_rng(width).integers(0, 256, (20, 12, 3), dtype=np.uint8)
+    path = str(tmp_path / "blocks.png")
+    save_png_blocks(low, width, height, path)
+    expected = scaled(low, width, height)
+    assert scanlines(path).tobytes() == expected.tobytes()
+    assert np.array_equal(pygame.surfarray.array3d(pygame.image.load(path)).swapaxes(0, 1), expected)
+
+def test_idat_size_only_changes_chunking(tmp_path):
+    # noise doesn't compress, so zlib hands back output as it goes
+    rows = np.random.default_rng(0).integers(0, 256, (50, 700, 3), dtype=np.uint8)
+    for name, size in (("one.png", 1 << 20), ("many.png", 4096)):
+        with PngWriter(str(tmp_path / name), 700, 50, idat_size=size) as png:
+            png.write_rows(rows[:20])
+            png.write_repeated(rows[20], 5)
+            png.write_rows(rows[25:])
+    one, many = chunks(tmp_path / "one.png"), chunks(tmp_path / "many.png")
+    assert sum(t == b"IDAT" for t, _ in many) > sum(t == b"IDAT" for t, _ in one) == 1
+    assert b"".join(b for _, b in one) == b"".join(b for _, b in many)
+    expected = rows.copy()
+    expected[20:25] = rows[20]
+    assert scanlines(tmp_path / "many.png").tobytes() == expected.tobytes()
+
+def test_wrong_row_count_raises(tmp_path):
+    png = PngWriter(str(tmp_path / "short.png"), 4, 4)
+    png.write_rows(np.zeros((3, 4, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        png.close()
+    with pytest.raises(ValueError):
+        PngWriter(str(tmp_path / "wide.png"), 4, 4).write_rows(np.zeros((1, 5, 3), dtype=np.uint8))
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+from render_cache import RenderCache, scene_key
+
+def cached_bytes(root):
+    return sum(os.path.getsize(os.path.join(root, n)) for n in os.listdir(root) if n.endswith((".npy", ".png")))
+
+def fake_png(path, size):
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    return str(path)
+
+def test_shared_directory_stays_under_limit(tmp_path):
+    # two workers on one --cache: the limit is for the directory, not for each of them
+    root = str(tmp_path / "cache")
+    a, b = RenderCache(root, 1024*1024), RenderCache(root, 1024*1024)
+    src = fake_png(tmp_path / "src.png", 150*1024)
+    for i in range(24):
+        (a if i % 2 else b).put_png(f"key{i}", src)
+        assert cached_bytes(root) <= 1024*1024
+    assert a.size() == b.size() == cached_bytes(root)
+    assert cached_bytes(root) > 1024*1024//2
+
+def test_hit_in_one_process_keeps_entry_for_the_other(tmp_path):
+    # 270 KB buffers, three fit under 1 MB
+    root = str(tmp_path / "cache")
+    a, b = RenderCache(root, 1024*1024), RenderCache(root, 1024*1024)
+    low = np.zeros((300, 300, 3), np.uint8)
+    for age, key in enumerate(("first", "old0", "old1")):
+        a.put_low(key, low)
+        # file mtimes are coarse, spell out the order they were written in
+        os.utime(a.path(key, ".npy"), (1000+age, 1000+age))
+    assert b.get_low("first") is not None
+    a.put_low("new0", low)
+    a.put_low("new1", low)
+    assert b.get_low("first") is not None
+    assert b.get_low("old0") is None and b.get_low("old1") is None
+
+def test_png_key_depends_on_level():
+    spec = {"seed": 1}
+    low = scene_key(spec, 800, 600, 8, 2)
+    assert len({low, scene_key(spec, 800, 600, 8, 2, 6), scene_key(spec, 800, 600, 8, 2, 1)}) == 3
+    assert low == scene_key(spec, 800, 600, 8, 2, None)
@@ -0,0 +1,62 @@
+import math
+import pickle
+import random
+import pytest
+import main
+from placement import place_planets, place_moons, bodies_grid, PlacementError
+
+SIZES = [(1600, 1100), (1200, 900), (800, 600), (640, 480), (320, 240)]
+
+@pytest.mark.parametrize("width,height", SIZES)
+def test_plan_scene_sizes(width, height):
+    low_w, low_h = width//8, height//8
+    for seed in range(25):
+        spec = main.plan_scene(seed, low_w, low_h)
+        assert spec == main.plan_scene(seed, low_w, low_h)
+        planets = spec["planets"]
+        for p in planets:
+            assert 0 <= p["cx"]-p["r"] and p["cx"]+p["r"] <= low_w
+            assert 0 <= p["cy"]-p["r"] and p["cy"]+p["r"] <= low_h
+        for i, a in enumerate(planets):
+            for b in planets[i+1:]:
+                assert math.hypot(a["cx"]-b["cx"], a["cy"]-b["cy"]) > a["r"]+b["r"]
+
+def test_plan_scene_fits_planets_on_big_scenes():
+    assert all(main.plan_scene(seed, 200, 137)["planets"] for seed in range(25))
+
+def test_strict_placement_error_pickles():
+    with pytest.raises(PlacementError) as info:
+        place_planets(3, 40, 30, 12, 14, gap=28, margin=16, strict=True)
+    err = pickle.loads(pickle.dumps(info.value))
+    assert str(err) == str(info.value)
+    assert err.placed == info.value.placed
+
+def assert_apart(bodies, gap):
+    for i, (x1, y1, r1) in enumerate(bodies):
+        for x2, y2, r2 in bodies[i+1:]:
+            assert math.hypot(x1-x2, y1-y2) > r1+r2+gap
+
+@pytest.mark.parametrize("n,w,h,min_r,max_r", [(3, 200, 137, 12, 24), (8, 400, 300, 10, 30), (40, 300, 300, 3, 9)])
+def test_place_planets_no_overlap(n, w, h, min_r, max_r):
+    for seed in range(10):
+        bodies = place_planets(n, w, h, min_r, max_r, gap=6, margin=4, rng=random.Random(seed))
+        assert len(bodies) == n
+        assert_apart(bodies, 6)
+        for x, y, r in bodies:
+            assert min_r <= r <= max_r
+            assert r+4 <= x <= w-r-4 and r+4 <= y <= h-r-4
+
+def test_place_planets_not_strict_returns_what_fits():
+    bodies = place_planets(6, 60, 40, 12, 14, gap=4, rng=random.Random(1), strict=False)
+    assert 0 < len(bodies) < 6
+    assert_apart(bodies, 4)
+
+def test_moons_clear_of_planets():
+    rng = random.Random(3)
+    planets = place_planets(3, 200, 137, 10, 18, gap=28, margin=16, rng=rng)
+    grid = bodies_grid(planets)
+    moons = []
+    for x, y, r in planets:
+        moons += place_moons(grid, x, y, r, 3, 2, 4, rng=rng)
+    assert moons
+    assert_apart(planets + moons, 0)
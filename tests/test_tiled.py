@@ -0,0 +1,26 @@
+import numpy as np
+import pygame
+import main
+from tiled import render_tiled, tile_boxes
+
+def load_rgb(path):
+    return pygame.surfarray.array3d(pygame.image.load(str(path))).swapaxes(0, 1)
+
+def test_tile_boxes_cover_image_on_whole_blocks():
+    boxes = tile_boxes(404, 300, 100, 8)
+    assert {(x0 % 8, y0 % 8) for x0, y0, _, _ in boxes} == {(0, 0)}
+    covered = np.zeros((300, 404), dtype=int)
+    for x0, y0, x1, y1 in boxes:
+        covered[y0:y1, x0:x1] += 1
+    assert (covered == 1).all()
+
+def test_tiled_matches_save_wallpaper(tmp_path):
+    # 404 isn't a multiple of the block and the tiles don't divide the image either
+    wc = main.WallpaperCreator(404, 300, 8, headless=True)
+    wc.generate_scene(11)
+    wc.save_wallpaper(str(tmp_path / "direct.png"))
+    direct = load_rgb(tmp_path / "direct.png")
+    render_tiled(wc.spec, 404, 300, 8, str(tmp_path / "tiled.png"), tile=128, workers=2)
+    render_tiled(wc.spec, 404, 300, 8, str(tmp_path / "tiled.npy"), tile=128, workers=2)
+    assert np.array_equal(load_rgb(tmp_path / "tiled.png"), direct)
+    assert np.array_equal(np.load(tmp_path / "tiled.npy"), direct)
@@ -1,11 +1,14 @@
 import pygame
 import random
+import numpy as np
+from index.hsv import hsv_to_rgb
 
 pygame.init()
 
 WIDTH, HEIGHT = 600, 400
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Colored Noise Map - Iteration 2")
+rng = np.random.default_rng(random.getrandbits(32))
 
 def generate_noise_map_array(width, height):
     noise = []
@@ -18,17 +21,11 @@ def generate_noise_map_array(width, height):
     return noise
 
 def color_noise_map(noise_map):
-    colored_surface = pygame.Surface((WIDTH, HEIGHT))
-    for x in range(WIDTH):
-        for y in range(HEIGHT):
-            brightness = noise_map[x][y]
-            
-            hue = random.randint(0, 360)
-            color = pygame.Color(0)
-            color.hsva = (hue, 100, brightness * 100 / 255, 100)
-            
-            colored_surface.set_at((x, y), color)
-    return colored_surface
+    # random hue per pixel, brightness as value, converted in one go
+    brightness = np.asarray(noise_map)
+    hue = rng.integers(0, 361, brightness.shape)
+    hsv = np.stack([hue, np.full(brightness.shape, 100), brightness * 100 / 255], -1)
+    return pygame.surfarray.make_surface(hsv_to_rgb(hsv))
 
 noise_array = generate_noise_map_array(WIDTH, HEIGHT)
 colored_noise_map = color_noise_map(noise_array)